@@ -3,6 +3,12 @@ import numpy as np
 import os
 import time
 
+from exibicao import DisplayThread, QUEUE_SIZE # imshow/waitKey numa thread separada do processamento
+from memoria_frames import FramePool, AllocationMonitor # Buffers de frame reaproveitados
+from configuracao_camera import open_camera, CAMERA_PROFILES, DEFAULT_CAMERA_PROFILE
+from perfis_calibracao import load_profiles, DEFAULT_PROFILE
+from conflitos_cores import conflicts, coverage_summary, overlap_matrix, format_overlap_matrix, MAX_OVERLAP
+
 def nada(x):
     """Função 'dummy' para os trackbars"""
     pass
@@ -16,125 +22,226 @@ kociemba_to_name = {v: k for k, v in name_to_kociemba.items()}
 
 # Dicionário para guardar os ranges calibrados
 saved_ranges = {}
+saved_reference_white = None # Média BGR do branco calibrado (âncora da normalização de iluminação)
 output_filename = "calibrated_colors.py"
 last_save_message = ""
 last_save_time = 0
+SAMPLE_SIZE = 80 # Lado (px) da amostra no centro do frame usada para medir lacunas/ambiguidades
+SAMPLE_STEP = 2  # Subamostragem dentro da amostra
+CURRENT = '*'    # Chave do range dos trackbars na análise ao vivo
+
+def report_conflicts(ranges, header):
+    """ Imprime a matriz de sobreposição e devolve os pares em conflito. """
+    found = conflicts(ranges)
+    if len(ranges) > 1:
+        print(f"{header} (% do menor range):")
+        print(format_overlap_matrix(ranges, kociemba_to_name))
+    for a, b, count, fraction in found:
+        print(f"  CONFLITO: {kociemba_to_name.get(a, a)} x {kociemba_to_name.get(b, b)}: "
+              f"{count} pixels HSV em comum ({fraction:.1%}) - o solver fica com a primeira cor do dicionário.")
+    return found
 
 # --- Carregar valores salvos anteriormente ---
+# Perfis nomeados (ex.: "janela", "led") ficam lado a lado; ficheiros antigos viram o perfil padrão
+saved_profiles = {}
+saved_camera_profile = DEFAULT_CAMERA_PROFILE
 if os.path.exists(output_filename):
     try:
         from calibrated_colors import calibrated_values
-        saved_ranges = calibrated_values
-        print(f"Valores carregados de '{output_filename}':")
-        for k, v in saved_ranges.items():
-             print(f"- {kociemba_to_name.get(k, k)} ({k}): Min{v[0]}, Max{v[1]}")
+        try: from calibrated_colors import reference_white as saved_reference_white
+        except ImportError: saved_reference_white = None
+        try: from calibrated_colors import calibration_profiles
+        except ImportError: calibration_profiles = None
+        try: from calibrated_colors import camera_profile as saved_camera_profile
+        except ImportError: pass
+        saved_profiles = load_profiles(calibration_profiles, calibrated_values, saved_reference_white)
     except Exception as e:
         print(f"Aviso: Não foi possível carregar '{output_filename}'. Será sobrescrito. Erro: {e}")
-        saved_ranges = {}
+        saved_profiles = {}
 
-# Tenta iniciar a webcam
-cap = cv2.VideoCapture(0)
-if not cap.isOpened():
-    print("Erro: Webcam 0 indisponível. Tentando índice 1...")
-    cap = cv2.VideoCapture(1)
-    if not cap.isOpened():
-        print("Erro fatal: Nenhuma webcam encontrada.")
-        exit()
-
-# Cria janelas
-cv2.namedWindow("Trackbars")
-cv2.resizeWindow("Trackbars", 400, 300)
-cv2.namedWindow("Original (Mostre a cor aqui)")
-cv2.namedWindow("Mascara (Isole a cor em branco)")
-cv2.namedWindow("Resultado (Cor isolada)") # <-- Janela reativada
-
-# Cria trackbars
-cv2.createTrackbar("H_min", "Trackbars", 0, 179, nada)
-cv2.createTrackbar("H_max", "Trackbars", 179, 179, nada)
-cv2.createTrackbar("S_min", "Trackbars", 0, 255, nada)
-cv2.createTrackbar("S_max", "Trackbars", 255, 255, nada)
-cv2.createTrackbar("V_min", "Trackbars", 0, 255, nada)
-cv2.createTrackbar("V_max", "Trackbars", 255, 255, nada)
-
-# --- Define valores iniciais dos trackbars (se já foram salvos) ---
-if saved_ranges:
-    try:
-        first_key = next(iter(saved_ranges))
-        if len(saved_ranges[first_key]) == 2 and len(saved_ranges[first_key][0]) == 3 and len(saved_ranges[first_key][1]) == 3:
-            cv2.setTrackbarPos("H_min", "Trackbars", saved_ranges[first_key][0][0])
-            cv2.setTrackbarPos("S_min", "Trackbars", saved_ranges[first_key][0][1])
-            cv2.setTrackbarPos("V_min", "Trackbars", saved_ranges[first_key][0][2])
-            cv2.setTrackbarPos("H_max", "Trackbars", saved_ranges[first_key][1][0])
-            cv2.setTrackbarPos("S_max", "Trackbars", saved_ranges[first_key][1][1])
-            cv2.setTrackbarPos("V_max", "Trackbars", saved_ranges[first_key][1][2])
-    except Exception as e:
-        print(f"Aviso: Não foi possível definir os valores iniciais dos trackbars. Erro: {e}")
+if saved_profiles:
+    print(f"Perfis de calibração em '{output_filename}': {list(saved_profiles)}")
+profile_name = input(f"Nome do perfil a calibrar (Enter = '{DEFAULT_PROFILE}'): ").strip() or DEFAULT_PROFILE
+if profile_name in saved_profiles:
+    saved_ranges = dict(saved_profiles[profile_name]["values"])
+    saved_reference_white = saved_profiles[profile_name]["reference_white"]
+    print(f"Valores carregados do perfil '{profile_name}':")
+    for k, v in saved_ranges.items():
+         print(f"- {kociemba_to_name.get(k, k)} ({k}): Min{v[0]}, Max{v[1]}")
+    report_conflicts(saved_ranges, "Sobreposição entre as cores salvas")
+else:
+    saved_ranges, saved_reference_white = {}, None
+    print(f"Novo perfil '{profile_name}'.")
+
+# Tenta iniciar a webcam com o perfil de câmara (o solver usa o mesmo, salvo em camera_profile)
+print(f"Perfis de câmara: {list(CAMERA_PROFILES)}")
+camera_profile = input(f"Perfil de câmara (Enter = '{saved_camera_profile}'): ").strip() or saved_camera_profile
+cap = open_camera(camera_profile)
+if cap is None:
+    print("Erro fatal: Nenhuma webcam encontrada.")
+    exit()
+
+# Janelas e trackbars são criados dentro da thread de exibição (ver exibicao.py)
+trackbar_names = ["H_min", "H_max", "S_min", "S_max", "V_min", "V_max"]
 
+def criar_janelas():
+    """Cria janelas e trackbars (roda na thread de exibição)"""
+    cv2.namedWindow("Trackbars")
+    cv2.resizeWindow("Trackbars", 400, 300)
+    cv2.namedWindow("Original (Mostre a cor aqui)")
+    cv2.namedWindow("Mascara (Isole a cor em branco)")
+    cv2.namedWindow("Resultado (Cor isolada)") # <-- Janela reativada
+
+    # Cria trackbars
+    cv2.createTrackbar("H_min", "Trackbars", 0, 179, nada)
+    cv2.createTrackbar("H_max", "Trackbars", 179, 179, nada)
+    cv2.createTrackbar("S_min", "Trackbars", 0, 255, nada)
+    cv2.createTrackbar("S_max", "Trackbars", 255, 255, nada)
+    cv2.createTrackbar("V_min", "Trackbars", 0, 255, nada)
+    cv2.createTrackbar("V_max", "Trackbars", 255, 255, nada)
+
+    # --- Define valores iniciais dos trackbars (se já foram salvos) ---
+    if saved_ranges:
+        try:
+            first_key = next(iter(saved_ranges))
+            if len(saved_ranges[first_key]) == 2 and len(saved_ranges[first_key][0]) == 3 and len(saved_ranges[first_key][1]) == 3:
+                cv2.setTrackbarPos("H_min", "Trackbars", saved_ranges[first_key][0][0])
+                cv2.setTrackbarPos("S_min", "Trackbars", saved_ranges[first_key][0][1])
+                cv2.setTrackbarPos("V_min", "Trackbars", saved_ranges[first_key][0][2])
+                cv2.setTrackbarPos("H_max", "Trackbars", saved_ranges[first_key][1][0])
+                cv2.setTrackbarPos("S_max", "Trackbars", saved_ranges[first_key][1][1])
+                cv2.setTrackbarPos("V_max", "Trackbars", saved_ranges[first_key][1][2])
+        except Exception as e:
+            print(f"Aviso: Não foi possível definir os valores iniciais dos trackbars. Erro: {e}")
+
+display = DisplayThread(setup=criar_janelas, trackbar_window="Trackbars", trackbar_names=trackbar_names).start()
 
 print("\n--- Calibrador de Cor HSV (com Save) ---")
 print("1. Ajuste os controles para isolar uma cor na janela 'Mascara'.")
 print("2. Pressione a tecla [s] para salvar.")
 print("3. Digite o NOME da cor no CONSOLE (branco, vermelho, verde, amarelo, laranja, azul) e pressione Enter.")
+print("   (termine o nome com '!' para salvar mesmo que sobreponha outra cor, ex.: 'laranja!')")
 print("4. Repita para as 6 cores.")
+print(f"   Mostre a cor no quadrado central: a janela 'Original' mostra lacunas e ambiguidades ao vivo.")
 print("5. Pressione [q] para sair e SALVAR TUDO no arquivo 'calibrated_colors.py'.")
 print("\nCores já salvas nesta sessão:")
 for k, v in saved_ranges.items():
     print(f"- {kociemba_to_name.get(k, k)} ({k})")
 
 
+# Buffers reaproveitados a cada frame. Os que vão para a exibição alternam num anel,
+# porque a thread de exibição ainda pode estar a usá-los quando o próximo frame chega.
+frame_pool = FramePool("calibrador")
+allocation_monitor = AllocationMonitor()
+DISPLAY_RING = QUEUE_SIZE + 2
+exit_confirmed = False # Saída pelo [q], já com as sobreposições conferidas
+
 while True:
-    ret, frame = cap.read()
+    ret, raw = cap.read(frame_pool.peek("raw"))
     if not ret:
         print("Erro ao ler frame.")
         break
+    frame_pool.keep("raw", raw)
 
-    frame = cv2.flip(frame, 1)
-    hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
+    frame = cv2.flip(raw, 1, dst=frame_pool.ring("frame", raw.shape, DISPLAY_RING))
+    hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV, dst=frame_pool.get("hsv", frame.shape))
+    allocation_monitor.tick()
 
-    # Pega valores dos trackbars
-    h_min = cv2.getTrackbarPos("H_min", "Trackbars")
-    h_max = cv2.getTrackbarPos("H_max", "Trackbars")
-    s_min = cv2.getTrackbarPos("S_min", "Trackbars")
-    s_max = cv2.getTrackbarPos("S_max", "Trackbars")
-    v_min = cv2.getTrackbarPos("V_min", "Trackbars")
-    v_max = cv2.getTrackbarPos("V_max", "Trackbars")
+    # Pega valores dos trackbars (cópia mantida pela thread de exibição)
+    trackbars = display.trackbar_values
+    h_min, h_max = trackbars.get("H_min", 0), trackbars.get("H_max", 179)
+    s_min, s_max = trackbars.get("S_min", 0), trackbars.get("S_max", 255)
+    v_min, v_max = trackbars.get("V_min", 0), trackbars.get("V_max", 255)
 
     # Cria máscara
     limite_inferior = np.array([h_min, s_min, v_min])
     limite_superior = np.array([h_max, s_max, v_max])
+    mascara = frame_pool.ring("mascara", frame.shape[:2], DISPLAY_RING)
     if h_min > h_max:
-        mask1 = cv2.inRange(hsv, np.array([h_min, s_min, v_min]), np.array([179, s_max, v_max]))
-        mask2 = cv2.inRange(hsv, np.array([0, s_min, v_min]), np.array([h_max, s_max, v_max]))
-        mascara = mask1 | mask2
+        mask2 = frame_pool.get("mask2", frame.shape[:2])
+        cv2.inRange(hsv, np.array([h_min, s_min, v_min]), np.array([179, s_max, v_max]), dst=mascara)
+        cv2.inRange(hsv, np.array([0, s_min, v_min]), np.array([h_max, s_max, v_max]), dst=mask2)
+        cv2.bitwise_or(mascara, mask2, dst=mascara)
     else:
-        mascara = cv2.inRange(hsv, limite_inferior, limite_superior)
+        cv2.inRange(hsv, limite_inferior, limite_superior, dst=mascara)
+
+    # Com dst e máscara, o OpenCV não toca nos pixels fora da máscara: zera antes
+    resultado = frame_pool.ring("resultado", frame.shape, DISPLAY_RING)
+    resultado.fill(0)
+    cv2.bitwise_and(frame, frame, dst=resultado, mask=mascara) # <-- Linha reativada
 
-    resultado = cv2.bitwise_and(frame, frame, mask=mascara) # <-- Linha reativada
+    # --- Conflitos ao vivo: range atual contra as cores salvas, e cobertura da amostra central ---
+    live_ranges = dict(saved_ranges)
+    live_ranges[CURRENT] = ([h_min, s_min, v_min], [h_max, s_max, v_max])
+    letters, overlap = overlap_matrix(live_ranges)
+    current_index = letters.index(CURRENT)
+    current_volume = max(int(overlap[current_index, current_index]), 1)
+    overlaps = [f"{kociemba_to_name.get(c, c)} {overlap[current_index, k] / min(current_volume, max(int(overlap[k, k]), 1)):.0%}"
+                for k, c in enumerate(letters) if c != CURRENT and overlap[current_index, k] > 0]
+
+    cy, cx, half = frame.shape[0] // 2, frame.shape[1] // 2, SAMPLE_SIZE // 2
+    sample = hsv[cy - half:cy + half:SAMPLE_STEP, cx - half:cx + half:SAMPLE_STEP]
+    summary = coverage_summary(sample, live_ranges)
+    ambiguous_text = ", ".join("/".join(kociemba_to_name.get(c, "atual") for c in pair) for pair in summary["ambiguous_pairs"])
+    warning = summary["ambiguous"] > MAX_OVERLAP or summary["gap"] > 0.5
+    cv2.rectangle(frame, (cx - half, cy - half), (cx + half, cy + half), (0, 0, 255) if warning else (0, 255, 0), 2)
+    cv2.putText(frame, f"Amostra: sem cor {summary['gap']:.0%} | ambiguo {summary['ambiguous']:.0%} {ambiguous_text}",
+                (10, 25), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 255) if warning else (0, 255, 0), 1)
+    cv2.putText(frame, "Range atual sobrepoe: " + (", ".join(overlaps) if overlaps else "nenhuma cor"),
+                (10, 45), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 255) if overlaps else (0, 255, 0), 1)
 
     # Mostra mensagem de save
     if time.time() - last_save_time < 3:
         cv2.putText(frame, last_save_message, (10, frame.shape[0] - 10),
                     cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
 
-    # Mostra janelas
-    cv2.imshow("Original (Mostre a cor aqui)", frame)
-    cv2.imshow("Mascara (Isole a cor em branco)", mascara)
-    cv2.imshow("Resultado (Cor isolada)", resultado) # <-- Linha reativada
+    # Mostra janelas (a thread de exibição descarta frames se estiver atrasada)
+    display.show_windows({
+        "Original (Mostre a cor aqui)": frame,
+        "Mascara (Isole a cor em branco)": mascara,
+        "Resultado (Cor isolada)": resultado, # <-- Linha reativada
+    })
+    display.tick_detection()
 
-    key = cv2.waitKey(1) & 0xFF
+    key = display.poll_key()
+    if display.closed:
+        break
 
     if key == ord('q'):
+        # Calibrações ambíguas só são gravadas com confirmação explícita; senão volta ao ajuste
+        if saved_ranges and report_conflicts(saved_ranges, "\nSobreposição entre as cores salvas"):
+            answer = input("As cores acima se sobrepõem. Enter volta ao ajuste, 'forcar' salva mesmo assim: ").strip().lower()
+            if answer != "forcar":
+                last_save_message = "Ajuste (e salve de novo) as cores que se sobrepoem; [q] para sair"
+                print(last_save_message)
+                last_save_time = time.time()
+                continue
+        exit_confirmed = True
         break
 
     if key == ord('s'):
         print("\n-------------------------")
         color_name_input = input("Digite o nome da cor (branco, vermelho, etc.): ").lower().strip()
         print("-------------------------")
+        force = color_name_input.endswith('!')
+        color_name_input = color_name_input.rstrip('!').strip()
 
         if color_name_input in name_to_kociemba:
             kociemba_letter = name_to_kociemba[color_name_input]
             current_range = ([h_min, s_min, v_min], [h_max, s_max, v_max])
+            candidate = dict(saved_ranges)
+            candidate[kociemba_letter] = current_range
+            found = [c for c in report_conflicts(candidate, "Sobreposição com o novo range") if kociemba_letter in c[:2]]
+            if found and not force:
+                last_save_message = f"'{color_name_input.capitalize()}' NAO salvo: sobrepoe outra cor!"
+                print(f"{last_save_message} Ajuste os ranges ou digite '{color_name_input}!' para forçar.")
+                last_save_time = time.time()
+                continue
             saved_ranges[kociemba_letter] = current_range
+            if kociemba_letter == 'U' and cv2.countNonZero(mascara) > 0:
+                # Guarda a cor média (BGR) do branco isolado como referência de iluminação
+                saved_reference_white = [round(c, 1) for c in cv2.mean(frame, mask=mascara)[:3]]
+                print(f"  Branco de referência (BGR): {saved_reference_white}")
 
             last_save_message = f"'{color_name_input.capitalize()}' ({kociemba_letter}) salvo!"
             print(last_save_message)
@@ -151,20 +258,44 @@ while True:
 
 # --- Fim do loop - Salvar no arquivo ---
 cap.release()
-cv2.destroyAllWindows()
+display.stop()
+print(allocation_monitor.report())
+
+# Saída sem passar pelo [q] (janela fechada, câmera perdida): já não dá para voltar ao ajuste,
+# então a decisão sobre uma calibração ambígua é pedida até haver uma resposta explícita
+if not exit_confirmed and saved_ranges and report_conflicts(saved_ranges, "\nSobreposição final entre as cores"):
+    answer = ""
+    while answer not in ("forcar", "descartar"):
+        answer = input("As cores acima se sobrepõem. Digite 'forcar' para salvar ou 'descartar' para não salvar: ").strip().lower()
+    if answer == "descartar":
+        print("Calibração ambígua NÃO foi salva.")
+        saved_ranges = {}
 
 if saved_ranges:
+    saved_profiles[profile_name] = {"values": saved_ranges, "reference_white": saved_reference_white}
     try:
         with open(output_filename, 'w', encoding='utf-8') as f:
             f.write("# Arquivo gerado automaticamente pelo calibrador_com_save.py\n")
             f.write("# Contem os ranges HSV calibrados para as cores do cubo\n\n")
-            f.write("calibrated_values = {\n")
-            num_entries = len(saved_ranges)
-            count = 0
-            for key, value in saved_ranges.items():
-                count += 1
-                f.write(f"    '{key}': ([{value[0][0]}, {value[0][1]}, {value[0][2]}], [{value[1][0]}, {value[1][1]}, {value[1][2]}]){',' if count < num_entries else ''}\n")
+            f.write("# Perfis de calibração (o solver escolhe automaticamente o que melhor se ajusta à luz)\n")
+            f.write("calibration_profiles = {\n")
+            for name, profile in saved_profiles.items():
+                f.write(f"    {name!r}: {{\n        'values': {{\n")
+                for key, value in profile["values"].items():
+                    f.write(f"            '{key}': ([{value[0][0]}, {value[0][1]}, {value[0][2]}], [{value[1][0]}, {value[1][1]}, {value[1][2]}]),\n")
+                f.write("        },\n")
+                white = profile["reference_white"]
+                if white is not None:
+                    f.write(f"        'reference_white': [{white[0]}, {white[1]}, {white[2]}],\n")
+                f.write("    },\n")
             f.write("}\n")
+            f.write(f"active_profile = {profile_name!r}\n")
+            f.write(f"camera_profile = {camera_profile!r} # Ver configuracao_camera.py\n\n")
+            # Perfil ativo também nos nomes antigos (servidor, gravador e versões anteriores do solver)
+            f.write("calibrated_values = calibration_profiles[active_profile]['values']\n")
+            if saved_reference_white is not None:
+                f.write("\n# Cor média (BGR) do branco na calibração - âncora da normalização de iluminação\n")
+                f.write("reference_white = calibration_profiles[active_profile]['reference_white']\n")
         print(f"\nValores salvos com sucesso no arquivo: '{output_filename}'")
         print("\nConteúdo salvo:")
         with open(output_filename, 'r', encoding='utf-8') as f:
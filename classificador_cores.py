@@ -0,0 +1,134 @@
+# Classificação vetorizada das cores e acumulação de evidência por sticker.
+# A tabela (LUT) cobre todo o espaço HSV do OpenCV (H 0-179, S 0-255, V 0-255) e
+# segue a regra dos ranges calibrados: a primeira cor cujo range contém o pixel vence.
+import numpy as np
+
+PATCH_RADIUS = 3          # Amostra uma janela (2r+1)x(2r+1) em volta de cada centro
+DECAY = 0.85              # Peso da evidência antiga a cada novo frame
+MIN_EVIDENCE = 2.5        # Evidência mínima (~3 frames bons) para confirmar um sticker
+MIN_PROB = 0.8            # Probabilidade mínima da cor vencedora
+MAX_DISAGREE = 3          # Frames seguidos contradizendo um sticker confirmado até liberá-lo
+
+
+def range_mask_1d(lower, upper, size, wrap=False):
+    """ Máscara 1D de um canal. Com wrap=True, lower > upper dá a volta (como o HUE do vermelho). """
+    values = np.arange(size)
+    if wrap and lower > upper:
+        return (values >= lower) | (values <= upper)
+    return (values >= lower) & (values <= upper)
+
+def color_range_volume(lower, upper):
+    """ Máscara booleana (180, 256, 256) dos pixels HSV contidos num range calibrado. """
+    h = range_mask_1d(lower[0], upper[0], 180, wrap=True)
+    s = range_mask_1d(lower[1], upper[1], 256)
+    v = range_mask_1d(lower[2], upper[2], 256)
+    return h[:, None, None] & s[None, :, None] & v[None, None, :]
+
+def build_color_lut(color_ranges):
+    """
+    Cria a LUT (180, 256, 256) com o índice da cor de cada pixel HSV.
+    Retorna (lut, letters), onde letters[i] é a letra do índice i e o último índice é '?'.
+    """
+    letters = list(color_ranges.keys()) + ['?']
+    lut = np.full((180, 256, 256), len(letters) - 1, dtype=np.uint8)
+    # Percorre ao contrário para que a primeira cor do dicionário prevaleça nas sobreposições
+    for idx in range(len(letters) - 2, -1, -1):
+        lower, upper = color_ranges[letters[idx]]
+        lut[color_range_volume(lower, upper)] = idx
+    return lut, letters
+
+def patch_offsets(radius=PATCH_RADIUS):
+    d = np.arange(-radius, radius + 1)
+    dy, dx = np.meshgrid(d, d, indexing="ij")
+    return dy.ravel(), dx.ravel()
+
+def sample_patches(hsv_frame, centers, radius=PATCH_RADIUS):
+    """ Retorna os pixels HSV em volta de cada centro, shape (9, P, 3). None se sair do frame. """
+    cx = np.array([x for x, _ in centers])
+    cy = np.array([y for _, y in centers])
+    if (cx - radius).min() < 0 or (cy - radius).min() < 0 or \
+       (cx + radius).max() >= hsv_frame.shape[1] or (cy + radius).max() >= hsv_frame.shape[0]:
+        return None
+    dy, dx = patch_offsets(radius)
+    return hsv_frame[cy[:, None] + dy[None, :], cx[:, None] + dx[None, :]]
+
+def sticker_scores(hsv_frame, centers, lut, n_codes, radius=PATCH_RADIUS):
+    """
+    Fração dos pixels de cada sticker classificados em cada cor, shape (9, n_codes).
+    n_codes = len(letters); a última coluna é a fração '?'. Retorna None se a grade sair do frame.
+    """
+    patches = sample_patches(hsv_frame, centers, radius)
+    if patches is None:
+        return None
+    codes = lut[patches[..., 0], patches[..., 1], patches[..., 2]].astype(np.intp)
+    n_cells, n_pixels = codes.shape
+    flat = codes + (np.arange(n_cells) * n_codes)[:, None]
+    counts = np.bincount(flat.ravel(), minlength=n_cells * n_codes).reshape(n_cells, n_codes)
+    return counts.astype(np.float32) / n_pixels
+
+def scores_to_letters(scores, letters, min_fraction=0.5):
+    """ Letra mais votada de cada sticker, ou '?' se a cor vencedora não tiver a fração mínima. """
+    colors = scores[:, :-1]
+    best = colors.argmax(axis=1)
+    return [letters[b] if colors[i, b] >= min_fraction else '?' for i, b in enumerate(best)]
+
+
+class StickerAccumulator:
+    """
+    Acumula, frame a frame, a evidência de cada um dos 9 stickers sobre as cores.
+    Stickers confiáveis ficam confirmados; só os incertos continuam a amostrar.
+    """
+
+    def __init__(self, letters):
+        self.letters = letters # Inclui '?' na última posição
+        self.reset()
+
+    def reset(self):
+        n_colors = len(self.letters) - 1
+        self.evidence = np.zeros((9, n_colors), dtype=np.float32)
+        self.locked = np.full(9, -1, dtype=np.int32) # Índice da cor confirmada ou -1
+        self.disagree = np.zeros(9, dtype=np.int32)
+
+    def update(self, scores):
+        """ Soma a evidência de um frame (saída de sticker_scores). """
+        colors = scores[:, :-1]
+        pending = self.locked < 0
+        self.evidence[pending] = self.evidence[pending] * DECAY + colors[pending]
+
+        total = self.evidence.sum(axis=1)
+        prob = self.evidence / np.maximum(total, 1e-6)[:, None]
+        newly_locked = pending & (total >= MIN_EVIDENCE) & (prob.max(axis=1) >= MIN_PROB)
+        self.locked[newly_locked] = prob.argmax(axis=1)[newly_locked]
+
+        # Um sticker confirmado que passa a ser contrariado (ex: o cubo mexeu) volta a amostrar
+        frame_best = colors.argmax(axis=1)
+        contradicted = ~pending & (colors.max(axis=1) >= MIN_PROB) & (frame_best != self.locked)
+        self.disagree = np.where(contradicted, self.disagree + 1, 0)
+        released = self.disagree >= MAX_DISAGREE
+        if released.any():
+            self.locked[released] = -1
+            self.evidence[released] = 0
+            self.disagree[released] = 0
+
+    def probabilities(self):
+        total = self.evidence.sum(axis=1)
+        return self.evidence / np.maximum(total, 1e-6)[:, None]
+
+    def pending(self):
+        """ Máscara dos stickers ainda não confirmados. """
+        return self.locked < 0
+
+    def best_letters(self):
+        """ Melhor palpite atual de cada sticker (confirmado ou não). """
+        best = np.where(self.locked >= 0, self.locked, self.probabilities().argmax(axis=1))
+        has_evidence = (self.locked >= 0) | (self.evidence.sum(axis=1) > 0)
+        return [self.letters[b] if ok else '?' for b, ok in zip(best, has_evidence)]
+
+    def center_letter(self):
+        return self.letters[self.locked[4]] if self.locked[4] >= 0 else None
+
+    def face_letters(self):
+        """ As 9 letras se todos os stickers estiverem confirmados, senão None. """
+        if self.pending().any():
+            return None
+        return [self.letters[i] for i in self.locked]
@@ -0,0 +1,136 @@
+# Configuração da câmara: resolução, FPS, formato de pixel, exposição e balanço de branco.
+# O pipeline só lê 9 pequenos patches, então uma resolução baixa com exposição e balanço de
+# branco manuais poupa banda/decodificação e evita que as cores mudem entre frames.
+# Depois de aplicar um perfil, lê de volta o que o driver aceitou e mede a captura.
+import sys
+import time
+
+import cv2
+
+# Perfis de câmara. Valores None ficam no padrão do driver.
+# exposure: unidade do driver (V4L2 costuma usar 1-5000; DirectShow usa log2 em segundos, ex. -6)
+CAMERA_PROFILES = {
+    "padrao": {}, # Padrões do driver (comportamento antigo)
+    "baixa_latencia": {
+        "width": 640, "height": 480, "fps": 30, "fourcc": "MJPG", "buffer_size": 1,
+        "auto_exposure": False, "exposure": None,
+        "auto_white_balance": False, "wb_temperature": 4500,
+    },
+    "baixa_latencia_yuyv": { # Para câmaras cujo MJPG é lento ou tem artefactos de compressão
+        "width": 640, "height": 480, "fps": 30, "fourcc": "YUYV", "buffer_size": 1,
+        "auto_exposure": False, "exposure": None,
+        "auto_white_balance": False, "wb_temperature": 4500,
+    },
+}
+DEFAULT_CAMERA_PROFILE = "baixa_latencia"
+CAMERA_INDEXES = (0, 1)  # Tenta a webcam 0 e depois a 1
+MEASURE_FRAMES = 30      # Frames lidos para medir latência e taxa de captura
+
+
+def fourcc_to_str(value):
+    value = int(value)
+    return "".join(chr((value >> (8 * i)) & 0xFF) for i in range(4)).strip("\x00")
+
+def auto_exposure_values(cap):
+    """ (manual, automático) para CAP_PROP_AUTO_EXPOSURE, que muda de escala conforme o backend. """
+    try: backend = cap.getBackendName()
+    except cv2.error: backend = ""
+    if backend == "V4L2":
+        return 1, 3
+    return 0.25, 0.75 # DirectShow/MSMF
+
+def apply_camera_profile(cap, settings):
+    """
+    Aplica as configurações e devolve {nome: (pedido, aceito)} para cada uma que foi pedida.
+    O formato de pixel vem primeiro: alguns drivers só aceitam a resolução depois dele.
+    """
+    requested = []
+    if settings.get("fourcc"):
+        requested.append(("fourcc", cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*settings["fourcc"])))
+    for name, prop in (("width", cv2.CAP_PROP_FRAME_WIDTH), ("height", cv2.CAP_PROP_FRAME_HEIGHT),
+                       ("fps", cv2.CAP_PROP_FPS), ("buffer_size", cv2.CAP_PROP_BUFFERSIZE)):
+        if settings.get(name) is not None:
+            requested.append((name, prop, settings[name]))
+    manual, auto = auto_exposure_values(cap)
+    if settings.get("auto_exposure") is not None:
+        requested.append(("auto_exposure", cv2.CAP_PROP_AUTO_EXPOSURE, auto if settings["auto_exposure"] else manual))
+    if settings.get("exposure") is not None:
+        requested.append(("exposure", cv2.CAP_PROP_EXPOSURE, settings["exposure"]))
+    if settings.get("auto_white_balance") is not None:
+        requested.append(("auto_white_balance", cv2.CAP_PROP_AUTO_WB, 1 if settings["auto_white_balance"] else 0))
+    if settings.get("wb_temperature") is not None:
+        requested.append(("wb_temperature", cv2.CAP_PROP_WB_TEMPERATURE, settings["wb_temperature"]))
+
+    for _, prop, value in requested:
+        cap.set(prop, value)
+
+    report = {}
+    for name, prop, value in requested:
+        accepted = cap.get(prop)
+        if name == "fourcc":
+            report[name] = (settings["fourcc"], fourcc_to_str(accepted))
+        else:
+            report[name] = (value, accepted)
+    return report
+
+def measure_capture(cap, frames=MEASURE_FRAMES):
+    """ Mede o tempo de cada read() (latência efetiva de leitura) e a taxa de captura. """
+    durations = []
+    start = time.perf_counter()
+    for _ in range(frames):
+        t0 = time.perf_counter()
+        ok, _ = cap.read()
+        if not ok:
+            break
+        durations.append(time.perf_counter() - t0)
+    total = time.perf_counter() - start
+    if not durations:
+        return None
+    durations.sort()
+    return {
+        "frames": len(durations),
+        "fps": len(durations) / total,
+        "read_ms_mean": 1000 * sum(durations) / len(durations),
+        "read_ms_p95": 1000 * durations[min(len(durations) - 1, int(0.95 * len(durations)))],
+    }
+
+def open_camera(profile_name=DEFAULT_CAMERA_PROFILE, indexes=CAMERA_INDEXES, measure=True):
+    """
+    Abre a primeira webcam disponível com o perfil pedido e imprime o que o driver aceitou.
+    Retorna o cv2.VideoCapture (ou None se nenhuma webcam abrir).
+    """
+    settings = CAMERA_PROFILES.get(profile_name)
+    if settings is None:
+        print(f"Aviso: Perfil de câmara '{profile_name}' desconhecido. Usando os padrões do driver.")
+        profile_name, settings = "padrao", {}
+
+    # V4L2 direto no Linux: o backend padrão às vezes ignora o FOURCC
+    apis = (cv2.CAP_V4L2, cv2.CAP_ANY) if sys.platform.startswith("linux") else (cv2.CAP_ANY,)
+    cap = None
+    for index in indexes:
+        for api in apis:
+            cap = cv2.VideoCapture(index, api)
+            if cap.isOpened():
+                break
+            cap = None
+        if cap is not None:
+            break
+        print(f"Erro: Webcam {index} indisponível.")
+    if cap is None:
+        return None
+
+    print(f"Câmara {index}: perfil '{profile_name}'")
+    for name, (wanted, accepted) in apply_camera_profile(cap, settings).items():
+        ok = wanted == accepted if isinstance(wanted, str) else abs(float(wanted) - float(accepted)) < 1e-3
+        print(f"  {name}: pedido {wanted}, aceito {accepted}{'' if ok else '  <-- NÃO ACEITO'}")
+    print(f"  Efetivo: {int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))}x{int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))} "
+          f"@ {cap.get(cv2.CAP_PROP_FPS):.0f} fps, formato {fourcc_to_str(cap.get(cv2.CAP_PROP_FOURCC)) or '?'}")
+
+    if measure:
+        stats = measure_capture(cap)
+        if stats is None:
+            print("  Aviso: Não foi possível ler frames para medir a captura.")
+        else:
+            print(f"  Captura: {stats['fps']:.1f} fps, leitura média {stats['read_ms_mean']:.1f} ms "
+                  f"(p95 {stats['read_ms_p95']:.1f} ms) em {stats['frames']} frames")
+    return cap
@@ -0,0 +1,82 @@
+# Análise de conflitos entre ranges calibrados.
+# Cada range é uma caixa no espaço HSV (H com volta no vermelho), então a interseção de dois
+# ranges é o produto das interseções de cada canal: a matriz de sobreposição sobre todo o
+# espaço HSV sai de três produtos de matrizes (K x 180, K x 256, K x 256), sem montar volumes.
+import numpy as np
+
+from classificador_cores import range_mask_1d
+
+MAX_OVERLAP = 0.01 # Fração máxima do menor range que pode ser partilhada com outra cor
+
+
+def range_axes(color_ranges):
+    """ Máscaras por canal de cada range: (letters, H (K,180), S (K,256), V (K,256)). """
+    letters = list(color_ranges)
+    h = np.array([range_mask_1d(color_ranges[c][0][0], color_ranges[c][1][0], 180, wrap=True) for c in letters])
+    s = np.array([range_mask_1d(color_ranges[c][0][1], color_ranges[c][1][1], 256) for c in letters])
+    v = np.array([range_mask_1d(color_ranges[c][0][2], color_ranges[c][1][2], 256) for c in letters])
+    return letters, h.reshape(len(letters), 180), s.reshape(len(letters), 256), v.reshape(len(letters), 256)
+
+def overlap_matrix(color_ranges):
+    """
+    (letters, matriz K x K) com o número de pixels HSV em comum entre cada par de ranges.
+    A diagonal é o volume de cada range. Igual a contar color_range_volume(a) & color_range_volume(b).
+    """
+    letters, h, s, v = range_axes(color_ranges)
+    h, s, v = h.astype(np.int64), s.astype(np.int64), v.astype(np.int64)
+    return letters, (h @ h.T) * (s @ s.T) * (v @ v.T)
+
+def conflicts(color_ranges, max_overlap=MAX_OVERLAP):
+    """ Pares (a, b, pixels, fração do menor range) que se sobrepõem mais do que max_overlap. """
+    letters, overlap = overlap_matrix(color_ranges)
+    volumes = np.diag(overlap)
+    found = []
+    for i in range(len(letters)):
+        for j in range(i + 1, len(letters)):
+            smaller = min(volumes[i], volumes[j])
+            if overlap[i, j] == 0 or smaller == 0:
+                continue
+            fraction = overlap[i, j] / smaller
+            if fraction > max_overlap:
+                found.append((letters[i], letters[j], int(overlap[i, j]), float(fraction)))
+    return found
+
+def coverage(hsv_pixels, color_ranges):
+    """
+    Quantos ranges contêm cada pixel HSV amostrado. hsv_pixels: (N, 3).
+    Retorna (letters, membership (K, N) bool, count (N,)): 0 = lacuna, >1 = ambíguo.
+    """
+    letters, h, s, v = range_axes(color_ranges)
+    pixels = np.asarray(hsv_pixels).reshape(-1, 3)
+    membership = h[:, pixels[:, 0]] & s[:, pixels[:, 1]] & v[:, pixels[:, 2]]
+    return letters, membership, membership.sum(axis=0)
+
+def coverage_summary(hsv_pixels, color_ranges):
+    """ Frações de pixels sem cor, ambíguos e de cada cor (só entre os não ambíguos). """
+    letters, membership, count = coverage(hsv_pixels, color_ranges)
+    total = max(count.size, 1)
+    single = count == 1
+    return {
+        "gap": float((count == 0).sum()) / total,
+        "ambiguous": float((count > 1).sum()) / total,
+        "colors": {c: float((membership[k] & single).sum()) / total for k, c in enumerate(letters)},
+        "ambiguous_pairs": sorted({(letters[a], letters[b]) for a in range(len(letters)) for b in range(a + 1, len(letters))
+                                   if np.any(membership[a] & membership[b])}),
+    }
+
+def format_overlap_matrix(color_ranges, names=None):
+    """ Tabela de texto com a sobreposição em % do menor range de cada par. """
+    letters, overlap = overlap_matrix(color_ranges)
+    volumes = np.diag(overlap)
+    labels = [(names or {}).get(c, c)[:8] for c in letters]
+    lines = ["         " + " ".join(f"{label:>8}" for label in labels)]
+    for i, label in enumerate(labels):
+        cells = []
+        for j in range(len(letters)):
+            if i == j:
+                cells.append(f"{'-':>8}")
+            else:
+                smaller = max(min(volumes[i], volumes[j]), 1)
+                cells.append(f"{100.0 * overlap[i, j] / smaller:7.1f}%")
+        lines.append(f"{label:>8} " + " ".join(cells))
+    return "\n".join(lines)
@@ -0,0 +1,94 @@
+# Cubo virtual: estado como string Kociemba de 54 letras e movimentos como permutações.
+# As permutações são geradas a partir da geometria 3D dos stickers (posição + normal),
+# independentes das funções state_* do solver, então servem para conferi-las.
+FACES = "URFDLB"
+SOLVED = "".join(face * 9 for face in FACES)
+
+# Para cada face: normal, direção "direita" e direção "baixo" da face vista de fora,
+# na orientação da string Kociemba (x = R, y = U, z = F)
+FACE_AXES = {
+    'U': ((0, 1, 0), (1, 0, 0), (0, 0, 1)),
+    'R': ((1, 0, 0), (0, 0, -1), (0, -1, 0)),
+    'F': ((0, 0, 1), (1, 0, 0), (0, -1, 0)),
+    'D': ((0, -1, 0), (1, 0, 0), (0, 0, -1)),
+    'L': ((-1, 0, 0), (0, 0, 1), (0, -1, 0)),
+    'B': ((0, 0, -1), (-1, 0, 0), (0, -1, 0)),
+}
+
+
+def _stickers():
+    """ (posição, normal) de cada um dos 54 stickers, na ordem da string Kociemba. """
+    stickers = []
+    for face in FACES:
+        normal, right, down = FACE_AXES[face]
+        for row in range(3):
+            for col in range(3):
+                pos = tuple(normal[i] + (col - 1) * right[i] + (row - 1) * down[i] for i in range(3))
+                stickers.append((pos, normal))
+    return stickers
+
+STICKERS = _stickers()
+_STICKER_INDEX = {sticker: i for i, sticker in enumerate(STICKERS)}
+
+def _turn(v, axis):
+    """ Gira o vetor 90 graus no sentido horário, visto de fora da face cuja normal é axis. """
+    x, y, z = v
+    ax, ay, az = axis
+    if ax: return (x, z, -y) if ax > 0 else (x, -z, y)
+    if ay: return (-z, y, x) if ay > 0 else (z, y, -x)
+    return (y, -x, z) if az > 0 else (-y, x, z)
+
+def _quarter_turn(axis, whole_cube=False):
+    """ Permutação (gather: novo[j] = antigo[perm[j]]) de um quarto de volta em torno de axis. """
+    perm = list(range(54))
+    for i, (pos, normal) in enumerate(STICKERS):
+        if whole_cube or sum(p * a for p, a in zip(pos, axis)) > 0:
+            perm[_STICKER_INDEX[(_turn(pos, axis), _turn(normal, axis))]] = i
+    return perm
+
+def compose(first, second):
+    """ Permutação equivalente a aplicar first e depois second. """
+    return [first[i] for i in second]
+
+def _with_variants(perm):
+    """ (X, X', X2) a partir do quarto de volta X. """
+    double = compose(perm, perm)
+    return perm, compose(double, perm), double
+
+MOVES = {} # Nome -> permutação (gather)
+for _face in FACES:
+    MOVES[_face], MOVES[_face + "'"], MOVES[_face + "2"] = _with_variants(_quarter_turn(FACE_AXES[_face][0]))
+
+# Giros do cubo inteiro com os nomes do solver: "Y'" = virar para a esquerda (a face R vem para a frente,
+# o y da notação padrão) e "Y" = virar para a direita (a face L vem para a frente).
+_left, _, _ = _with_variants(_quarter_turn((0, 1, 0), whole_cube=True))
+CUBE_ROTATIONS = {"Y'": _left, "Y": compose(compose(_left, _left), _left)}
+STEPS = dict(MOVES, **CUBE_ROTATIONS) # Tudo o que o solver pode pedir numa instrução
+
+
+def apply_moves(facelets, moves):
+    """ Aplica uma sequência de movimentos/giros (lista ou string separada por espaços). """
+    if isinstance(moves, str):
+        moves = moves.split()
+    for move in moves:
+        perm = STEPS.get(move)
+        if perm is None:
+            raise ValueError(f"Movimento '{move}' desconhecido.")
+        facelets = "".join(facelets[i] for i in perm)
+    return facelets
+
+def random_scramble(rng, length=20):
+    """ Embaralhamento aleatório (nunca a mesma face duas vezes seguidas). rng: random.Random. """
+    moves, last_face = [], None
+    while len(moves) < length:
+        face = rng.choice(FACES)
+        if face == last_face:
+            continue
+        moves.append(face + rng.choice(("", "'", "2")))
+        last_face = face
+    return moves
+
+def face_letters(facelets, face):
+    """ As 9 letras de uma face, na mesma ordem em que o scan as lê na grade. """
+    k = FACES.index(face)
+    return facelets[9 * k:9 * k + 9]
@@ -0,0 +1,119 @@
+# Thread de exibição: cv2.imshow/cv2.waitKey rodam fora do loop de deteção.
+# A deteção entrega frames anotados numa fila limitada; se a exibição ficar para trás,
+# o frame mais antigo é descartado. As teclas e o fecho das janelas voltam por flags.
+import collections
+import queue
+import threading
+import time
+
+import cv2
+
+QUEUE_SIZE = 2          # Frames pendentes no máximo (mais que isso = descarta o mais antigo)
+REPORT_INTERVAL = 5.0   # Segundos entre relatórios de taxa (deteção x exibição)
+
+
+class DisplayThread:
+    """
+    Dona das janelas do OpenCV. setup() roda dentro da thread (cria janelas/trackbars),
+    já que em algumas plataformas as janelas só recebem eventos da thread que as criou.
+    """
+
+    def __init__(self, setup=None, trackbar_window=None, trackbar_names=(), headless=False):
+        self.frames = queue.Queue(maxsize=QUEUE_SIZE)
+        self.keys = collections.deque(maxlen=16)
+        self.setup = setup
+        self.trackbar_window = trackbar_window
+        self.trackbar_names = list(trackbar_names)
+        self.trackbar_values = {} # Cópia das posições, lida pela thread de deteção
+        self.closed = False       # Alguma janela foi fechada pelo usuário
+        self.headless = headless  # Sem janelas (simulação/servidor): os frames só são consumidos e contados
+        self.running = False
+        self.rendered = self.dropped = self.detected = 0
+        self.thread = threading.Thread(target=self._run, name="exibicao", daemon=True)
+        self.ready = threading.Event()
+
+    def start(self):
+        self.running = True
+        self.thread.start()
+        self.ready.wait(timeout=5.0) # Espera as janelas/trackbars existirem
+        return self
+
+    def stop(self):
+        self.running = False
+        if self.thread.is_alive():
+            self.thread.join(timeout=2.0)
+
+    # --- Chamado pela thread de deteção ---
+    def show(self, window, frame):
+        """ Entrega um frame para exibição sem bloquear (descarta o mais antigo se a fila estiver cheia). """
+        self.show_windows({window: frame})
+
+    def show_windows(self, frames):
+        """ Como show(), mas para várias janelas de uma vez ({janela: frame}); contam como um único item. """
+        item = list(frames.items())
+        try:
+            self.frames.put_nowait(item)
+        except queue.Full:
+            try:
+                self.frames.get_nowait()
+                self.dropped += 1
+            except queue.Empty:
+                pass
+            try: self.frames.put_nowait(item)
+            except queue.Full: self.dropped += 1
+
+    def tick_detection(self):
+        """ Conta um frame processado pela deteção (para o relatório de taxas). """
+        self.detected += 1
+
+    def poll_key(self):
+        """ Próxima tecla pressionada (código & 0xFF) ou -1. """
+        try: return self.keys.popleft()
+        except IndexError: return -1
+
+    # --- Thread de exibição ---
+    def _run(self):
+        if self.setup is not None and not self.headless:
+            self.setup()
+        self._read_trackbars()
+        self.ready.set()
+
+        shown_windows = set()
+        last_report = time.time()
+        last_rendered = last_detected = 0
+        while self.running:
+            try:
+                for window, frame in self.frames.get(timeout=0.03):
+                    if not self.headless:
+                        cv2.imshow(window, frame)
+                        shown_windows.add(window)
+                self.rendered += 1
+            except queue.Empty:
+                pass
+
+            if not self.headless:
+                key = cv2.waitKey(1) & 0xFF
+                if key != 0xFF:
+                    self.keys.append(key)
+                self._read_trackbars()
+
+                for window in shown_windows:
+                    if cv2.getWindowProperty(window, cv2.WND_PROP_VISIBLE) < 1:
+                        self.closed = True
+
+            now = time.time()
+            if now - last_report >= REPORT_INTERVAL:
+                elapsed = now - last_report
+                print(f"DEBUG: Deteção {(self.detected - last_detected) / elapsed:.1f} fps | "
+                      f"Exibição {(self.rendered - last_rendered) / elapsed:.1f} fps | "
+                      f"Frames descartados na exibição: {self.dropped}")
+                last_report, last_rendered, last_detected = now, self.rendered, self.detected
+
+        if not self.headless:
+            cv2.destroyAllWindows()
+            for _ in range(5): cv2.waitKey(1)
+
+    def _read_trackbars(self):
+        if self.trackbar_window is None or self.headless:
+            return
+        self.trackbar_values = {name: cv2.getTrackbarPos(name, self.trackbar_window) for name in self.trackbar_names}
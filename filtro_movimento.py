@@ -0,0 +1,112 @@
+# Filtro de movimento/nitidez: decide, com um custo mínimo, se um frame precisa
+# ser classificado, se pode reaproveitar o resultado anterior ou se deve ser ignorado.
+import cv2
+import numpy as np
+
+from memoria_frames import FramePool
+
+# --- Configurações do filtro ---
+GATE_SIZE = 48            # Lado (px) da miniatura em tons de cinza da região da grade
+GATE_MARGIN = 25          # Margem (px) em volta dos centros da grade
+STATIC_DIFF = 2.0         # Diferença média (0-255) abaixo da qual a cena é considerada parada
+MOTION_DIFF = 12.0        # Diferença média entre frames seguidos acima da qual há movimento
+BLUR_RATIO = 0.45         # Nitidez abaixo desta fração da média recente = frame borrado
+MIN_SHARPNESS = 15.0      # Nitidez absoluta mínima (variância do Laplaciano)
+MAX_REUSE = 15            # Força uma nova classificação após N reaproveitamentos seguidos
+MAX_BLUR_DISCARDS = 10    # Após N frames "borrados" seguidos (relativos ou abaixo do mínimo), a média recomeça
+
+
+class MotionGate:
+    """
+    Compara uma miniatura da região da grade com o frame anterior e com o último
+    frame classificado. Retorna CLASSIFY, REUSE ou DISCARD.
+    """
+    CLASSIFY = "classify"
+    REUSE = "reuse"
+    DISCARD = "discard"
+
+    def __init__(self, centers):
+        xs = [x for x, _ in centers]
+        ys = [y for _, y in centers]
+        self.x0, self.x1 = max(min(xs) - GATE_MARGIN, 0), max(xs) + GATE_MARGIN
+        self.y0, self.y1 = max(min(ys) - GATE_MARGIN, 0), max(ys) + GATE_MARGIN
+        self.pool = FramePool("filtro_movimento")
+        self.thumb = np.empty((GATE_SIZE, GATE_SIZE), dtype=np.uint8)
+        self._previous_buffer = np.empty_like(self.thumb)
+        self._reference_buffer = np.empty_like(self.thumb)
+        self._diff = np.empty_like(self.thumb)
+        self._laplacian = np.empty((GATE_SIZE, GATE_SIZE), dtype=np.float32)
+        self.reset()
+
+    def reset(self):
+        """ Esquece o histórico (ex: novo movimento) e zera as contagens; os buffers ficam. """
+        self.previous = None       # Miniatura do frame anterior
+        self.reference = None      # Miniatura do último frame classificado
+        self.sharpness_avg = None  # Média móvel da nitidez dos frames aceitos
+        self.sharpness = 0.0       # Nitidez do último frame (a varredura guarda o frame mais nítido)
+        self.reuse_count = 0
+        self.blur_count = 0        # Frames descartados por nitidez seguidos
+        self.counts = {self.CLASSIFY: 0, self.REUSE: 0, self.DISCARD: 0}
+
+    def _thumbnail(self, frame):
+        roi = frame[self.y0:self.y1, self.x0:self.x1]
+        if roi.size == 0:
+            return None
+        gray = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY, dst=self.pool.get("gray", roi.shape[:2]))
+        return cv2.resize(gray, (GATE_SIZE, GATE_SIZE), dst=self.thumb, interpolation=cv2.INTER_AREA)
+
+    def _mean_diff(self, a, b):
+        return cv2.mean(cv2.absdiff(a, b, dst=self._diff))[0]
+
+    def check(self, frame):
+        """ Decide o que fazer com o frame (BGR, já espelhado). """
+        thumb = self._thumbnail(frame)
+        if thumb is None:
+            return self._count(self.CLASSIFY)
+
+        moved = self.previous is not None and self._mean_diff(thumb, self.previous) > MOTION_DIFF
+        np.copyto(self._previous_buffer, thumb)
+        self.previous = self._previous_buffer
+        _, stddev = cv2.meanStdDev(cv2.Laplacian(thumb, cv2.CV_32F, dst=self._laplacian))
+        sharpness = float(stddev[0, 0]) ** 2
+        self.sharpness = sharpness
+
+        # Movimento rápido entre frames seguidos (ex: no meio de um giro)
+        if moved:
+            self.blur_count = 0
+            return self._count(self.DISCARD)
+
+        # Frame borrado: abaixo da nitidez mínima absoluta ou da fração da média recente. Se a cena
+        # ficar parada e "borrada" por muito tempo, a nitidez mudou de vez (ex: face lisa, quase
+        # resolvida, num fundo liso): a média recomeça a partir deste frame em vez de descartar todos
+        # os seguintes. Com uma média abaixo do mínimo absoluto (cena aceite sem textura), só a
+        # comparação relativa continua a valer.
+        floor = MIN_SHARPNESS if self.sharpness_avg is None or self.sharpness_avg >= MIN_SHARPNESS else 0.0
+        blurred = sharpness < floor or \
+                  (self.sharpness_avg is not None and sharpness < BLUR_RATIO * self.sharpness_avg)
+        if blurred:
+            self.blur_count += 1
+            if self.blur_count < MAX_BLUR_DISCARDS:
+                return self._count(self.DISCARD)
+            self.sharpness_avg = None
+        self.blur_count = 0
+        self.sharpness_avg = sharpness if self.sharpness_avg is None else 0.9 * self.sharpness_avg + 0.1 * sharpness
+
+        # Nada mudou desde a última classificação: reaproveita o resultado
+        if self.reference is not None and self.reuse_count < MAX_REUSE and \
+           self._mean_diff(thumb, self.reference) < STATIC_DIFF:
+            self.reuse_count += 1
+            return self._count(self.REUSE)
+
+        np.copyto(self._reference_buffer, thumb)
+        self.reference = self._reference_buffer
+        self.reuse_count = 0
+        return self._count(self.CLASSIFY)
+
+    def _count(self, decision):
+        self.counts[decision] += 1
+        return decision
+
+    def summary(self):
+        total = sum(self.counts.values()) or 1
+        return ", ".join(f"{k}: {v} ({100.0 * v / total:.0f}%)" for k, v in self.counts.items())
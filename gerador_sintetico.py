@@ -0,0 +1,183 @@
+# Gerador de frames sintéticos de uma face do cubo, alinhados com a grade do solver.
+# Permite medir a taxa e a precisão da deteção sem ninguém a segurar o cubo na frente
+# da webcam: cada frame tem ruído, desfoque, mudança de luz e desalinhamento configuráveis.
+#
+# Uso (benchmark): python gerador_sintetico.py [--frames 2000] [--noise 6] [--blur 3] [--light 0.15]
+#                                               [--shift 4] [--rotation 2] [--seed 0]
+import argparse
+import time
+
+import cv2
+import numpy as np
+
+from cubo_virtual import FACES, face_letters
+
+FRAME_SIZE = (480, 640)   # (altura, largura), igual ao perfil de câmara padrão
+STICKER_SIZE = 56         # Lado do sticker (px); a grade tem 70 px entre centros
+CUBE_MARGIN = 42          # Corpo preto do cubo em volta dos centros externos
+BACKGROUND = (70, 70, 70)
+
+# Cores BGR típicas de um cubo real (não dependem da calibração, para poder compará-las)
+DEFAULT_PALETTE = {
+    'U': (235, 235, 235), # Branco
+    'R': (40, 30, 190),   # Vermelho
+    'F': (70, 170, 40),   # Verde
+    'D': (40, 215, 230),  # Amarelo
+    'L': (30, 120, 245),  # Laranja
+    'B': (180, 90, 20),   # Azul
+}
+
+
+def random_facelets(rng):
+    """ 54 stickers aleatórios (centros fixos), na ordem da string Kociemba. Não é um estado válido do cubo. """
+    letters = rng.choice(list(FACES), size=54)
+    for k, face in enumerate(FACES):
+        letters[9 * k + 4] = face
+    return "".join(letters)
+
+
+class SyntheticCubeRenderer:
+    """
+    Desenha uma face do cubo na grade. A imagem limpa de cada face fica em cache; por frame
+    só entram as perturbações (desalinhamento, luz, desfoque e ruído) em buffers reaproveitados.
+    """
+
+    def __init__(self, centers, frame_size=FRAME_SIZE, palette=None, noise=6.0, blur=3, light=0.15,
+                 shift=4.0, rotation=2.0, mirror=False, seed=None):
+        self.centers = centers
+        self.height, self.width = frame_size
+        self.palette = palette or DEFAULT_PALETTE
+        self.noise, self.blur, self.light = noise, blur, light
+        self.shift, self.rotation = shift, rotation
+        self.mirror = mirror # True: frame como a webcam entrega (o solver faz cv2.flip)
+        self.rng = np.random.default_rng(seed)
+        self.layers = {}
+        self.warped = np.empty((self.height, self.width, 3), dtype=np.uint8)
+        self.noise_buffer = np.empty((self.height, self.width, 3), dtype=np.int16)
+        self.frame = np.empty((self.height, self.width, 3), dtype=np.uint8)
+        self.mirrored = np.empty((self.height, self.width, 3), dtype=np.uint8)
+        xs = [x for x, _ in centers]
+        ys = [y for _, y in centers]
+        self.pivot = (float(sum(xs)) / len(xs), float(sum(ys)) / len(ys))
+
+    def face_layer(self, letters):
+        """ Face sem perturbações (em cache por sequência de letras). """
+        key = "".join(letters)
+        layer = self.layers.get(key)
+        if layer is None:
+            layer = np.full((self.height, self.width, 3), BACKGROUND, dtype=np.uint8)
+            xs = [x for x, _ in self.centers]
+            ys = [y for _, y in self.centers]
+            cv2.rectangle(layer, (min(xs) - CUBE_MARGIN, min(ys) - CUBE_MARGIN),
+                          (max(xs) + CUBE_MARGIN, max(ys) + CUBE_MARGIN), (15, 15, 15), -1)
+            half = STICKER_SIZE // 2
+            for (x, y), letter in zip(self.centers, key):
+                cv2.rectangle(layer, (x - half, y - half), (x + half, y + half), self.palette[letter], -1)
+            self.layers[key] = layer
+        return layer
+
+    def render(self, letters):
+        """ Um frame BGR da face com perturbações aleatórias. O array é reaproveitado no próximo render. """
+        rng = self.rng
+        angle = rng.uniform(-self.rotation, self.rotation)
+        matrix = cv2.getRotationMatrix2D(self.pivot, angle, 1.0)
+        matrix[:, 2] += rng.uniform(-self.shift, self.shift, size=2)
+        cv2.warpAffine(self.face_layer(letters), matrix, (self.width, self.height), dst=self.warped,
+                       borderMode=cv2.BORDER_CONSTANT, borderValue=BACKGROUND)
+
+        gains = 1.0 + rng.uniform(-self.light, self.light, size=3) # Luz mais quente/fria/escura
+        cv2.multiply(self.warped, (float(gains[0]), float(gains[1]), float(gains[2]), 0.0), dst=self.warped)
+        if self.blur > 1:
+            k = self.blur | 1
+            cv2.GaussianBlur(self.warped, (k, k), 0, dst=self.warped)
+        if self.noise > 0:
+            cv2.randn(self.noise_buffer, 0, self.noise)
+            cv2.add(self.warped, self.noise_buffer, dst=self.frame, dtype=cv2.CV_8U)
+        else:
+            self.frame[...] = self.warped
+        if self.mirror:
+            return cv2.flip(self.frame, 1, dst=self.mirrored)
+        return self.frame
+
+
+def benchmark(frames=2000, seed=0, **perturbations):
+    """ Mede a geração e a deteção (scan e verificação) e a precisão contra o estado verdadeiro. """
+    import solver_interativo_setas as solver
+    from classificador_cores import sticker_scores, scores_to_letters, StickerAccumulator
+    from normalizacao_luz import IlluminationNormalizer
+
+    rng = np.random.default_rng(seed)
+    renderer = SyntheticCubeRenderer(solver.grid_centers, seed=seed, **perturbations)
+    reference_white = solver.profiles[solver.active_profile]["reference_white"]
+    letters = solver.lut_letters
+    identity_map = {l: l for l in FACES} # detect_face_from_webcam devolve as próprias letras
+
+    facelets = random_facelets(rng)
+    faces = [face_letters(facelets, face) for face in FACES]
+    for face in faces: renderer.face_layer(face) # Caches fora da medição
+
+    # --- Só geração ---
+    start = time.perf_counter()
+    for i in range(frames):
+        renderer.render(faces[i % 6])
+    render_time = time.perf_counter() - start
+
+    # --- Scan: LUT + acumulador de evidência ---
+    normalizer = IlluminationNormalizer(solver.grid_centers, reference_white)
+    accumulator = StickerAccumulator(letters)
+    correct = locks = wrong_locks = lock_frames = 0
+    face_index, frames_on_face = 0, 0
+    start = time.perf_counter()
+    for i in range(frames):
+        truth = faces[face_index]
+        hsv, roi_centers = normalizer.hsv_grid(renderer.render(truth))
+        scores = sticker_scores(hsv, roi_centers, solver.color_lut, len(letters))
+        normalizer.observe_scores(scores, letters)
+        correct += sum(a == b for a, b in zip(scores_to_letters(scores, letters), truth))
+        accumulator.update(scores)
+        frames_on_face += 1
+        locked = accumulator.face_letters()
+        if locked is not None:
+            locks += 1
+            wrong_locks += "".join(locked) != truth
+            lock_frames += frames_on_face
+            accumulator.reset()
+            face_index, frames_on_face = (face_index + 1) % 6, 0
+    scan_time = time.perf_counter() - start
+
+    # --- Verificação de movimentos: detect_face_from_webcam ---
+    normalizer = IlluminationNormalizer(solver.grid_centers, reference_white)
+    detected = face_ok = 0
+    start = time.perf_counter()
+    for i in range(frames):
+        truth = faces[i % 6]
+        result = solver.detect_face_from_webcam(renderer.render(truth), solver.grid_centers, identity_map, normalizer)
+        if result is not None:
+            detected += 1
+            face_ok += "".join(result[0]) == truth
+    verify_time = time.perf_counter() - start
+
+    print(f"Perturbações: {perturbations}")
+    print(f"Geração: {frames / render_time:.0f} fps")
+    print(f"Scan: {frames / scan_time:.0f} fps | stickers corretos {correct / (9 * frames):.1%} | "
+          f"faces registadas {locks} ({wrong_locks} erradas), {lock_frames / max(locks, 1):.1f} frames por face")
+    print(f"Verificação: {frames / verify_time:.0f} fps | faces detectadas {detected / frames:.1%} | "
+          f"faces corretas {face_ok / frames:.1%}")
+    return {
+        "render_fps": frames / render_time, "scan_fps": frames / scan_time, "verify_fps": frames / verify_time,
+        "sticker_accuracy": correct / (9 * frames), "locks": locks, "wrong_locks": wrong_locks,
+        "detect_rate": detected / frames, "face_accuracy": face_ok / frames,
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark da deteção com frames sintéticos.")
+    parser.add_argument("--frames", type=int, default=2000)
+    parser.add_argument("--noise", type=float, default=6.0, help="Desvio padrão do ruído (níveis de cinza)")
+    parser.add_argument("--blur", type=int, default=3, help="Tamanho do kernel do desfoque (0 = sem)")
+    parser.add_argument("--light", type=float, default=0.15, help="Variação máxima do ganho por canal")
+    parser.add_argument("--shift", type=float, default=4.0, help="Desalinhamento máximo (px)")
+    parser.add_argument("--rotation", type=float, default=2.0, help="Rotação máxima (graus)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    benchmark(args.frames, args.seed, noise=args.noise, blur=args.blur, light=args.light,
+              shift=args.shift, rotation=args.rotation)
@@ -0,0 +1,182 @@
+# Gravador compacto de sessões: guarda só os patches da grade, as letras detectadas
+# e os eventos (faces registadas, movimentos) num ficheiro binário append-only mapeado
+# em memória. Pode ser reproduzido pelo pipeline de deteção para testes de regressão.
+#
+# Formato:
+#   cabeçalho: b"CUBOREC1" + uint16 (pixels por patch)
+#   registos:  uint8 tipo + float64 timestamp + uint32 tamanho + payload
+#              tipo 0 marca o fim (a área pré-alocada está zerada)
+#
+# Uso (replay): python gravador_sessao.py gravacoes/sessao_20260101_120000.rec
+import json
+import mmap
+import struct
+import sys
+import time
+
+import numpy as np
+
+FILE_MAGIC = b"CUBOREC1"
+FILE_HEADER = struct.Struct("<8sH")
+RECORD_HEADER = struct.Struct("<BdI")
+CHUNK_BYTES = 4 * 1024 * 1024 # O ficheiro cresce em blocos deste tamanho
+
+REC_PATCHES = 1 # 9 patches BGR (uint8), antes da normalização de iluminação
+REC_LETTERS = 2 # 9 letras ASCII detectadas no frame
+REC_EVENT = 3   # Evento JSON (face_locked, scan_complete, solution, move_done, ...)
+
+
+class SessionRecorder:
+    """ Escreve registos num ficheiro mapeado em memória; cada escrita é só uma cópia de bytes. """
+
+    def __init__(self, path, patch_pixels):
+        self.path = path
+        self.patch_pixels = patch_pixels
+        self.file = open(path, "w+b")
+        self.file.truncate(CHUNK_BYTES)
+        self.map = mmap.mmap(self.file.fileno(), CHUNK_BYTES)
+        self.offset = 0
+        self._write(FILE_HEADER.pack(FILE_MAGIC, patch_pixels))
+
+    def _ensure(self, size):
+        if self.offset + size <= len(self.map):
+            return
+        new_size = len(self.map) + max(CHUNK_BYTES, size)
+        self.map.flush()
+        self.map.close()
+        self.file.truncate(new_size)
+        self.map = mmap.mmap(self.file.fileno(), new_size)
+
+    def _write(self, data):
+        self._ensure(len(data))
+        self.map[self.offset:self.offset + len(data)] = data
+        self.offset += len(data)
+
+    def _append(self, kind, payload):
+        size = RECORD_HEADER.size + len(payload)
+        self._ensure(size)
+        RECORD_HEADER.pack_into(self.map, self.offset, kind, time.time(), len(payload))
+        start = self.offset + RECORD_HEADER.size
+        self.map[start:start + len(payload)] = payload
+        self.offset += size
+
+    def patches(self, patches):
+        """ patches: array (9, P, 3) uint8 com os pixels BGR de cada sticker. """
+        self._append(REC_PATCHES, np.ascontiguousarray(patches, dtype=np.uint8).tobytes())
+
+    def letters(self, letters):
+        self._append(REC_LETTERS, "".join(l if l else '?' for l in letters).encode("ascii"))
+
+    def event(self, kind, /, **data):
+        data["event"] = kind # kind é só posicional: os eventos podem ter um campo "name" (ex: profile)
+        self._append(REC_EVENT, json.dumps(data).encode("utf-8"))
+
+    def close(self):
+        if self.map is None:
+            return
+        self.map.flush()
+        self.map.close()
+        self.map = None
+        self.file.truncate(self.offset) # Remove a área pré-alocada que não foi usada
+        self.file.close()
+
+
+def read_records(path):
+    """ Gera (tipo, timestamp, dados) para cada registo. Os dados já vêm decodificados. """
+    with open(path, "rb") as f:
+        data = f.read()
+    magic, patch_pixels = FILE_HEADER.unpack_from(data, 0)
+    if magic != FILE_MAGIC:
+        raise ValueError(f"'{path}' não é uma gravação de sessão.")
+    offset = FILE_HEADER.size
+    while offset + RECORD_HEADER.size <= len(data):
+        kind, timestamp, length = RECORD_HEADER.unpack_from(data, offset)
+        if kind == 0:
+            break # Fim (área pré-alocada de uma gravação interrompida)
+        payload = data[offset + RECORD_HEADER.size:offset + RECORD_HEADER.size + length]
+        offset += RECORD_HEADER.size + length
+        if kind == REC_PATCHES:
+            yield kind, timestamp, np.frombuffer(payload, dtype=np.uint8).reshape(9, patch_pixels, 3)
+        elif kind == REC_LETTERS:
+            yield kind, timestamp, list(payload.decode("ascii"))
+        elif kind == REC_EVENT:
+            yield kind, timestamp, json.loads(payload.decode("utf-8"))
+
+def patches_to_image(patches):
+    """ Monta os 9 patches numa imagem 3x3 pequena. Retorna (imagem BGR, centros, raio). """
+    side = int(round(np.sqrt(patches.shape[1])))
+    tiles = patches.reshape(3, 3, side, side, 3)
+    image = np.ascontiguousarray(tiles.transpose(0, 2, 1, 3, 4).reshape(3 * side, 3 * side, 3))
+    centers = [(col * side + side // 2, row * side + side // 2) for row in range(3) for col in range(3)]
+    return image, centers, side // 2
+
+def replay(path):
+    """
+    Reproduz a gravação pelo pipeline de deteção atual e compara com o que foi gravado.
+    Começa no mesmo perfil de calibração que o solver ativa ao abrir e segue os eventos
+    "profile" gravados (escolha inicial e trocas durante a sessão).
+    """
+    from calibrated_colors import calibrated_values
+    try: from calibrated_colors import reference_white
+    except ImportError: reference_white = None
+    try: from calibrated_colors import calibration_profiles, active_profile as saved_active_profile
+    except ImportError: calibration_profiles, saved_active_profile = {}, None
+    from classificador_cores import build_color_lut, sticker_scores, scores_to_letters, StickerAccumulator
+    from normalizacao_luz import IlluminationNormalizer
+    from perfis_calibracao import load_profiles
+
+    profiles = load_profiles(calibration_profiles, calibrated_values, reference_white)
+    profile = saved_active_profile if saved_active_profile in profiles else next(iter(profiles))
+    lut, letters = build_color_lut(profiles[profile]["values"])
+    accumulator = StickerAccumulator(letters)
+    normalizer = None
+    frames = agree = replay_locks = recorded_locks = 0
+    pending_letters = None
+    events = []
+    start = time.perf_counter()
+
+    for kind, timestamp, data in read_records(path):
+        if kind == REC_PATCHES:
+            image, centers, radius = patches_to_image(data)
+            if normalizer is None:
+                normalizer = IlluminationNormalizer(centers, profiles[profile]["reference_white"])
+            hsv, roi_centers = normalizer.hsv_grid(image)
+            scores = sticker_scores(hsv, roi_centers, lut, len(letters), radius)
+            normalizer.observe_scores(scores, letters)
+            pending_letters = scores_to_letters(scores, letters)
+            accumulator.update(scores)
+            if accumulator.face_letters() is not None:
+                replay_locks += 1
+                accumulator.reset()
+            frames += 1
+        elif kind == REC_LETTERS and pending_letters is not None:
+            agree += pending_letters == data
+            pending_letters = None
+        elif kind == REC_EVENT:
+            events.append(data)
+            if data.get("event") == "face_locked":
+                recorded_locks += 1
+            elif data.get("event") == "profile" and data.get("name") != profile:
+                if data.get("name") not in profiles:
+                    print(f"Perfil '{data.get('name')}' da gravação não existe na calibração atual; continua '{profile}'.")
+                    continue
+                profile = data["name"]
+                lut, letters = build_color_lut(profiles[profile]["values"])
+                accumulator = StickerAccumulator(letters) # Índices das cores mudam com o perfil
+                if normalizer is not None:
+                    normalizer.set_reference(profiles[profile]["reference_white"])
+
+    elapsed = time.perf_counter() - start
+    print(f"Gravação: {path}")
+    print(f"Frames reproduzidos: {frames} em {elapsed:.3f}s ({frames / max(elapsed, 1e-9):.0f} fps)")
+    print(f"Leituras iguais às gravadas: {agree}/{frames}")
+    print(f"Faces registadas: gravação {recorded_locks}, replay {replay_locks}")
+    print(f"Perfil no fim: '{profile}'")
+    print(f"Eventos: {[e.get('event') for e in events]}")
+    return {"frames": frames, "agree": agree, "recorded_locks": recorded_locks, "replay_locks": replay_locks}
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Uso: python gravador_sessao.py <gravacao.rec>")
+        sys.exit(1)
+    replay(sys.argv[1])
@@ -0,0 +1,83 @@
+# Buffers de frame pré-alocados, reaproveitados através das saídas dst= do OpenCV.
+# Cada laço (scan, verificação, calibração) pede os seus buffers por nome; só há alocação
+# no primeiro pedido ou se o tamanho do frame mudar, e todas são contadas para que dê para
+# confirmar que, em regime, o laço não aloca nada. Os totais são acumulados desde o início
+# do processo: um pool descartado (ex: o de um objeto recriado a cada movimento) continua a contar.
+import numpy as np
+
+_totals = {"allocations": 0, "requests": 0} # Somados em todos os pools, vivos ou não
+
+
+class FramePool:
+    """ Buffers nomeados. get() devolve sempre o mesmo array enquanto a forma não mudar. """
+
+    def __init__(self, name=""):
+        self.name = name
+        self.buffers = {}
+        self.ring_positions = {}
+        self.allocations = 0
+        self.requests = 0
+
+    def get(self, name, shape, dtype=np.uint8):
+        self._count_request()
+        buffer = self.buffers.get(name)
+        if buffer is None or buffer.shape != tuple(shape) or buffer.dtype != dtype:
+            buffer = np.empty(shape, dtype=dtype)
+            self.buffers[name] = buffer
+            self._count_allocation()
+        return buffer
+
+    def ring(self, name, shape, size, dtype=np.uint8):
+        """
+        Alterna entre `size` buffers. Para frames entregues a outra thread (ex.: a exibição),
+        que ainda podem estar em uso quando o laço seguinte começa a desenhar.
+        """
+        position = self.ring_positions.get(name, 0)
+        self.ring_positions[name] = (position + 1) % size
+        return self.get(f"{name}#{position}", shape, dtype)
+
+    def peek(self, name):
+        """ Buffer já existente (ou None), para APIs que alocam sozinhas na primeira vez (ex.: VideoCapture.read). """
+        return self.buffers.get(name)
+
+    def keep(self, name, array):
+        """ Guarda um array criado fora do pool (conta como alocação se for um array novo). """
+        self._count_request()
+        if self.buffers.get(name) is not array:
+            self.buffers[name] = array
+            self._count_allocation()
+        return array
+
+    def _count_request(self):
+        self.requests += 1
+        _totals["requests"] += 1
+
+    def _count_allocation(self):
+        self.allocations += 1
+        _totals["allocations"] += 1
+
+
+def allocation_stats():
+    """ (alocações, pedidos) acumulados em todos os pools criados até agora. """
+    return _totals["allocations"], _totals["requests"]
+
+
+class AllocationMonitor:
+    """ Separa as alocações do aquecimento (primeiros frames) das alocações em regime. """
+
+    def __init__(self, warmup_frames=30):
+        self.warmup_frames = warmup_frames
+        self.frames = 0
+        self.warm_allocations = None
+
+    def tick(self):
+        self.frames += 1
+        if self.frames == self.warmup_frames:
+            self.warm_allocations = allocation_stats()[0]
+
+    def report(self):
+        allocations, requests = allocation_stats()
+        steady = None if self.warm_allocations is None else allocations - self.warm_allocations
+        steady_text = "?" if steady is None else str(steady)
+        return (f"Buffers: {allocations} alocações para {requests} pedidos em {self.frames} frames "
+                f"({steady_text} depois dos primeiros {self.warmup_frames} frames)")
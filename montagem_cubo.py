@@ -0,0 +1,168 @@
+# Montagem do cubo a partir de faces identificadas pelo centro, lidas em qualquer ordem e
+# em qualquer rotação. A rotação certa de cada face é a que forma peças possíveis: todas as
+# combinações (4 rotações por face) são testadas de uma vez como um array (M, 54), com tabelas
+# de cantos/arestas válidos, e só as poucas que sobram passam pelo validador completo.
+# Com só 5 faces lidas, a sexta sai das peças: cada canto dela tem 2 stickers visíveis (que já
+# identificam o canto) e cada aresta 1; as arestas que sobram, a orientação e a paridade
+# decidem o resto, e a sexta face só precisa ser lida se houver mais de uma resposta.
+# Em cubos pouco embaralhados várias rotações podem formar cubos válidos: nada é escolhido por
+# palpite; as faces que mudam entre as respostas são relidas na orientação canónica (fixed).
+from itertools import product
+
+import numpy as np
+
+from validador_cubo import CORNER_FACELETS, CORNER_COLORS, EDGE_FACELETS, EDGE_COLORS, validate_facelets
+
+FACES = "URFDLB"
+UNKNOWN = 6 # Código de um sticker ainda não lido
+_CODES = 7  # 6 cores + desconhecido
+
+# Rotação horária de uma face (gather sobre os 9 stickers, linha a linha)
+_QUARTER = [6, 3, 0, 7, 4, 1, 8, 5, 2]
+ROTATIONS = [list(range(9))]
+for _ in range(3):
+    ROTATIONS.append([ROTATIONS[-1][i] for i in _QUARTER])
+
+# Orientação canónica (a da string Kociemba): a face que fica em cima quando cada face é lida
+CANONICAL_TOP = {'U': 'B', 'R': 'U', 'F': 'U', 'D': 'F', 'L': 'U', 'B': 'U'}
+
+_CORNERS = np.array(CORNER_FACELETS, dtype=np.intp) # (8, 3)
+_EDGES = np.array(EDGE_FACELETS, dtype=np.intp)     # (12, 2)
+
+
+def _piece_tables(pieces, size):
+    """
+    Para cada combinação de códigos (com desconhecidos) de uma peça: se é possível, qual peça é
+    (-1 se ainda não dá para saber) e o código completo, se só houver uma maneira de completá-la
+    (-1 senão). Uma peça está identificada com 2 stickers conhecidos.
+    """
+    oriented = [] # (peça, cores na ordem dos stickers), todas as orientações
+    for piece, colors in enumerate(pieces):
+        codes = [FACES.index(c) for c in colors]
+        for turn in range(size):
+            oriented.append((piece, codes[turn:] + codes[:turn]))
+    possible = np.zeros(_CODES ** size, dtype=bool)
+    piece_id = np.full(_CODES ** size, -1, dtype=np.int8)
+    completion = np.full(_CODES ** size, -1, dtype=np.int16)
+    for combo in product(range(_CODES), repeat=size):
+        matches = [(piece, codes) for piece, codes in oriented
+                   if all(c == UNKNOWN or c == o for c, o in zip(combo, codes))]
+        index = int(np.ravel_multi_index(combo, (_CODES,) * size))
+        possible[index] = bool(matches)
+        if len({piece for piece, _ in matches}) == 1 and sum(c != UNKNOWN for c in combo) >= 2:
+            piece_id[index] = matches[0][0]
+        if len(matches) == 1:
+            completion[index] = int(np.ravel_multi_index(matches[0][1], (_CODES,) * size))
+    return possible, piece_id, completion
+
+# Cantos: só as rotações cíclicas (torcer um canto não troca a ordem das cores); arestas: as 2 ordens
+CORNER_POSSIBLE, CORNER_ID, CORNER_COMPLETION = _piece_tables(CORNER_COLORS, 3)
+EDGE_POSSIBLE, EDGE_ID, _ = _piece_tables(EDGE_COLORS, 2)
+
+
+def _has_repeated(ids):
+    """ (M,) bool: alguma peça identificada aparece duas vezes. """
+    ordered = np.sort(ids, axis=1)
+    return ((ordered[:, 1:] == ordered[:, :-1]) & (ordered[:, 1:] >= 0)).any(axis=1)
+
+def plausible(cubes):
+    """
+    (M,) bool para cubos (M, 54) com códigos 0-5 e UNKNOWN: nenhuma peça impossível ou repetida.
+    Não olha orientação total nem paridade (isso fica para o validador).
+    """
+    corner_codes = (cubes[:, _CORNERS[:, 0]].astype(np.intp) * _CODES + cubes[:, _CORNERS[:, 1]]) * _CODES + cubes[:, _CORNERS[:, 2]]
+    edge_codes = cubes[:, _EDGES[:, 0]].astype(np.intp) * _CODES + cubes[:, _EDGES[:, 1]]
+    ok = CORNER_POSSIBLE[corner_codes].all(axis=1) & EDGE_POSSIBLE[edge_codes].all(axis=1)
+    return ok & ~_has_repeated(CORNER_ID[corner_codes]) & ~_has_repeated(EDGE_ID[edge_codes])
+
+def rotate_letters(letters, turns):
+    """ Letras de uma face giradas `turns` quartos de volta no sentido horário. """
+    return [letters[i] for i in ROTATIONS[turns % 4]]
+
+def orientation_candidates(faces, fixed=()):
+    """
+    faces: {letra do centro: 9 letras como foram lidas}; faces em falta ficam desconhecidas.
+    fixed: faces lidas na orientação canónica (só a rotação 0 é testada).
+    Retorna (rotações (M, k), cubos (M, 54)) das combinações de rotação com peças possíveis,
+    onde k é o número de faces lidas, na ordem URFDLB.
+    """
+    known = [f for f in FACES if faces.get(f) is not None]
+    choices = [range(1) if f in fixed else range(4) for f in known]
+    turns = np.array(list(product(*choices)), dtype=np.intp).reshape(-1, len(known))
+    base = np.full((len(turns), 54), UNKNOWN, dtype=np.uint8)
+    base[:, 4::9] = np.arange(6) # Centros fixos
+    for k, face in enumerate(known):
+        codes = np.array([FACES.index(c) for c in faces[face]], dtype=np.uint8)
+        if codes[4] != FACES.index(face):
+            raise ValueError(f"Face {face} com o centro {faces[face][4]}.")
+        rotated = codes[np.array(ROTATIONS, dtype=np.intp)] # (4, 9)
+        start = 9 * FACES.index(face)
+        base[:, start:start + 9] = rotated[turns[:, k]]
+    keep = plausible(base)
+    return turns[keep], base[keep]
+
+def to_facelets(cube):
+    """ Cubo (54,) com códigos 0-5 -> string Kociemba. """
+    return "".join(FACES[c] for c in cube)
+
+def _distinct(cubes):
+    """ Cubos (M, 54) sem repetições. Faces simétricas dão o mesmo cubo em várias rotações (4096 no cubo resolvido). """
+    if len(cubes) < 2:
+        return cubes
+    rows = np.unique(np.ascontiguousarray(cubes).view(np.dtype((np.void, 54))).ravel()) # Cada cubo como um valor só
+    return np.frombuffer(rows.tobytes(), dtype=np.uint8).reshape(-1, 54)
+
+def assemble(faces, fixed=()):
+    """
+    Cubos válidos (strings Kociemba distintas) que as 6 faces formam em alguma rotação.
+    Um só = montagem certa; nenhum = alguma leitura errada; vários = rotações ambíguas
+    (comum em cubos pouco embaralhados): ver ambiguous_faces.
+    """
+    _, cubes = orientation_candidates(faces, fixed)
+    return [f for f in map(to_facelets, _distinct(cubes)) if validate_facelets(f)["ok"]]
+
+def ambiguous_faces(cubes):
+    """ Faces (ordem URFDLB) cujos stickers mudam entre os cubos válidos: lidas na orientação canónica, desfazem a ambiguidade. """
+    return [f for k, f in enumerate(FACES) if len({c[9 * k:9 * k + 9] for c in cubes}) > 1]
+
+def completions(cube):
+    """
+    Estados válidos que completam um cubo plausível (54,) com stickers UNKNOWN numa face.
+    Os cantos completam-se pela tabela; as escolhas das arestas são testadas todas de uma vez.
+    """
+    cube = cube.copy()
+    for facelets in CORNER_FACELETS:
+        index = list(facelets)
+        if UNKNOWN in cube[index]:
+            full = CORNER_COMPLETION[int(np.ravel_multi_index(cube[index], (_CODES,) * 3))]
+            if full < 0:
+                return []
+            cube[index] = np.unravel_index(int(full), (_CODES,) * 3)
+    open_stickers, options = [], []
+    for a, b in EDGE_FACELETS:
+        if cube[a] != UNKNOWN and cube[b] != UNKNOWN:
+            continue
+        unknown, known = (a, b) if cube[a] == UNKNOWN else (b, a)
+        pairs = [(c, cube[known]) if unknown == a else (cube[known], c) for c in range(6)]
+        open_stickers.append(unknown)
+        options.append([c for c, pair in zip(range(6), pairs) if EDGE_POSSIBLE[pair[0] * _CODES + pair[1]]])
+    candidates = np.repeat(cube[None, :], max(1, int(np.prod([len(o) for o in options]))), axis=0)
+    if open_stickers:
+        candidates[:, open_stickers] = np.array(list(product(*options)), dtype=np.uint8).reshape(len(candidates), -1)
+    candidates = candidates[plausible(candidates) & (candidates != UNKNOWN).all(axis=1)]
+    return [f for f in map(to_facelets, candidates) if validate_facelets(f)["ok"]]
+
+def infer_missing_face(faces, fixed=()):
+    """ Cubos válidos (distintos) que completam 5 faces lidas (qualquer rotação, menos as fixed). """
+    if sum(faces.get(f) is not None for f in FACES) != 5:
+        raise ValueError("São precisas exatamente 5 faces.")
+    _, cubes = orientation_candidates(faces, fixed)
+    return sorted({facelets for cube in _distinct(cubes) for facelets in completions(cube)})
+
+def misread_faces(faces, fixed=()):
+    """
+    Com 6 faces que não formam nenhum cubo válido: as faces que, deixadas de fora, permitem
+    completar o cubo pelas outras 5. Se for uma só, é ela a leitura errada. Ao contrário do
+    validador, não depende de as faces terem sido lidas na orientação canónica.
+    """
+    return [f for f in FACES if infer_missing_face({g: faces[g] for g in FACES if g != f}, fixed)]
@@ -0,0 +1,152 @@
+# Motor de cubos vetorizado: N cubos num array (N, 54) de uint8 (0-5 = U R F D L B, na ordem
+# da string Kociemba) e cada movimento como um gather único sobre todos eles. Usa as mesmas
+# permutações do cubo_virtual, então concorda com o solver e com a simulação.
+#
+# Uso (conferir soluções): python motor_vetorizado.py [--cubos 1000000] [--scramble 20] [--seed 0]
+import argparse
+import time
+from functools import lru_cache
+
+import numpy as np
+
+from cubo_virtual import FACES, SOLVED, STEPS, compose, random_scramble
+
+IDENTITY = "" # Passo "vazio", usado para completar sequências de tamanhos diferentes
+STEP_NAMES = [IDENTITY] + list(STEPS)
+STEP_INDEX = {name: i for i, name in enumerate(STEP_NAMES)}
+STEP_TABLE = np.array([list(range(54))] + [STEPS[name] for name in STEP_NAMES[1:]], dtype=np.intp) # (passos, 54)
+CENTERS = np.repeat(np.arange(4, 54, 9), 9) # Índice do centro da face de cada sticker
+CHUNK = 100_000 # Cubos por bloco nas validações em massa (~5 MB por bloco)
+
+_LETTER_CODES = np.full(256, 255, dtype=np.uint8) # Byte ASCII -> 0-5 (255 = letra inválida)
+for _code, _letter in enumerate(FACES):
+    _LETTER_CODES[ord(_letter)] = _code
+_CODE_LETTERS = np.frombuffer(FACES.encode("ascii"), dtype=np.uint8)
+
+
+def _split(moves):
+    return moves.split() if isinstance(moves, str) else list(moves)
+
+def solved(n=1):
+    """ N cubos resolvidos. """
+    return np.tile(from_strings([SOLVED]), (n, 1))
+
+def from_strings(facelets):
+    """ Strings Kociemba (54 letras URFDLB, como o main() monta) -> array (N, 54). """
+    facelets = list(facelets)
+    raw = np.frombuffer("".join(facelets).encode("ascii"), dtype=np.uint8)
+    if raw.size != 54 * len(facelets):
+        raise ValueError("Cada estado precisa de exatamente 54 letras.")
+    cubes = _LETTER_CODES[raw].reshape(len(facelets), 54)
+    if (cubes == 255).any():
+        raise ValueError(f"Letra fora de {FACES} num estado.")
+    return cubes
+
+def to_strings(cubes):
+    """ Array (N, 54) -> lista de strings Kociemba. """
+    letters = _CODE_LETTERS[np.asarray(cubes)]
+    return [row.tobytes().decode("ascii") for row in letters]
+
+@lru_cache(maxsize=4096)
+def _sequence_permutation(moves):
+    perm = list(range(54))
+    for move in moves:
+        step = STEPS.get(move)
+        if step is None:
+            raise ValueError(f"Movimento '{move}' desconhecido.")
+        perm = compose(perm, step)
+    return np.array(perm, dtype=np.intp)
+
+def sequence_permutation(moves):
+    """ Permutação (gather) equivalente a uma sequência inteira (lista ou string). Em cache. """
+    return _sequence_permutation(tuple(_split(moves)))
+
+def apply_moves(cubes, moves, out=None):
+    """ Mesma sequência em todos os cubos: a sequência vira uma permutação e há um só gather. """
+    return np.take(cubes, sequence_permutation(moves), axis=1, out=out)
+
+def encode_sequences(sequences):
+    """ Sequências (uma por cubo, tamanhos diferentes) -> índices (N, L), completados com o passo vazio. """
+    sequences = [_split(s) for s in sequences]
+    length = max((len(s) for s in sequences), default=0)
+    encoded = np.zeros((len(sequences), length), dtype=np.uint8)
+    for row, sequence in enumerate(sequences):
+        try:
+            encoded[row, :len(sequence)] = [STEP_INDEX[move] for move in sequence]
+        except KeyError as e:
+            raise ValueError(f"Movimento {e} desconhecido (sequência {row}).")
+    return encoded
+
+def apply_sequences(cubes, encoded):
+    """
+    Uma sequência diferente por cubo (índices de encode_sequences). Cada coluna é um gather
+    sobre todos os cubos ao mesmo tempo: o custo é L gathers, não N * L.
+    """
+    cubes = np.asarray(cubes)
+    rows = np.arange(cubes.shape[0])[:, None]
+    for column in np.asarray(encoded).T:
+        cubes = cubes[rows, STEP_TABLE[column]]
+    return cubes
+
+def is_solved(cubes):
+    """ (N,) bool: cada face com uma cor só (aceita o cubo em qualquer orientação). """
+    cubes = np.asarray(cubes)
+    return (cubes == cubes[:, CENTERS]).all(axis=1)
+
+def validate_solutions(states, solutions, chunk=CHUNK):
+    """
+    Confere em massa se cada solução resolve o estado correspondente.
+    states: strings Kociemba ou array (N, 54); solutions: sequências (listas ou strings).
+    Retorna (N,) bool. Processa em blocos para limitar a memória.
+    """
+    if not isinstance(states, np.ndarray):
+        states = from_strings(states)
+    solutions = list(solutions)
+    if len(solutions) != states.shape[0]:
+        raise ValueError("É preciso uma solução por estado.")
+    result = np.empty(states.shape[0], dtype=bool)
+    for start in range(0, states.shape[0], chunk):
+        stop = start + chunk
+        result[start:stop] = is_solved(apply_sequences(states[start:stop], encode_sequences(solutions[start:stop])))
+    return result
+
+def inverse(moves):
+    """ Sequência inversa (desfaz moves). """
+    inverted = []
+    for move in reversed(_split(moves)):
+        if move.endswith("2"): inverted.append(move)
+        elif move.endswith("'"): inverted.append(move[:-1])
+        else: inverted.append(move + "'")
+    return inverted
+
+
+def benchmark(n=1_000_000, scramble_length=20, seed=0):
+    """ Embaralha N cubos e confere que a sequência inversa resolve todos (conferência do motor). """
+    import random
+    rng = random.Random(seed)
+    scrambles = [random_scramble(rng, scramble_length) for _ in range(min(n, 10_000))]
+    scrambles = [scrambles[i % len(scrambles)] for i in range(n)] # Geração em Python é o gargalo; repete
+    solutions = [inverse(s) for s in scrambles]
+
+    start = time.perf_counter()
+    encoded_scrambles = encode_sequences(scrambles)
+    encoded_solutions = encode_sequences(solutions)
+    encode_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    ok = np.empty(n, dtype=bool)
+    for first in range(0, n, CHUNK):
+        cubes = apply_sequences(solved(min(CHUNK, n - first)), encoded_scrambles[first:first + CHUNK])
+        ok[first:first + CHUNK] = is_solved(apply_sequences(cubes, encoded_solutions[first:first + CHUNK]))
+    elapsed = time.perf_counter() - start
+    print(f"{n} cubos: codificação {encode_time:.2f}s | {2 * scramble_length} passos por cubo em {elapsed:.2f}s "
+          f"({2 * scramble_length * n / elapsed / 1e6:.1f} M movimentos/s) | resolvidos {ok.mean():.1%}")
+    return ok.all()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Conferência em massa de embaralhamentos e soluções.")
+    parser.add_argument("--cubos", type=int, default=1_000_000)
+    parser.add_argument("--scramble", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    benchmark(args.cubos, args.scramble, args.seed)
@@ -0,0 +1,92 @@
+# Normalização de iluminação aplicada só à região da grade (ROI).
+# Usa o branco como âncora: compara o branco visto agora com o branco de referência
+# (salvo pelo calibrador ou, na falta dele, o primeiro branco visto na sessão) e aplica
+# um ganho por canal BGR para trazer as cores de volta à luz da calibração.
+#
+# A âncora é o centro branco quando ele está na grade: o centro da face U é sempre branco,
+# então não depende de um sticker solto estar bem lido. Sem centro branco na grade, usa
+# os outros stickers lidos como brancos.
+# Limitação: o branco é escolhido pela classificação, que já usa a luz corrigida pelo
+# próprio ganho. Se a luz mudar tanto que o branco deixe de ser lido como branco (ou um
+# amarelo/cinza passe a sê-lo), a âncora segue a leitura errada e o ganho não se corrige
+# sozinho; ancorar no centro reduz esse risco, mas não elimina a circularidade.
+import cv2
+import numpy as np
+
+from classificador_cores import sample_patches
+from memoria_frames import FramePool
+
+ROI_MARGIN = 25           # Margem (px) em volta dos centros da grade
+WHITE_LETTER = 'U'        # Letra do branco (ver name_to_kociemba no calibrador)
+CENTER_INDEX = 4          # Sticker central da grade (define a cor da face)
+WHITE_MIN_FRACTION = 0.8  # Fração mínima de pixels brancos para o sticker servir de âncora
+WHITE_SMOOTHING = 0.2     # Peso de cada nova observação na média móvel do branco
+MIN_GAIN, MAX_GAIN = 0.5, 2.0
+
+
+class IlluminationNormalizer:
+    """ Recorta a ROI da grade, aplica o ganho de balanço de branco e devolve o HSV da ROI. """
+
+    def __init__(self, centers, reference_white=None):
+        xs = [x for x, _ in centers]
+        ys = [y for _, y in centers]
+        self.x0, self.y0 = max(min(xs) - ROI_MARGIN, 0), max(min(ys) - ROI_MARGIN, 0)
+        self.x1, self.y1 = max(xs) + ROI_MARGIN + 1, max(ys) + ROI_MARGIN + 1
+        self.roi_centers = [(x - self.x0, y - self.y0) for x, y in centers]
+        self.reference_white = None if reference_white is None else np.array(reference_white, dtype=np.float32)
+        self.current_white = None
+        self.last_roi = None # ROI BGR original do último frame (para observe)
+        self.pool = FramePool("normalizacao_luz") # ROI com ganho e HSV da ROI, reaproveitados a cada frame
+
+    def gains(self):
+        """ Ganho por canal (B, G, R), ou None se ainda não há branco observado. """
+        if self.reference_white is None or self.current_white is None:
+            return None
+        return np.clip(self.reference_white / np.maximum(self.current_white, 1.0), MIN_GAIN, MAX_GAIN)
+
+    def set_reference(self, reference_white):
+        """ Troca o branco de referência (ex.: outro perfil de calibração). None = ancora no próximo branco. """
+        self.reference_white = None if reference_white is None else np.array(reference_white, dtype=np.float32)
+
+    def hsv_grid(self, frame, normalize=True):
+        """
+        Retorna (hsv_roi, roi_centers) já com a iluminação normalizada (normalize=False: só recorta).
+        O hsv_roi é um buffer reaproveitado: só vale até a próxima chamada.
+        """
+        roi = frame[self.y0:self.y1, self.x0:self.x1]
+        self.last_roi = roi
+        gains = self.gains() if normalize else None
+        if gains is not None:
+            roi = cv2.multiply(roi, (float(gains[0]), float(gains[1]), float(gains[2]), 0.0),
+                               dst=self.pool.get("gain", roi.shape))
+        return cv2.cvtColor(roi, cv2.COLOR_BGR2HSV, dst=self.pool.get("hsv", roi.shape)), self.roi_centers
+
+    def observe(self, white_stickers):
+        """
+        Atualiza o branco atual com os stickers lidos como brancos no último frame.
+        white_stickers: máscara booleana (9,) dos stickers brancos.
+        """
+        if self.last_roi is None or not np.any(white_stickers):
+            return
+        patches = sample_patches(self.last_roi, self.roi_centers)
+        if patches is None:
+            return
+        white = patches[np.asarray(white_stickers)].reshape(-1, 3).mean(axis=0).astype(np.float32)
+        if self.reference_white is None:
+            self.reference_white = white # Sem calibração de branco: ancora no primeiro branco da sessão
+        if self.current_white is None:
+            self.current_white = white
+        else:
+            self.current_white = (1 - WHITE_SMOOTHING) * self.current_white + WHITE_SMOOTHING * white
+
+    def observe_scores(self, scores, letters):
+        """
+        Atalho para observe() a partir da saída de sticker_scores: ancora só no centro
+        quando ele é branco, senão em todos os stickers lidos como brancos.
+        """
+        if scores is None or WHITE_LETTER not in letters:
+            return
+        white = scores[:, letters.index(WHITE_LETTER)] >= WHITE_MIN_FRACTION
+        if white[CENTER_INDEX]:
+            white = np.arange(len(white)) == CENTER_INDEX
+        self.observe(white)
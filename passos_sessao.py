@@ -0,0 +1,182 @@
+# Passos da sessão partilhados pelo modo local (solver_interativo_setas.main) e pelo servidor
+# (servidor_sessoes.CubeSession): scan das faces (face a face ou por varredura), montagem das
+# rotações, dedução da sexta face, validação e confirmação de cada passo da resolução.
+# Não há câmara, janelas nem rede aqui: os passos recebem as leituras e devolvem eventos
+# ({"type": ...}), que cada ponto de entrada mostra, grava ou publica à sua maneira.
+from classificador_cores import StickerAccumulator
+from montagem_cubo import FACES, CANONICAL_TOP, assemble, ambiguous_faces, infer_missing_face, misread_faces
+from varredura_scan import SweepScanner
+
+STABLE_READINGS = 3 # Leituras seguidas iguais ao estado esperado para confirmar um passo
+KEPT_READINGS = 5   # Leituras guardadas pelo StepVerifier
+
+
+class CubeScan:
+    """
+    Scan de um cubo. update() recebe a saída de sticker_scores de cada frame classificado e
+    devolve os eventos; quando o cubo fica montado e validado, `complete` passa a True e
+    `faces` tem as 6 faces (letras na orientação da string Kociemba).
+    Se as rotações forem ambíguas (mais de um cubo válido), as leituras ficam e só as faces
+    que mudam entre as respostas são pedidas de novo, na orientação canónica (requested()).
+    Nada é escolhido por palpite; uma leitura errada também é relida assim, sozinha.
+    """
+
+    def __init__(self, letters, sweep=False):
+        self.sweep = sweep
+        self.accumulator = StickerAccumulator(letters) # Evidência por sticker da face atual
+        self.sweep_scanner = SweepScanner(letters)     # Melhor leitura por cor de centro (varredura)
+        self.reset()
+
+    def reset(self):
+        self.faces = {face: None for face in FACES} # Leituras face a face (e releituras canónicas)
+        self.fixed = set()   # Faces lidas na orientação canónica: a rotação já não é testada
+        self.requests = []   # Faces a reler na orientação canónica, pela ordem
+        self.armed = True    # False logo após um pedido: a face ainda está na grade na orientação antiga
+        self.complete = False
+        self.inference_tried = None # Conjunto de 5 faces para o qual a sexta já foi deduzida (ou não)
+        self.accumulator.reset()
+        self.sweep_scanner.reset()
+
+    def set_letters(self, letters):
+        """ Troca de perfil: os índices das cores mudam, mas as leituras guardadas (letras) continuam válidas. """
+        self.accumulator = StickerAccumulator(letters)
+        self.sweep_scanner.letters = letters
+
+    def scanned(self):
+        """ {centro: 9 letras como foram lidas} das faces já lidas. """
+        scanned = self.sweep_scanner.faces() if self.sweep else {}
+        scanned.update((face, letters) for face, letters in self.faces.items() if letters is not None)
+        return scanned
+
+    def moved(self):
+        """ O cubo mexeu (frame descartado pelo filtro de movimento): uma releitura pedida já pode começar. """
+        self.armed = True
+
+    def _request(self, face):
+        """ Pede a releitura de uma face na orientação canónica, só depois de o cubo mexer. """
+        self.requests = [face]
+        self.armed = False
+        self.accumulator.reset()
+
+    def requested(self):
+        """ Face a mostrar na orientação canónica (com CANONICAL_TOP[face] em cima), ou None. """
+        return self.requests[0] if self.requests else None
+
+    def reads_faces(self):
+        """ True se o próximo frame conta para uma leitura face a face (não para a varredura). """
+        return not self.sweep or bool(self.requests)
+
+    def missing(self):
+        scanned = self.scanned()
+        return [face for face in FACES if face not in scanned]
+
+    def update(self, scores, sharpness=0.0):
+        """ scores: sticker_scores do frame (None = grade fora do frame); sharpness: nitidez (varredura). """
+        if self.complete:
+            return []
+        if not self.reads_faces():
+            events = []
+            center = None if scores is None else self.sweep_scanner.update(scores, sharpness)
+            if center is not None:
+                events.append({"type": "sweep_seen", "face": center})
+        elif scores is None:
+            self.accumulator.reset()
+            return []
+        elif not self.armed:
+            return []
+        else:
+            events = self._read_face(scores)
+
+        if self.requests:
+            return events # Só monta de novo depois das releituras pedidas
+        scanned = self.scanned()
+        if len(scanned) == 5:
+            events += self._infer(scanned)
+        elif len(scanned) == 6:
+            events += self._assemble(scanned)
+        return events
+
+    def _read_face(self, scores):
+        """
+        Face a face: qualquer face que falte é aceite, identificada pelo centro (a rotação é
+        corrigida na montagem). Com releituras pedidas, só a face pedida é aceite.
+        """
+        self.accumulator.update(scores)
+        center = self.accumulator.center_letter()
+        wanted = self.requested()
+        if center is not None and wanted is not None and center != wanted:
+            self.accumulator.reset()
+            return [{"type": "wrong_face", "face": center, "wanted": wanted, "top": CANONICAL_TOP[wanted]}]
+        if center is not None and wanted is None and self.faces.get(center) is not None:
+            self.accumulator.reset()
+            return [{"type": "already_scanned", "face": center, "missing": self.missing()}]
+        letters = self.accumulator.face_letters()
+        if letters is None or center not in self.faces:
+            return []
+        self.accumulator.reset()
+        self.faces[center] = letters
+        if wanted is not None:
+            self.requests.pop(0)
+            self.fixed.add(center)
+        return [{"type": "face_locked", "face": center, "letters": letters, "canonical": wanted is not None}]
+
+    def _infer(self, scanned):
+        """ Sexta face deduzida das outras cinco (só é pedida se a dedução for ambígua). """
+        signature = (tuple(sorted((face, "".join(letters)) for face, letters in scanned.items())), tuple(sorted(self.fixed)))
+        if signature == self.inference_tried:
+            return []
+        self.inference_tried = signature
+        missing = next(face for face in FACES if face not in scanned)
+        cubes = infer_missing_face(scanned, self.fixed)
+        if len(cubes) != 1:
+            return [{"type": "face_inference_ambiguous", "face": missing, "answers": len(cubes)}]
+        k = FACES.index(missing)
+        return [{"type": "face_inferred", "face": missing, "letters": list(cubes[0][9 * k:9 * k + 9])}] + self._finish(cubes[0])
+
+    def _assemble(self, scanned):
+        """ 6 faces lidas: fica a rotação que forma peças possíveis. """
+        cubes = assemble(scanned, self.fixed)
+        if len(cubes) == 1:
+            return self._finish(cubes[0])
+        if cubes: # Rotações ambíguas: as leituras ficam, e a primeira face que muda é relida na orientação canónica
+            face = ambiguous_faces(cubes)[0] # Faces fixas não mudam entre as respostas
+            self._request(face)
+            return [{"type": "orientation_needed", "face": face, "top": CANONICAL_TOP[face], "answers": len(cubes)}]
+        # Nenhum cubo válido: alguma leitura errada. É a face que, deixada de fora, deixa as outras 5
+        # completarem o cubo (o validador não serve aqui: as faces podem estar giradas)
+        suspects = sorted(misread_faces(scanned, self.fixed), key=lambda face: face in self.fixed)
+        if not suspects:
+            self.reset()
+            return [{"type": "scan_error", "message": "leituras inconsistentes em mais de uma face"}]
+        self.fixed.discard(suspects[0])
+        self.sweep_scanner.forget(suspects[0])
+        self._request(suspects[0])
+        return [{"type": "rescan_face", "face": suspects[0], "top": CANONICAL_TOP[suspects[0]], "suspects": suspects}]
+
+    def _finish(self, facelets):
+        """ Cubo montado (já validado pela montagem ou pela dedução). """
+        self.faces = {face: list(facelets[9 * k:9 * k + 9]) for k, face in enumerate(FACES)}
+        self.complete = True
+        return [{"type": "scan_complete", "kociemba_string": facelets}]
+
+
+class StepVerifier:
+    """ Confirma um passo da resolução quando as últimas leituras da face F são o estado esperado. """
+
+    def __init__(self, expected_key, waiting_keys=()):
+        self.expected_key = expected_key
+        self.waiting_keys = {key for key in waiting_keys if key is not None} # Estados de antes do passo (seta)
+        self.readings = []
+
+    def update(self, key):
+        """ key: chave da face lida (None = leitura falhou: a estabilidade recomeça). True = passo confirmado. """
+        if key is None:
+            self.readings = []
+            return False
+        self.readings = (self.readings + [key])[-KEPT_READINGS:]
+        return len(self.readings) >= STABLE_READINGS and \
+               all(k == self.expected_key for k in self.readings[-STABLE_READINGS:])
+
+    def waiting(self):
+        """ A última leitura ainda é um estado de antes do passo. """
+        return bool(self.readings) and self.readings[-1] in self.waiting_keys
@@ -0,0 +1,104 @@
+# Perfis de calibração nomeados (ex.: "janela", "led") guardados lado a lado em calibrated_colors.py.
+# Todos os perfis são avaliados de uma vez: as LUTs ficam empilhadas num só array e cada
+# frame é classificado por todas elas com uma única indexação. A nota de um perfil é a
+# fração de stickers da grade classificados com confiança.
+import numpy as np
+
+from classificador_cores import build_color_lut, sample_patches, PATCH_RADIUS
+
+DEFAULT_PROFILE = "padrao"  # Nome usado para calibrações antigas (só calibrated_values)
+CONFIDENT_FRACTION = 0.5    # Fração mínima de pixels da cor vencedora (igual a scores_to_letters)
+STARTUP_FRAMES = 15         # Frames amostrados no início para escolher o perfil
+QUALITY_SMOOTHING = 0.05    # Peso de cada frame na média móvel da qualidade do perfil ativo
+MIN_QUALITY = 0.6           # Abaixo disso os outros perfis são reavaliados
+SWITCH_MARGIN = 0.15        # Vantagem mínima de outro perfil para trocar durante a sessão
+
+
+def load_profiles(calibration_profiles=None, calibrated_values=None, reference_white=None):
+    """
+    Normaliza o conteúdo de calibrated_colors.py para {nome: {"values": ..., "reference_white": ...}}.
+    Ficheiros antigos (sem calibration_profiles) viram um único perfil DEFAULT_PROFILE.
+    """
+    profiles = {}
+    for name, profile in (calibration_profiles or {}).items():
+        profiles[name] = {"values": profile["values"], "reference_white": profile.get("reference_white")}
+    if not profiles and calibrated_values:
+        profiles[DEFAULT_PROFILE] = {"values": calibrated_values, "reference_white": reference_white}
+    return profiles
+
+def confident_fraction(scores):
+    """ Fração dos 9 stickers cuja cor vencedora tem pelo menos CONFIDENT_FRACTION dos pixels. """
+    if scores is None:
+        return 0.0
+    return float((scores[:, :-1].max(axis=1) >= CONFIDENT_FRACTION).mean())
+
+
+class ProfileScorer:
+    """ Classifica a grade com as LUTs de todos os perfis ao mesmo tempo. """
+
+    def __init__(self, profiles, radius=PATCH_RADIUS):
+        self.names = list(profiles)
+        self.radius = radius
+        built = [build_color_lut(profiles[name]["values"]) for name in self.names]
+        self.letters = {name: letters for name, (_, letters) in zip(self.names, built)}
+        self.luts = np.stack([lut for lut, _ in built]) # (K, 180, 256, 256)
+        self.n_codes = max(len(letters) for _, letters in built)
+        # Colunas válidas de cada perfil: as cores dele, sem o '?' (que é o seu último índice)
+        self.valid = np.zeros((len(self.names), self.n_codes), dtype=bool)
+        for k, (_, letters) in enumerate(built):
+            self.valid[k, :len(letters) - 1] = True
+        self.reset()
+
+    def lut(self, name):
+        return self.luts[self.names.index(name)]
+
+    def score(self, hsv, centers):
+        """ Fração de stickers confiáveis em cada perfil, shape (K,). None se a grade sair do frame. """
+        patches = sample_patches(hsv, centers, self.radius)
+        if patches is None:
+            return None
+        codes = self.luts[:, patches[..., 0], patches[..., 1], patches[..., 2]].astype(np.intp) # (K, 9, P)
+        n_profiles, n_cells, n_pixels = codes.shape
+        offsets = (np.arange(n_profiles * n_cells) * self.n_codes).reshape(n_profiles, n_cells, 1)
+        counts = np.bincount((codes + offsets).ravel(), minlength=n_profiles * n_cells * self.n_codes)
+        counts = counts.reshape(n_profiles, n_cells, self.n_codes) * self.valid[:, None, :]
+        return (counts.max(axis=2) >= CONFIDENT_FRACTION * n_pixels).mean(axis=1)
+
+    # --- Escolha no início da sessão ---
+    def reset(self):
+        self.totals = np.zeros(len(self.names))
+        self.samples = 0
+
+    def sample(self, hsv, centers):
+        scores = self.score(hsv, centers)
+        if scores is not None and scores.max() > 0: # Sem nenhum sticker confiável = cubo fora da grade
+            self.totals += scores
+            self.samples += 1
+        return scores
+
+    def best(self):
+        """ (nome, nota média) do melhor perfil entre as amostras acumuladas. """
+        if self.samples == 0:
+            return self.names[0], 0.0
+        k = int(self.totals.argmax())
+        return self.names[k], float(self.totals[k] / self.samples)
+
+
+class QualityMonitor:
+    """ Média móvel da fração de stickers confiáveis do perfil ativo. """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.quality = None
+        self.frames = 0
+
+    def update(self, fraction):
+        """ Retorna True quando a qualidade (já estabilizada) caiu abaixo de MIN_QUALITY. """
+        self.frames += 1
+        if self.quality is None:
+            self.quality = fraction
+        else:
+            self.quality = (1 - QUALITY_SMOOTHING) * self.quality + QUALITY_SMOOTHING * fraction
+        return self.frames >= 1 / QUALITY_SMOOTHING and self.quality < MIN_QUALITY
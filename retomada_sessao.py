@@ -0,0 +1,80 @@
+# Checkpoint da sessão de resolução: depois de cada passo verificado, o estado numérico
+# do cubo, a solução, o índice do movimento, os passos que faltam dele (B = Y' -> R -> Y) e os
+# mapeamentos cor <-> número vão para um JSON pequeno (~1 KB). Se o solver sair a meio (janela
+# fechada, câmara falhou, 'q'), a próxima execução retoma dali, confirmando só a face da frente,
+# sem repetir o scan. Como o estado é o de depois do último passo, um B pela metade retoma no
+# passo seguinte em vez de partir de um estado que o cubo já não tem.
+import json
+import os
+import time
+
+import numpy as np
+
+CHECKPOINT_FILE = "sessao_em_andamento.json"
+CHECKPOINT_VERSION = 1
+FACES = "URFDLB"
+
+
+def save_checkpoint(path, kociemba_string, cube_state_num, solution_moves, current_move_index,
+                    letter_to_num, profile=None, pending_steps=()):
+    """
+    Grava o estado num ficheiro temporário e troca-o de uma vez (os.replace), então um
+    checkpoint nunca fica pela metade, mesmo se o processo morrer durante a escrita.
+    pending_steps: passos do movimento atual ainda por fazer ([] = movimento ainda não começado).
+    """
+    data = {
+        "version": CHECKPOINT_VERSION,
+        "saved_at": time.time(),
+        "kociemba_string": kociemba_string,
+        "cube_state_num": {face: [int(n) for n in cube_state_num[face][0]] for face in FACES},
+        "solution_moves": list(solution_moves),
+        "current_move_index": int(current_move_index),
+        "letter_to_num": {letter: int(num) for letter, num in letter_to_num.items()},
+        "profile": profile,
+        "pending_steps": list(pending_steps),
+    }
+    temporary = path + ".tmp"
+    with open(temporary, "w", encoding="utf-8") as f:
+        json.dump(data, f, separators=(",", ":"))
+    os.replace(temporary, path)
+
+def load_checkpoint(path):
+    """
+    Lê o checkpoint. Retorna None se não existir, estiver corrompido ou a solução já tiver terminado.
+    O estado volta no formato do main(): faces (1, 9) e o mapeamento inverso num -> letra.
+    """
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != CHECKPOINT_VERSION:
+            return None
+        cube_state_num = {face: np.array([data["cube_state_num"][face]]) for face in FACES}
+        if any(face.shape != (1, 9) for face in cube_state_num.values()):
+            return None
+        letter_to_num = {letter: int(num) for letter, num in data["letter_to_num"].items()}
+        solution_moves = list(data["solution_moves"])
+        current_move_index = int(data["current_move_index"])
+        pending_steps = [str(step) for step in data.get("pending_steps", [])] # Checkpoints antigos: só movimentos inteiros
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        print(f"DEBUG: Checkpoint '{path}' ignorado: {e}")
+        return None
+    if not 0 <= current_move_index < len(solution_moves):
+        return None
+    return {
+        "kociemba_string": data.get("kociemba_string", ""),
+        "cube_state_num": cube_state_num,
+        "solution_moves": solution_moves,
+        "current_move_index": current_move_index,
+        "letter_to_num": letter_to_num,
+        "num_to_letter": {num: letter for letter, num in letter_to_num.items()},
+        "profile": data.get("profile"),
+        "pending_steps": pending_steps,
+        "saved_at": data.get("saved_at", 0.0),
+    }
+
+def clear_checkpoint(path):
+    """ Apaga o checkpoint (cubo resolvido ou retomada recusada). """
+    if path and os.path.exists(path):
+        os.remove(path)
@@ -0,0 +1,497 @@
+# Modo servidor: várias estações (sessões) de cubo num só computador.
+# Cada sessão tem a sua própria fonte de frames e o seu próprio estado de cubo.
+#
+# API (HTTP/1.1, JSON):
+#   POST   /sessions                 -> cria sessão ({"flip": ..., "profile": ...}), devolve {"session_id": ...}
+#   GET    /sessions                 -> lista as sessões
+#   GET    /sessions/<id>            -> estado atual da sessão
+#   DELETE /sessions/<id>            -> remove a sessão (os WebSockets recebem "session_closed" e fecham)
+#   POST   /sessions/<id>/frame      -> corpo = imagem (JPEG/PNG); devolve {"events": [...]}
+#   POST   /sessions/<id>/reset      -> recomeça o scan
+#   POST   /sessions/<id>/profile    -> {"name": ...} troca o perfil de calibração da sessão
+#   GET    /sessions/<id>/ws         -> WebSocket: envia eventos (texto JSON) e aceita
+#                                       frames como mensagens binárias (JPEG/PNG)
+#
+# Cada sessão tem o seu próprio perfil de calibração (LUT, letras e branco de referência):
+# pedido na criação ou escolhido pelos primeiros frames, e trocado se a qualidade cair,
+# como no modo local. Sessões sem frames nem pedidos por SESSION_IDLE_SECONDS expiram.
+#
+# Uso: python servidor_sessoes.py [--host 0.0.0.0] [--port 8765] [--workers 4]
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import struct
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+import kociemba
+
+import solver_interativo_setas as solver
+from filtro_movimento import MotionGate
+from classificador_cores import sticker_scores, scores_to_letters
+from normalizacao_luz import IlluminationNormalizer
+from passos_sessao import CubeScan, StepVerifier # Os mesmos passos do modo local
+from memoria_frames import FramePool
+from perfis_calibracao import confident_fraction, QualityMonitor, STARTUP_FRAMES, SWITCH_MARGIN
+
+MAX_BODY_BYTES = 8 * 1024 * 1024
+WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+SESSION_IDLE_SECONDS = 30 * 60 # Sessão sem frames nem pedidos por mais tempo que isto é removida
+EXPIRY_CHECK_SECONDS = 60
+
+
+class CubeSession:
+    """ Estado de uma estação: scan, mapeamento, solução e verificação de movimentos. """
+
+    def __init__(self, session_id, flip=True, profile=None):
+        self.session_id = session_id
+        self.flip = flip
+        self.created = self.last_active = time.time()
+        self.listeners = set() # Filas (asyncio.Queue) dos WebSockets conectados
+        self.lock = asyncio.Lock() # Frames de uma sessão são processados em ordem
+        self.frame_pool = FramePool(f"sessao {session_id}") # Buffers desta sessão (o lock garante um frame de cada vez)
+        self.motion_gate = MotionGate(solver.grid_centers) # Um filtro por sessão; reset() só limpa o histórico
+        # Perfil, normalização e monitor de qualidade desta sessão (sobrevivem ao reset)
+        self.illumination = IlluminationNormalizer(solver.grid_centers)
+        self.profile_monitor = QualityMonitor()
+        self.scan = None
+        # Sem perfil pedido (e com mais de um calibrado), os primeiros frames escolhem o melhor
+        self.profile_totals = np.zeros(len(solver.profile_scorer.names))
+        self.profile_samples = 0 if profile not in solver.profiles and len(solver.profiles) > 1 else STARTUP_FRAMES
+        self.use_profile(profile if profile in solver.profiles else solver.active_profile, "criação")
+        self.reset()
+
+    def use_profile(self, name, reason=""):
+        """ Ativa um perfil de calibração só nesta sessão. Retorna o evento "profile". """
+        self.profile = name
+        self.color_lut = solver.profile_scorer.lut(name)
+        self.lut_letters = solver.profile_scorer.letters[name]
+        self.illumination.set_reference(solver.profiles[name]["reference_white"])
+        self.profile_monitor.reset()
+        self.last_scores = None # Classificadas com a LUT antiga: não podem ser reaproveitadas
+        if self.scan is not None:
+            self.scan.set_letters(self.lut_letters)
+        return {"type": "profile", "name": name, "reason": reason}
+
+    def _check_profile(self, frame, scores):
+        """ Escolha inicial (STARTUP_FRAMES amostras) e troca quando a qualidade do perfil cai. """
+        if len(solver.profile_scorer.names) < 2:
+            return []
+        choosing = self.profile_samples < STARTUP_FRAMES
+        if not choosing and not self.profile_monitor.update(confident_fraction(scores)):
+            return []
+        self.profile_monitor.reset()
+        hsv_raw, roi_centers = self.illumination.hsv_grid(frame, normalize=False)
+        profile_scores = solver.profile_scorer.score(hsv_raw, roi_centers)
+        if profile_scores is None or profile_scores.max() == 0: # Cubo fora da grade
+            return []
+        names = solver.profile_scorer.names
+        if choosing:
+            self.profile_totals += profile_scores
+            self.profile_samples += 1
+            best = int(self.profile_totals.argmax())
+            if self.profile_samples < STARTUP_FRAMES or names[best] == self.profile:
+                return []
+            return [self.use_profile(names[best], f"escolha inicial, {self.profile_totals[best] / self.profile_samples:.2f}")]
+        best = int(profile_scores.argmax())
+        current = profile_scores[names.index(self.profile)]
+        if names[best] == self.profile or profile_scores[best] < current + SWITCH_MARGIN:
+            return []
+        return [self.use_profile(names[best], f"qualidade caiu: {current:.2f} -> {profile_scores[best]:.2f}")]
+
+    def reset(self):
+        self.scan = CubeScan(self.lut_letters) # Faces lidas, montagem e sexta face
+        self.cube_state_num = None
+        self.letter_to_num = {}
+        self.num_to_letter = {}
+        self.phase = "scan" # scan -> solving -> moves -> solved
+        self.kociemba_string = ""
+        self.solution_moves = []
+        self.current_move_index = 0
+        self.pending_steps = []
+        self.step_faces = None # Estado esperado após o passo atual
+        self.step_key = None   # Chave da face F esperada após o passo atual
+        self.verifier = None   # Confirmação do passo atual (StepVerifier)
+        self.frames_processed = 0
+        self.last_letters = None
+        self.last_scores = None
+        self.motion_gate.reset()
+
+    def snapshot(self):
+        """ Resumo serializável da sessão. """
+        return {
+            "session_id": self.session_id,
+            "phase": self.phase,
+            "profile": self.profile,
+            "frames_processed": self.frames_processed,
+            "faces_scanned": [f for f in solver.faces_order if f in self.scan.scanned()],
+            "next_face": self._next_face() if self.phase == "scan" else None,
+            "canonical_face": self.scan.requested(), # Mostrar com CANONICAL_TOP[face] em cima
+            "detected": self.last_letters,
+            "kociemba_string": self.kociemba_string,
+            "solution": self.solution_moves,
+            "current_move_index": self.current_move_index,
+            "pending_steps": self.pending_steps,
+            "motion_gate": self.motion_gate.counts,
+        }
+
+    def _next_face(self):
+        """
+        Face pedida na orientação canónica (rotações ambíguas), senão a primeira ainda não
+        escaneada (só uma sugestão: qualquer face em falta é aceite)
+        """
+        return self.scan.requested() or next(iter(self.scan.missing()), None)
+
+    def publish(self, events):
+        for queue in list(self.listeners):
+            for event in events:
+                try: queue.put_nowait(event)
+                except asyncio.QueueFull: pass # Cliente lento: descarta eventos
+
+    def close(self, reason):
+        """ Avisa os WebSockets e fecha-os (o None faz o sender mandar o close). """
+        for queue in list(self.listeners):
+            for item in ({"type": "session_closed", "reason": reason}, None):
+                if queue.full(): # Estes não podem ser descartados: sai o evento mais antigo
+                    queue.get_nowait()
+                queue.put_nowait(item)
+
+    # --- Processamento de frames (roda numa thread) ---
+    def process_frame(self, frame):
+        """ Processa um frame BGR e devolve a lista de eventos gerados. """
+        self.frames_processed += 1
+        if self.flip:
+            frame = cv2.flip(frame, 1, dst=self.frame_pool.get("flip", frame.shape))
+
+        gate = self.motion_gate.check(frame)
+        if gate == MotionGate.DISCARD:
+            if self.phase == "scan":
+                self.scan.moved() # Uma releitura pedida só começa depois de o cubo mexer
+            return [] # Frame em movimento/borrado: não mexe nos buffers
+        if gate == MotionGate.REUSE and self.last_scores is not None:
+            scores = self.last_scores
+        else:
+            try: hsv_roi, roi_centers = self.illumination.hsv_grid(frame)
+            except cv2.error as e: return [{"type": "error", "message": f"Erro HSV: {e}"}]
+            scores = sticker_scores(hsv_roi, roi_centers, self.color_lut, len(self.lut_letters))
+            self.illumination.observe_scores(scores, self.lut_letters)
+            self.last_scores = scores
+        letters = None if scores is None else scores_to_letters(scores, self.lut_letters)
+        self.last_letters = letters
+        events = [{"type": "detected", "letters": letters}]
+        events += self._check_profile(frame, scores) # A troca vale a partir do próximo frame
+        if self.phase == "scan":
+            self._scan_step(scores, events)
+        elif self.phase == "moves":
+            self._verify_step(letters, events)
+        return events
+
+    def _scan_step(self, scores, events):
+        scan_events = self.scan.update(scores, self.motion_gate.sharpness)
+        if scores is not None:
+            events.append({"type": "stickers", "letters": self.scan.accumulator.best_letters(),
+                           "pending": self.scan.accumulator.pending().tolist()})
+        events.extend(scan_events)
+        if not self.scan.complete:
+            if any(e["type"] == "face_locked" for e in scan_events) and self._next_face() is not None:
+                events.append({"type": "next_face", "face": self._next_face()})
+            return
+
+        try:
+            self.kociemba_string, self.letter_to_num, self.num_to_letter, self.cube_state_num = \
+                solver.build_kociemba_state(self.scan.faces)
+        except ValueError as ve:
+            events[:] = [e for e in events if e["type"] != "scan_complete"]
+            events.append({"type": "scan_error", "message": str(ve)})
+            self.reset()
+            return
+        self.phase = "solving"
+
+    def apply_solution(self, solution):
+        """ Recebe a solução do worker e inicia a fase de movimentos. """
+        self.solution_moves = solution.split()
+        self.current_move_index = 0
+        events = [{"type": "solution", "moves": self.solution_moves}]
+        self.phase = "moves"
+        self._start_move(events)
+        return events
+
+    def _start_move(self, events):
+        if self.current_move_index >= len(self.solution_moves):
+            self.phase = "solved"
+            events.append({"type": "solved"})
+            return
+        move = self.solution_moves[self.current_move_index]
+        self.pending_steps = list(solver.move_steps.get(move, []))
+        if not self.pending_steps:
+            events.append({"type": "error", "message": f"Movimento '{move}' desconhecido."})
+            self.phase = "solved"
+            return
+        self._prepare_step()
+        events.append({"type": "next_move", "move": move, "index": self.current_move_index,
+                       "total": len(self.solution_moves), "step": self.pending_steps[0]})
+
+    def _faces(self):
+        return tuple(self.cube_state_num[face] for face in solver.faces_order)
+
+    def _prepare_step(self):
+        """ Calcula uma vez o estado esperado do passo atual (a comparação por frame é só de inteiros) """
+        self.step_faces = solver.apply_move_state(self.pending_steps[0], *self._faces())
+        self.step_key = solver.face_key(self.step_faces[2])
+        self.verifier = StepVerifier(self.step_key)
+
+    def _verify_step(self, letters, events):
+        if letters is None or any(l not in self.letter_to_num for l in letters):
+            key = None
+        else:
+            key = solver.numbers_key(self.letter_to_num[l] for l in letters)
+        if not self.verifier.update(key):
+            return
+
+        self.cube_state_num = dict(zip(solver.faces_order, self.step_faces))
+        self.pending_steps.pop(0)
+        if self.pending_steps:
+            self._prepare_step()
+            events.append({"type": "next_step", "step": self.pending_steps[0]})
+            return
+        events.append({"type": "move_done", "move": self.solution_moves[self.current_move_index],
+                       "index": self.current_move_index})
+        self.current_move_index += 1
+        self._start_move(events)
+
+
+class SessionServer:
+    """ Hospeda as sessões e a API HTTP/WebSocket. """
+
+    def __init__(self, workers=None):
+        self.sessions = {}
+        self.solver_pool = ProcessPoolExecutor(max_workers=workers)
+
+    def remove(self, session, reason):
+        if self.sessions.pop(session.session_id, None) is not None:
+            session.close(reason)
+            print(f"Sessão removida: {session.session_id} ({reason}, {len(self.sessions)} ativas)")
+
+    async def expire_idle(self):
+        """ Remove de tempos a tempos as sessões paradas há mais de SESSION_IDLE_SECONDS. """
+        while True:
+            await asyncio.sleep(EXPIRY_CHECK_SECONDS)
+            limit = time.time() - SESSION_IDLE_SECONDS
+            for session in [s for s in self.sessions.values() if s.last_active < limit]:
+                self.remove(session, "expirou")
+
+    # --- Lógica das sessões ---
+    async def push_frame(self, session, data):
+        """ Decodifica e processa um frame; dispara a solução no pool quando o scan termina. """
+        loop = asyncio.get_running_loop()
+        session.last_active = time.time()
+        async with session.lock:
+            frame = await loop.run_in_executor(None, _decode_image, data)
+            if frame is None:
+                events = [{"type": "error", "message": "Imagem inválida."}]
+            else:
+                events = await loop.run_in_executor(None, session.process_frame, frame)
+        session.publish(events)
+        if any(e["type"] == "scan_complete" for e in events):
+            asyncio.create_task(self._solve(session, session.kociemba_string))
+        return events
+
+    async def _solve(self, session, kociemba_string):
+        loop = asyncio.get_running_loop()
+        try:
+            solution = await loop.run_in_executor(self.solver_pool, kociemba.solve, kociemba_string)
+        except Exception as e:
+            async with session.lock:
+                session.reset()
+            session.publish([{"type": "scan_error", "message": f"Erro no kociemba: {e}"}])
+            return
+        async with session.lock:
+            if session.phase != "solving" or session.kociemba_string != kociemba_string:
+                return # Sessão foi reiniciada enquanto resolvia
+            events = session.apply_solution(solution)
+        print(f"Sessão {session.session_id}: solução ({len(session.solution_moves)} mov): {solution}")
+        session.publish(events)
+
+    # --- HTTP ---
+    async def handle_client(self, reader, writer):
+        try:
+            request_line = await reader.readline()
+            if not request_line:
+                return
+            method, path, _ = request_line.decode("latin-1").split(" ", 2)
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+
+            length = int(headers.get("content-length", 0))
+            if length > MAX_BODY_BYTES:
+                await _send_json(writer, 413, {"error": "Corpo muito grande."})
+                return
+            body = await reader.readexactly(length) if length else b""
+
+            parts = [p for p in path.split("?")[0].split("/") if p]
+            await self.route(method, parts, headers, body, reader, writer)
+        except (ValueError, asyncio.IncompleteReadError, ConnectionError) as e:
+            try: await _send_json(writer, 400, {"error": str(e)})
+            except ConnectionError: pass
+        finally:
+            writer.close()
+            try: await writer.wait_closed()
+            except ConnectionError: pass
+
+    async def route(self, method, parts, headers, body, reader, writer):
+        if parts == ["sessions"]:
+            if method == "POST":
+                options = json.loads(body) if body else {}
+                if options.get("profile") is not None and options["profile"] not in solver.profiles:
+                    return await _send_json(writer, 400, {"error": f"Perfil desconhecido: {options['profile']}"})
+                session_id = uuid.uuid4().hex[:8]
+                self.sessions[session_id] = CubeSession(session_id, flip=options.get("flip", True),
+                                                        profile=options.get("profile"))
+                print(f"Sessão criada: {session_id} ({len(self.sessions)} ativas)")
+                return await _send_json(writer, 201, {"session_id": session_id})
+            if method == "GET":
+                return await _send_json(writer, 200, {"sessions": [s.snapshot() for s in self.sessions.values()]})
+
+        if len(parts) >= 2 and parts[0] == "sessions":
+            session = self.sessions.get(parts[1])
+            if session is None:
+                return await _send_json(writer, 404, {"error": "Sessão não encontrada."})
+            session.last_active = time.time()
+            action = parts[2] if len(parts) > 2 else None
+            if action is None and method == "GET":
+                return await _send_json(writer, 200, session.snapshot())
+            if action is None and method == "DELETE":
+                self.remove(session, "removida")
+                return await _send_json(writer, 200, {"deleted": session.session_id})
+            if action == "frame" and method == "POST":
+                events = await self.push_frame(session, body)
+                return await _send_json(writer, 200, {"events": events})
+            if action == "reset" and method == "POST":
+                async with session.lock:
+                    session.reset()
+                return await _send_json(writer, 200, session.snapshot())
+            if action == "profile" and method == "POST":
+                name = (json.loads(body) if body else {}).get("name")
+                if name not in solver.profiles:
+                    return await _send_json(writer, 400, {"error": f"Perfil desconhecido: {name}"})
+                async with session.lock:
+                    session.profile_samples = STARTUP_FRAMES # Escolhido à mão: sem escolha automática
+                    event = session.use_profile(name, "pedido")
+                session.publish([event])
+                return await _send_json(writer, 200, session.snapshot())
+            if action == "ws" and method == "GET" and headers.get("upgrade", "").lower() == "websocket":
+                return await self.websocket(session, headers, reader, writer)
+
+        await _send_json(writer, 404, {"error": "Rota não encontrada."})
+
+    # --- WebSocket ---
+    async def websocket(self, session, headers, reader, writer):
+        key = headers.get("sec-websocket-key", "")
+        accept = base64.b64encode(hashlib.sha1((key + WS_GUID).encode()).digest()).decode()
+        writer.write(("HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\n"
+                      f"Connection: Upgrade\r\nSec-WebSocket-Accept: {accept}\r\n\r\n").encode())
+        await writer.drain()
+
+        queue = asyncio.Queue(maxsize=256)
+        session.listeners.add(queue)
+        queue.put_nowait({"type": "state", "state": session.snapshot()})
+
+        async def sender():
+            while True:
+                event = await queue.get()
+                if event is None: # Sessão removida: close e fim da ligação
+                    await _ws_send(writer, 0x8, b"")
+                    writer.close()
+                    return
+                await _ws_send(writer, 0x1, json.dumps(event).encode())
+
+        sender_task = asyncio.create_task(sender())
+        try:
+            while True:
+                opcode, payload = await _ws_read(reader)
+                if opcode == 0x8: # close
+                    await _ws_send(writer, 0x8, b"")
+                    break
+                if opcode == 0x9: # ping
+                    await _ws_send(writer, 0xA, payload)
+                elif opcode == 0x2: # frame binário
+                    await self.push_frame(session, payload)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            session.listeners.discard(queue)
+            sender_task.cancel()
+
+
+def _decode_image(data):
+    return cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+
+async def _send_json(writer, status, payload):
+    body = json.dumps(payload).encode()
+    reason = {200: "OK", 201: "Created", 400: "Bad Request", 404: "Not Found", 413: "Payload Too Large"}.get(status, "")
+    writer.write((f"HTTP/1.1 {status} {reason}\r\nContent-Type: application/json\r\n"
+                  f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n").encode() + body)
+    await writer.drain()
+
+async def _ws_read(reader):
+    """ Lê uma mensagem WebSocket do cliente (mascarada). Retorna (opcode, payload). """
+    b1, b2 = await reader.readexactly(2)
+    opcode = b1 & 0x0F
+    length = b2 & 0x7F
+    if length == 126:
+        length = struct.unpack("!H", await reader.readexactly(2))[0]
+    elif length == 127:
+        length = struct.unpack("!Q", await reader.readexactly(8))[0]
+    if length > MAX_BODY_BYTES:
+        raise ConnectionError("Mensagem WebSocket muito grande.")
+    mask = await reader.readexactly(4) if b2 & 0x80 else b"\x00\x00\x00\x00"
+    payload = await reader.readexactly(length)
+    if b2 & 0x80: # XOR com a máscara repetida (np.resize) sobre o buffer inteiro: não bloqueia o loop byte a byte
+        data = np.frombuffer(payload, dtype=np.uint8)
+        payload = np.bitwise_xor(data, np.resize(np.frombuffer(mask, dtype=np.uint8), length)).tobytes()
+    return opcode, payload
+
+async def _ws_send(writer, opcode, payload):
+    length = len(payload)
+    if length < 126:
+        header = struct.pack("!BB", 0x80 | opcode, length)
+    elif length < 65536:
+        header = struct.pack("!BBH", 0x80 | opcode, 126, length)
+    else:
+        header = struct.pack("!BBQ", 0x80 | opcode, 127, length)
+    writer.write(header + payload)
+    await writer.drain()
+
+
+async def serve(host, port, workers):
+    server = SessionServer(workers=workers)
+    tcp_server = await asyncio.start_server(server.handle_client, host, port)
+    print(f"Servidor de sessões ouvindo em http://{host}:{port}")
+    expiry_task = asyncio.create_task(server.expire_idle())
+    try:
+        async with tcp_server:
+            await tcp_server.serve_forever()
+    finally:
+        expiry_task.cancel()
+        server.solver_pool.shutdown(cancel_futures=True)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Servidor local com várias sessões de cubo.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=None, help="Processos para o kociemba.solve")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers))
+    except KeyboardInterrupt:
+        print("--- Servidor encerrado ---")
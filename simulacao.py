@@ -0,0 +1,203 @@
+# Sessão simulada de ponta a ponta: embaralhamento aleatório -> scan -> "CUBO RESOLVIDO!",
+# sem ninguém na frente da webcam. Uma câmara virtual entrega frames sintéticos do cubo virtual
+# e um "humano" virtual responde a cada pedido do solver (faces do scan, movimentos e os giros
+# Y'/Y dos movimentos B) depois de um atraso configurável.
+#
+# Uso: python simulacao.py [--seed 1] [--scramble 20] [--delay 0.4] [--fps 30] [--noise 4]
+import argparse
+import random
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from cubo_virtual import SOLVED, STEPS, apply_moves, random_scramble, face_letters
+from gerador_sintetico import SyntheticCubeRenderer, FRAME_SIZE
+
+MOTION_SECONDS = 0.15 # Duração dos frames borrados enquanto o "humano" mexe no cubo
+
+
+class VirtualCamera:
+    """
+    Imita um cv2.VideoCapture: uma thread produz frames no ritmo da câmara e read() devolve o
+    mais recente. Frames substituídos antes de serem lidos contam como descartados.
+    """
+
+    def __init__(self, centers, facelets, fps=30, seed=0, **perturbations):
+        self.facelets = facelets
+        self.face = 'F'            # Face que está virada para a câmara
+        self.moving_until = 0.0    # Enquanto o cubo está a ser mexido, os frames saem borrados
+        self.fps = fps
+        self.renderer = SyntheticCubeRenderer(centers, mirror=True, seed=seed, **perturbations)
+        self.motion_renderer = SyntheticCubeRenderer(centers, mirror=True, seed=seed + 1, noise=8,
+                                                     blur=21, light=0.2, shift=25, rotation=20)
+        self.condition = threading.Condition()
+        self.frame = None
+        self.fresh = False
+        self.produced = self.delivered = self.dropped = 0
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name="camara_virtual", daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        interval = 1.0 / self.fps
+        next_time = time.perf_counter()
+        while self.running:
+            with self.condition:
+                letters = face_letters(self.facelets, self.face)
+                moving = time.perf_counter() < self.moving_until
+            frame = (self.motion_renderer if moving else self.renderer).render(letters).copy()
+            with self.condition:
+                if self.fresh:
+                    self.dropped += 1 # O anterior nunca foi lido
+                self.frame, self.fresh = frame, True
+                self.produced += 1
+                self.condition.notify_all()
+            next_time += interval
+            time.sleep(max(0.0, next_time - time.perf_counter()))
+
+    # --- Interface de cv2.VideoCapture usada pelo solver ---
+    def isOpened(self):
+        return self.running
+
+    def read(self, image=None):
+        with self.condition:
+            if not self.condition.wait_for(lambda: self.fresh or not self.running, timeout=1.0) or not self.running:
+                return False, None
+            self.fresh = False
+            self.delivered += 1
+            if image is not None and image.shape == self.frame.shape: # Como o VideoCapture: reaproveita o destino
+                np.copyto(image, self.frame)
+                return True, image
+            return True, self.frame
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FRAME_WIDTH: return float(FRAME_SIZE[1])
+        if prop == cv2.CAP_PROP_FRAME_HEIGHT: return float(FRAME_SIZE[0])
+        if prop == cv2.CAP_PROP_FPS: return float(self.fps)
+        return 0.0
+
+    def release(self):
+        self.running = False
+        with self.condition:
+            self.condition.notify_all()
+
+    # --- Ações do humano virtual ---
+    def show_face(self, face):
+        with self.condition:
+            self.face = face
+            self.moving_until = time.perf_counter() + MOTION_SECONDS
+
+    def apply_step(self, step):
+        with self.condition:
+            self.facelets = apply_moves(self.facelets, [step])
+            self.face = 'F'
+            self.moving_until = time.perf_counter() + MOTION_SECONDS
+
+
+class VirtualHuman:
+    """ Escuta os eventos do solver e responde como uma pessoa, depois de `delay` segundos. """
+
+    def __init__(self, camera, delay):
+        self.camera = camera
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.pending = None          # (passo, instante em que o frame do cubo já mexido começou)
+        self.step_latencies = []     # (passo, segundos do fim do movimento até a verificação)
+        self.scan_times = []         # (face, segundos do pedido até a face ser registada)
+        self.scan_prompt_time = None
+        self.solution = None
+        self.scanned_state = None
+        self.solved_time = None
+
+    def _later(self, action, *args):
+        timer = threading.Timer(self.delay, action, args)
+        timer.daemon = True
+        timer.start()
+
+    def _do_step(self, step):
+        self.camera.apply_step(step)
+        with self.lock:
+            self.pending = (step, time.perf_counter() + MOTION_SECONDS)
+
+    def __call__(self, name, data):
+        now = time.perf_counter()
+        if name == "scan_prompt":
+            self.scan_prompt_time = now
+            self._later(self.camera.show_face, data["face"])
+        elif name == "face_locked" and self.scan_prompt_time is not None:
+            self.scan_times.append((data["face"], now - self.scan_prompt_time))
+        elif name == "solution":
+            self.solution = data["moves"]
+            self.scanned_state = data["kociemba_string"]
+            self._later(self.camera.show_face, 'F') # Segura o cubo com a face F para a câmara
+        elif name == "move_prompt":
+            if data["step"] not in STEPS:
+                print(f"SIMULAÇÃO: passo '{data['step']}' desconhecido.")
+                return
+            self._later(self._do_step, data["step"])
+        elif name == "step_verified":
+            with self.lock:
+                if self.pending is not None:
+                    step, done = self.pending
+                    self.step_latencies.append((step, max(0.0, now - done)))
+                    self.pending = None
+        elif name == "solved":
+            self.solved_time = now
+
+
+def simulate(seed=1, scramble_length=20, delay=0.4, fps=30, headless=True, **perturbations):
+    """ Roda o main() do solver contra a câmara virtual e imprime o relatório da sessão. """
+    import solver_interativo_setas as solver
+
+    rng = random.Random(seed)
+    scramble = random_scramble(rng, scramble_length)
+    facelets = apply_moves(SOLVED, scramble)
+    print(f"SIMULAÇÃO: embaralhamento ({len(scramble)}): {' '.join(scramble)}")
+
+    camera = VirtualCamera(solver.grid_centers, facelets, fps=fps, seed=seed, **perturbations)
+    human = VirtualHuman(camera, delay)
+    solver.event_listener = human
+    start = time.perf_counter()
+    try:
+        solver.main(video=camera, headless=headless, checkpoint_path=None, record_dir=None) # Não mexe no checkpoint nem nas gravações reais
+    finally:
+        solver.event_listener = None
+        camera.release()
+    wall = (human.solved_time or time.perf_counter()) - start
+
+    latencies = np.array([t for _, t in human.step_latencies]) if human.step_latencies else np.zeros(0)
+    print("\n--- Relatório da simulação ---")
+    print(f"Resolvido: {'sim' if human.solved_time else 'NÃO'} | cubo virtual resolvido: {camera.facelets == SOLVED}")
+    print(f"Scan correto: {human.scanned_state == facelets}")
+    print(f"Tempo total: {wall:.2f}s (atraso humano {delay:.2f}s por ação)")
+    if human.scan_times:
+        print(f"Scan: {sum(t for _, t in human.scan_times):.2f}s, "
+              + ", ".join(f"{face} {t:.2f}s" for face, t in human.scan_times))
+    if human.solution is not None:
+        print(f"Solução: {len(human.solution)} movimentos, {len(human.step_latencies)} passos verificados")
+    if len(latencies):
+        print(f"Latência da verificação por passo: média {1000 * latencies.mean():.0f} ms, "
+              f"p95 {1000 * np.percentile(latencies, 95):.0f} ms, máx {1000 * latencies.max():.0f} ms")
+    print(f"Câmara: {camera.produced} frames produzidos, {camera.delivered} lidos, {camera.dropped} descartados")
+    return {
+        "solved": human.solved_time is not None, "cube_solved": camera.facelets == SOLVED,
+        "scan_ok": human.scanned_state == facelets, "wall_time": wall,
+        "step_latencies": human.step_latencies, "scan_times": human.scan_times,
+        "frames_produced": camera.produced, "frames_dropped": camera.dropped,
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sessão simulada (câmara virtual) do embaralhamento à solução.")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--scramble", type=int, default=20, help="Número de movimentos do embaralhamento")
+    parser.add_argument("--delay", type=float, default=0.4, help="Atraso do humano virtual (s)")
+    parser.add_argument("--fps", type=float, default=30, help="Taxa da câmara virtual")
+    parser.add_argument("--noise", type=float, default=4.0)
+    parser.add_argument("--blur", type=int, default=3)
+    parser.add_argument("--light", type=float, default=0.1)
+    parser.add_argument("--janela", action="store_true", help="Mostra a janela do solver durante a simulação")
+    args = parser.parse_args()
+    simulate(args.seed, args.scramble, args.delay, args.fps, headless=not args.janela,
+             noise=args.noise, blur=args.blur, light=args.light)
@@ -6,6 +6,17 @@ import time
 import sys
 import os # Importa o módulo 'os' para verificar se o arquivo existe
 from scipy import stats # Para ajudar na estabilidade da detecção
+from filtro_movimento import MotionGate # Evita classificar frames parados ou borrados
+from classificador_cores import sticker_scores, scores_to_letters, sample_patches, PATCH_RADIUS
+from normalizacao_luz import IlluminationNormalizer, WHITE_LETTER
+from gravador_sessao import SessionRecorder # Gravação compacta (patches + eventos) para depuração
+from exibicao import DisplayThread, QUEUE_SIZE # imshow/waitKey numa thread separada da deteção
+from memoria_frames import FramePool, AllocationMonitor # Buffers de frame reaproveitados
+from configuracao_camera import open_camera, DEFAULT_CAMERA_PROFILE
+from passos_sessao import CubeScan, StepVerifier # Scan, montagem, dedução e verificação (partilhados com o servidor)
+from montagem_cubo import CANONICAL_TOP # Face que fica em cima na orientação canónica
+from retomada_sessao import save_checkpoint, load_checkpoint, clear_checkpoint, CHECKPOINT_FILE
+from perfis_calibracao import load_profiles, confident_fraction, ProfileScorer, QualityMonitor, STARTUP_FRAMES, SWITCH_MARGIN
 
 print("--- Iniciando Script ---") # DEBUG 1
 
@@ -16,6 +27,15 @@ try:
         from calibrated_colors import calibrated_values
         color_ranges = calibrated_values
         print("DEBUG: Valores carregados com sucesso.") # DEBUG 2
+        # Branco de referência (BGR) da calibração, usado na normalização de iluminação (opcional)
+        try: from calibrated_colors import reference_white
+        except ImportError: reference_white = None
+        # Perfis nomeados (opcional; ficheiros antigos só têm calibrated_values)
+        try: from calibrated_colors import calibration_profiles, active_profile as saved_active_profile
+        except ImportError: calibration_profiles, saved_active_profile = {}, None
+        # Perfil de câmara usado na calibração (mesma exposição/balanço de branco)
+        try: from calibrated_colors import camera_profile
+        except ImportError: camera_profile = DEFAULT_CAMERA_PROFILE
         # Verifica se todas as 6 cores foram carregadas
         if len(color_ranges) != 6:
              print("\n!!! ATENCAO !!!")
@@ -60,6 +80,37 @@ grid_centers = [
 ]
 grid_map = np.array(range(9)).reshape(3, 3) # Mapa 0-8 para posições lógicas
 
+# Filtro de movimento da sessão toda (scan e movimentos): reset() a cada fase/movimento mantém os buffers
+motion_gate = MotionGate(grid_centers)
+
+# Perfis de calibração: as LUTs de todos ficam empilhadas para a escolha automática e a troca ao vivo
+profiles = load_profiles(calibration_profiles, color_ranges, reference_white)
+profile_scorer = ProfileScorer(profiles)
+profile_monitor = QualityMonitor() # Qualidade do perfil ativo durante a sessão
+active_profile = saved_active_profile if saved_active_profile in profiles else profile_scorer.names[0]
+print(f"DEBUG: Perfis de calibração: {profile_scorer.names} (ativo: '{active_profile}').")
+
+# Tabela HSV -> índice da cor do perfil ativo (a primeira cor cujo range contém o pixel vence)
+color_lut, lut_letters = profile_scorer.lut(active_profile), profile_scorer.letters[active_profile]
+
+# Normalização de iluminação da ROI da grade (ancorada no branco), compartilhada por scan e resolução
+illumination = IlluminationNormalizer(grid_centers, profiles[active_profile]["reference_white"])
+
+# Gravação da sessão (patches da grade, letras e eventos). None desativa.
+RECORD_DIR = "gravacoes"
+session_recorder = None # Criado no main()
+
+# Thread de exibição (janelas do OpenCV). Criada no main()
+display = None
+
+# Buffers de frame reaproveitados pelos laços de scan e verificação (sem alocação por frame)
+frame_pool = FramePool("solver")
+allocation_monitor = AllocationMonitor()
+OVERLAY_RING = QUEUE_SIZE + 2 # Frames na fila ou na tela da exibição não podem ser reescritos
+
+# Função chamada com (nome, dados) a cada evento da sessão (ex.: o modo simulação). None desativa.
+event_listener = None
+
 # Ordem das faces para escanear e padrão Kociemba
 faces_order = ['U', 'R', 'F', 'D', 'L', 'B']
 face_names_pt = { # Nomes para instruções
@@ -77,31 +128,6 @@ print("DEBUG: Configurações definidas.") # DEBUG 3 (Fim)
 # --- 3. Funções Auxiliares ---
 print("DEBUG: Definindo Funções Auxiliares...") # DEBUG 4
 
-def get_color_name(hsv_pixel):
-    """ Retorna a letra da cor ('U', 'R', 'F'...) ou '?' """
-    h, s, v = hsv_pixel
-
-    # Itera sobre os ranges carregados do arquivo
-    for color_name, (lower, upper) in color_ranges.items():
-        h_min, s_min, v_min = lower
-        h_max, s_max, v_max = upper
-
-        # Lógica para checar se o pixel está no range (incluindo wrap-around do HUE)
-        hue_match = False
-        if h_min <= h_max: # Range normal de HUE
-            if h >= h_min and h <= h_max:
-                hue_match = True
-        else: # Range de HUE que dá a volta (ex: vermelho Hmin=170, Hmax=10)
-            if (h >= h_min and h <= 179) or (h >= 0 and h <= h_max):
-                hue_match = True
-
-        # Se o HUE bateu, checa Saturação e Valor
-        if hue_match:
-            if s >= s_min and s <= s_max and v >= v_min and v <= v_max:
-                return color_name # Encontrou a cor!
-
-    return '?' # Nenhuma cor encontrada
-
 def draw_preview_grid(frame, centers):
     """ Desenha a grade de 9 quadrados """
     if frame is None: return None # Adiciona checagem
@@ -110,49 +136,165 @@ def draw_preview_grid(frame, centers):
         cv2.circle(frame, (x, y), 3, (0, 0, 255), -1)
     return frame
 
-def detect_face_from_webcam(frame, centers, color_map):
+def draw_scan_overlay(frame, centers, accumulator):
+    """ Desenha o palpite de cada sticker: verde = confirmado, laranja = ainda amostrando """
+    letters = accumulator.best_letters()
+    pending = accumulator.pending()
+    for i, (x, y) in enumerate(centers):
+        box_color = (0, 165, 255) if pending[i] else (0, 255, 0)
+        cv2.rectangle(frame, (x - 20, y - 20), (x + 20, y + 20), box_color, 2)
+        text_pos = (x - 10, y + 5)
+        cv2.putText(frame, letters[i], text_pos, cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 0), 2)
+        cv2.putText(frame, letters[i], text_pos, cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+    return frame
+
+def record_grid_frame(letters):
+    """ Grava os patches da grade do último frame normalizado e as letras lidas """
+    if session_recorder is None or illumination.last_roi is None: return
+    patches = sample_patches(illumination.last_roi, illumination.roi_centers)
+    if patches is not None:
+        session_recorder.patches(patches)
+        session_recorder.letters(letters)
+
+def record_event(kind, /, **data):
+    if session_recorder is not None: session_recorder.event(kind, **data)
+    if event_listener is not None: event_listener(kind, data)
+
+def read_frame(video):
+    """ Lê um frame para o buffer do pool (VideoCapture.read aceita o array de destino). """
+    is_ok, raw = video.read(frame_pool.peek("raw"))
+    if is_ok and raw is not None:
+        frame_pool.keep("raw", raw)
+    return is_ok, raw
+
+def mirror_frame(raw):
+    """ Espelha o frame e prepara a cópia com a grade, ambos em buffers reaproveitados. Retorna (frame, frame_with_grid). """
+    frame = cv2.flip(raw, 1, dst=frame_pool.get("flip", raw.shape))
+    overlay = frame_pool.ring("overlay", frame.shape, OVERLAY_RING)
+    np.copyto(overlay, frame)
+    allocation_monitor.tick()
+    return frame, draw_preview_grid(overlay, grid_centers)
+
+def use_profile(name, reason=""):
+    """ Ativa um perfil de calibração: LUT e branco de referência. """
+    global active_profile, color_lut, lut_letters
+    active_profile = name
+    color_lut, lut_letters = profile_scorer.lut(name), profile_scorer.letters[name]
+    illumination.set_reference(profiles[name]["reference_white"])
+    profile_monitor.reset()
+    record_event("profile", name=name, reason=reason)
+    print(f"DEBUG: Perfil de calibração ativo: '{name}' ({reason}).")
+
+def check_profile_quality(frame, fraction):
+    """
+    Acompanha a fração de stickers confiáveis do perfil ativo. Se a qualidade cair,
+    reavalia todos os perfis no frame atual e troca se outro for claramente melhor.
+    Retorna True se trocou de perfil.
+    """
+    if len(profile_scorer.names) < 2 or not profile_monitor.update(fraction):
+        return False
+    profile_monitor.reset() # Próxima reavaliação só depois de a média estabilizar de novo
+    hsv_raw, roi_centers = illumination.hsv_grid(frame, normalize=False)
+    scores = profile_scorer.score(hsv_raw, roi_centers)
+    if scores is None:
+        return False
+    best = int(scores.argmax())
+    current = scores[profile_scorer.names.index(active_profile)]
+    if profile_scorer.names[best] == active_profile or scores[best] < current + SWITCH_MARGIN:
+        return False
+    use_profile(profile_scorer.names[best], f"qualidade caiu: {current:.2f} -> {scores[best]:.2f}")
+    return True
+
+def select_profile(video):
+    """ Amostra alguns frames do cubo e ativa o perfil com mais stickers confiáveis. False se o usuário sair. """
+    if len(profile_scorer.names) < 2:
+        return True
+    print("DEBUG: Escolhendo perfil de calibração...")
+    profile_scorer.reset()
+    while profile_scorer.samples < STARTUP_FRAMES:
+        is_ok, frame = read_frame(video)
+        if not is_ok or frame is None:
+            time.sleep(0.1); continue
+        frame, frame_with_grid = mirror_frame(frame)
+        hsv_raw, roi_centers = illumination.hsv_grid(frame, normalize=False)
+        profile_scorer.sample(hsv_raw, roi_centers)
+        cv2.putText(frame_with_grid, f"Escolhendo calibracao: mostre uma face ({profile_scorer.samples}/{STARTUP_FRAMES})", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 255), 2)
+        display.show("Resolvendo...", frame_with_grid)
+        if display.poll_key() == ord('q') or display.closed:
+            return False
+    for name, total in zip(profile_scorer.names, profile_scorer.totals):
+        print(f"  Perfil '{name}': {total / profile_scorer.samples:.2f} dos stickers confiáveis")
+    name, quality = profile_scorer.best()
+    use_profile(name, f"escolha inicial, {quality:.2f}")
+    return True
+
+def read_face_letters(frame, centers, normalizer=None):
     """
-    Detecta a face usando amostragem de pixels e retorna a matriz 1x9 numérica.
-    Retorna None se a detecção falhar.
+    Lê as 9 letras da grade pela maioria dos pixels em volta de cada centro (o mesmo
+    classificador do scan, do servidor e do replay das gravações). '?' = sticker sem cor clara.
+    Com um normalizer, só a ROI da grade é convertida (já com a iluminação normalizada).
+    Retorna None se a leitura falhar (frame nulo ou grade fora do frame).
     """
     if frame is None:
-        print("DEBUG: detect_face_from_webcam recebeu frame Nulo.")
+        print("DEBUG: read_face_letters recebeu frame Nulo.")
         return None
     try: # Adiciona try-except para a conversão de cor
-        hsv_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
+        if normalizer is not None:
+            hsv_frame, centers = normalizer.hsv_grid(frame)
+        else:
+            hsv_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
     except cv2.error as e:
         print(f"DEBUG: Erro ao converter frame para HSV: {e}")
         return None # Frame inválido
 
-    detected_colors_letters = []
-    detected_colors_numbers = []
-
-    for idx, (x, y) in enumerate(centers):
-        # Verifica limites antes de acessar pixel
-        if y >= hsv_frame.shape[0] or x >= hsv_frame.shape[1] or y < 0 or x < 0:
-            print(f"DEBUG: Coordenada {idx} ({x},{y}) fora dos limites ({hsv_frame.shape[0]}x{hsv_frame.shape[1]}).")
-            return None # Coordenada inválida
-
-        pixel_hsv = hsv_frame[y, x]
-        color_letter = get_color_name(pixel_hsv)
-        detected_colors_letters.append(color_letter)
-
-        if color_letter == '?':
-            return None # Falha na detecção
-
-        # Converte letra para número usando o mapa criado no scan
-        color_num = color_map.get(color_letter) # Pega o número associado à letra
-        if color_num is None: # Verifica se a letra realmente existe no mapa
-             print(f"DEBUG: ERRO CRÍTICO no Mapeamento durante RESOLUÇÃO - Cor '{color_letter}' (HSV={pixel_hsv}) detectada em ({x},{y}), mas não está no mapeamento 'kociemba_letter_to_num'.")
-             print("DEBUG: Mapeamento:", kociemba_letter_to_num)
-             return None # Retorna None se o mapeamento falhar durante a resolução
-        detected_colors_numbers.append(color_num)
-
-    if len(detected_colors_numbers) == 9:
-        return np.array([detected_colors_numbers]) # Retorna como array NumPy 1x9
-    else:
-        print(f"DEBUG: Detectou {len(detected_colors_numbers)} cores em vez de 9.")
+    scores = sticker_scores(hsv_frame, centers, color_lut, len(lut_letters))
+    if scores is None:
+        print("DEBUG: Grade fora dos limites do frame.")
         return None
+    if normalizer is not None: # Stickers brancos atualizam a âncora de iluminação
+        normalizer.observe_scores(scores, lut_letters)
+    return scores_to_letters(scores, lut_letters)
+
+def letters_to_face(letters, color_map):
+    """ 9 letras -> matriz 1x9 numérica pelo mapeamento do scan. None se algum sticker falhar. """
+    if letters is None or '?' in letters:
+        return None # Falha na detecção
+    numbers = [color_map.get(letter) for letter in letters]
+    if None in numbers: # Verifica se a letra realmente existe no mapa
+        print(f"DEBUG: ERRO CRÍTICO no Mapeamento durante RESOLUÇÃO - Cores {letters} fora do mapeamento: {color_map}")
+        return None # Retorna None se o mapeamento falhar durante a resolução
+    return np.array([numbers]) # Retorna como array NumPy 1x9
+
+def detect_face_from_webcam(frame, centers, color_map, normalizer=None):
+    """ Detecta a face e retorna a matriz 1x9 numérica (None se a detecção falhar). """
+    return letters_to_face(read_face_letters(frame, centers, normalizer), color_map)
+
+
+# Chaves inteiras dos estados (comparações O(1) no caminho por frame)
+# Cada sticker (1-6) ocupa 3 bits: uma face cabe em 27 bits e o cubo em 162 bits.
+# As chaves não acompanham o estado: são recalculadas a cada uso (uma face são 9 deslocamentos,
+# ~3 us, uma vez por frame lido; o cubo inteiro só uma vez por passo).
+STICKER_BITS = 3
+FACE_BITS = 9 * STICKER_BITS
+
+def numbers_key(numbers):
+    """ Chave inteira de uma face a partir da lista de 9 números """
+    key = 0
+    for i, n in enumerate(numbers):
+        key |= int(n) << (STICKER_BITS * i)
+    return key
+
+def face_key(face_1x9):
+    """ Chave inteira de uma face 1x9 (None se a face for None) """
+    if face_1x9 is None: return None
+    return numbers_key(face_1x9[0].tolist())
+
+def cube_key(*faces):
+    """ Chave inteira do cubo inteiro (6 faces, na ordem recebida) """
+    key = 0
+    for i, face in enumerate(faces):
+        key |= face_key(face) << (FACE_BITS * i)
+    return key
 
 
 # Funções de Rotação 2D
@@ -178,7 +320,7 @@ print("DEBUG: Funções auxiliares definidas.") # DEBUG 4 (Fim)
 # --- 4. Funções Interativas com Setas ---
 print("DEBUG: Definindo Funções Interativas...") # DEBUG 5
 
-def wait_for_move(video, expected_front_face, state_before_front, move_name, arrow_coords):
+def wait_for_move(video, expected_front_face, state_before_front, move_name, arrow_coords, intermediate_front_face=None):
     print(f"DEBUG: Entrou em wait_for_move para {move_name}")
 
     if expected_front_face is None:
@@ -186,10 +328,13 @@ def wait_for_move(video, expected_front_face, state_before_front, move_name, arr
          return False # Não podemos comparar com None
 
     print(f"Faça o movimento: {move_name}")
-    detected_faces_buffer = []
+    # Meia-volta: o estado após o primeiro quarto também é "antes do passo" (continua a mostrar a seta)
+    verifier = StepVerifier(face_key(expected_front_face), (face_key(state_before_front), face_key(intermediate_front_face)))
+    motion_gate.reset() # O mesmo filtro (e buffers) em todos os movimentos; só o histórico recomeça
+    last_face_state_num = None
 
     while True:
-        is_ok, frame = video.read()
+        is_ok, frame = read_frame(video)
         if not is_ok:
             print("DEBUG: Erro ao ler webcam durante wait_for_move.")
             return False
@@ -199,12 +344,22 @@ def wait_for_move(video, expected_front_face, state_before_front, move_name, arr
              time.sleep(0.1)
              continue
 
-        frame = cv2.flip(frame, 1)
-        frame_with_grid = draw_preview_grid(frame.copy(), grid_centers)
+        frame, frame_with_grid = mirror_frame(frame) # Buffers reaproveitados (ver memoria_frames.py)
         if frame_with_grid is None: continue # Checa se draw_preview_grid falhou
 
         # Detecta a face atual - AGORA USA O MAPEAMENTO COMPLETO
-        current_face_state_num = detect_face_from_webcam(frame, grid_centers, kociemba_letter_to_num)
+        # O filtro de movimento evita reclassificar frames parados e ignora frames borrados
+        gate = motion_gate.check(frame)
+        if gate == MotionGate.DISCARD:
+            current_face_state_num = None
+        elif gate == MotionGate.REUSE and last_face_state_num is not None:
+            current_face_state_num = last_face_state_num
+        else:
+            current_letters = read_face_letters(frame, grid_centers, illumination)
+            current_face_state_num = letters_to_face(current_letters, kociemba_letter_to_num)
+            last_face_state_num = current_face_state_num
+            if current_letters is not None: record_grid_frame(current_letters) # As mesmas letras que o replay recalcula
+            check_profile_quality(frame, 0.0 if current_face_state_num is None else 1.0) # Depois de gravar: a troca vale do próximo frame
 
         # Mostra instrução
         cv2.putText(frame_with_grid, f"Faca o movimento: {move_name}", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 255), 2)
@@ -224,20 +379,18 @@ def wait_for_move(video, expected_front_face, state_before_front, move_name, arr
             # --- Fim do desenho das letras ---
 
 
-            detected_faces_buffer.append(current_face_state_num.tolist())
-            if len(detected_faces_buffer) > 5:
-                detected_faces_buffer.pop(0)
-
             # Verifica estabilidade
-            if len(detected_faces_buffer) >= 3 and all(np.array_equal(np.array(f), expected_front_face) for f in detected_faces_buffer[-3:]):
+            if verifier.update(face_key(current_face_state_num)):
                 print("DEBUG: MOVIMENTO DETECTADO E ESTAVEL!")
+                record_event("step_verified", step=move_name)
+                print(f"DEBUG: Filtro de movimento ({move_name}): {motion_gate.summary()}")
                 cv2.putText(frame_with_grid, "OK!", (frame.shape[1] // 2 - 30, frame.shape[0] // 2), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 3)
-                cv2.imshow("Resolvendo...", frame_with_grid)
-                cv2.waitKey(500)
+                display.show("Resolvendo...", frame_with_grid)
+                time.sleep(0.5)
                 return True
 
             # Desenha seta se estiver no estado anterior
-            elif len(detected_faces_buffer) >= 1 and state_before_front is not None and np.array_equal(np.array(detected_faces_buffer[-1]), state_before_front):
+            elif verifier.waiting():
                  for p1, p2 in arrow_coords:
                      try: # Adiciona try-except para desenho da seta
                          p1_int = (int(p1[0]), int(p1[1]))
@@ -247,18 +400,21 @@ def wait_for_move(video, expected_front_face, state_before_front, move_name, arr
                      except Exception as draw_err:
                          print(f"DEBUG: Erro ao desenhar seta: {draw_err}, P1={p1}, P2={p2}")
 
+        elif gate == MotionGate.DISCARD:
+             # Frame em movimento/borrado: não mexe no buffer de estabilidade
+             cv2.putText(frame_with_grid, "Movendo...", (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 100, 0), 2)
         else:
-             detected_faces_buffer = []
+             verifier.update(None)
              cv2.putText(frame_with_grid, "Ajuste o cubo na grade", (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 255), 2)
 
-        # Garante que a janela existe antes de mostrar
-        if cv2.getWindowProperty("Resolvendo...", cv2.WND_PROP_VISIBLE) >= 1:
-            cv2.imshow("Resolvendo...", frame_with_grid)
-        else:
+        # A exibição roda na sua própria thread; aqui só entregamos o frame anotado
+        if display.closed:
             print("DEBUG: Janela 'Resolvendo...' não está visível.")
             break # Sai do loop se a janela foi fechada
+        display.show("Resolvendo...", frame_with_grid)
+        display.tick_detection()
 
-        key_pressed = cv2.waitKey(1) & 0xFF
+        key_pressed = display.poll_key()
         if key_pressed == ord('q'):
             print("DEBUG: 'q' pressionado em wait_for_move.")
             return False
@@ -293,191 +449,271 @@ arrows = {
      ],
      # --- FIM DA ADIÇÃO ---
 }
+# Meias-voltas (X2) mostram a seta do quarto de volta (um único giro contínuo de 180 graus)
+for move in ["R", "L", "U", "D", "F"]:
+    arrows[move + "2"] = arrows[move]
+
+# --- Funções de Estado Lógico (puras, sem câmera) ---
+# Cada função recebe as 6 faces (1x9) e devolve as 6 faces após o movimento.
+# São usadas pelas funções interativas abaixo e por quem precisa do estado sem webcam.
+def state_right_cw(u, r, f, d, l, b):
+    new_u, new_r, new_f, new_d, new_l, new_b = np.copy(u), np.copy(r), np.copy(f), np.copy(d), np.copy(l), np.copy(b)
+    new_f[0, [2, 5, 8]] = d[0, [2, 5, 8]]
+    new_d[0, [2, 5, 8]] = b[0, [6, 3, 0]]
+    new_b[0, [6, 3, 0]] = u[0, [2, 5, 8]]
+    new_u[0, [2, 5, 8]] = f[0, [2, 5, 8]]
+    new_r = rotate_cw(r)
+    return new_u, new_r, new_f, new_d, new_l, new_b
+
+def state_right_ccw(u, r, f, d, l, b):
+    new_u, new_r, new_f, new_d, new_l, new_b = np.copy(u), np.copy(r), np.copy(f), np.copy(d), np.copy(l), np.copy(b)
+    new_f[0, [2, 5, 8]] = u[0, [2, 5, 8]]
+    new_u[0, [2, 5, 8]] = b[0, [6, 3, 0]]
+    new_b[0, [6, 3, 0]] = d[0, [2, 5, 8]]
+    new_d[0, [2, 5, 8]] = f[0, [2, 5, 8]]
+    new_r = rotate_ccw(r)
+    return new_u, new_r, new_f, new_d, new_l, new_b
+
+def state_left_cw(u, r, f, d, l, b):
+    new_u, new_r, new_f, new_d, new_l, new_b = np.copy(u), np.copy(r), np.copy(f), np.copy(d), np.copy(l), np.copy(b)
+    new_f[0, [0, 3, 6]] = u[0, [0, 3, 6]]
+    new_u[0, [0, 3, 6]] = b[0, [8, 5, 2]]
+    new_b[0, [8, 5, 2]] = d[0, [0, 3, 6]]
+    new_d[0, [0, 3, 6]] = f[0, [0, 3, 6]]
+    new_l = rotate_cw(l)
+    return new_u, new_r, new_f, new_d, new_l, new_b
+
+def state_left_ccw(u, r, f, d, l, b):
+    new_u, new_r, new_f, new_d, new_l, new_b = np.copy(u), np.copy(r), np.copy(f), np.copy(d), np.copy(l), np.copy(b)
+    new_f[0, [0, 3, 6]] = d[0, [0, 3, 6]]
+    new_d[0, [0, 3, 6]] = b[0, [8, 5, 2]]
+    new_b[0, [8, 5, 2]] = u[0, [0, 3, 6]]
+    new_u[0, [0, 3, 6]] = f[0, [0, 3, 6]]
+    new_l = rotate_ccw(l)
+    return new_u, new_r, new_f, new_d, new_l, new_b
+
+def state_up_cw(u, r, f, d, l, b):
+    new_u, new_r, new_f, new_d, new_l, new_b = np.copy(u), np.copy(r), np.copy(f), np.copy(d), np.copy(l), np.copy(b)
+    new_f[0, [0, 1, 2]] = r[0, [0, 1, 2]]
+    new_r[0, [0, 1, 2]] = b[0, [0, 1, 2]]
+    new_b[0, [0, 1, 2]] = l[0, [0, 1, 2]]
+    new_l[0, [0, 1, 2]] = f[0, [0, 1, 2]]
+    new_u = rotate_cw(u)
+    return new_u, new_r, new_f, new_d, new_l, new_b
+
+def state_up_ccw(u, r, f, d, l, b):
+    new_u, new_r, new_f, new_d, new_l, new_b = np.copy(u), np.copy(r), np.copy(f), np.copy(d), np.copy(l), np.copy(b)
+    new_f[0, [0, 1, 2]] = l[0, [0, 1, 2]]
+    new_l[0, [0, 1, 2]] = b[0, [0, 1, 2]]
+    new_b[0, [0, 1, 2]] = r[0, [0, 1, 2]]
+    new_r[0, [0, 1, 2]] = f[0, [0, 1, 2]]
+    new_u = rotate_ccw(u)
+    return new_u, new_r, new_f, new_d, new_l, new_b
+
+def state_down_cw(u, r, f, d, l, b):
+    new_u, new_r, new_f, new_d, new_l, new_b = np.copy(u), np.copy(r), np.copy(f), np.copy(d), np.copy(l), np.copy(b)
+    new_f[0, [6, 7, 8]] = l[0, [6, 7, 8]]
+    new_l[0, [6, 7, 8]] = b[0, [6, 7, 8]]
+    new_b[0, [6, 7, 8]] = r[0, [6, 7, 8]]
+    new_r[0, [6, 7, 8]] = f[0, [6, 7, 8]]
+    new_d = rotate_cw(d)
+    return new_u, new_r, new_f, new_d, new_l, new_b
+
+def state_down_ccw(u, r, f, d, l, b):
+    new_u, new_r, new_f, new_d, new_l, new_b = np.copy(u), np.copy(r), np.copy(f), np.copy(d), np.copy(l), np.copy(b)
+    new_f[0, [6, 7, 8]] = r[0, [6, 7, 8]]
+    new_r[0, [6, 7, 8]] = b[0, [6, 7, 8]]
+    new_b[0, [6, 7, 8]] = l[0, [6, 7, 8]]
+    new_l[0, [6, 7, 8]] = f[0, [6, 7, 8]]
+    new_d = rotate_ccw(d)
+    return new_u, new_r, new_f, new_d, new_l, new_b
+
+def state_front_cw(u, r, f, d, l, b):
+    new_u, new_r, new_f, new_d, new_l, new_b = np.copy(u), np.copy(r), np.copy(f), np.copy(d), np.copy(l), np.copy(b)
+    new_u[0, [6, 7, 8]] = l[0, [8, 5, 2]]
+    new_l[0, [2, 5, 8]] = d[0, [0, 1, 2]]
+    new_d[0, [0, 1, 2]] = r[0, [6, 3, 0]]
+    new_r[0, [0, 3, 6]] = u[0, [6, 7, 8]]
+    new_f = rotate_cw(f)
+    return new_u, new_r, new_f, new_d, new_l, new_b
+
+def state_front_ccw(u, r, f, d, l, b):
+    new_u, new_r, new_f, new_d, new_l, new_b = np.copy(u), np.copy(r), np.copy(f), np.copy(d), np.copy(l), np.copy(b)
+    new_u[0, [6, 7, 8]] = r[0, [0, 3, 6]]
+    new_r[0, [6, 3, 0]] = d[0, [0, 1, 2]]
+    new_d[0, [0, 1, 2]] = l[0, [2, 5, 8]]
+    new_l[0, [8, 5, 2]] = u[0, [6, 7, 8]]
+    new_f = rotate_ccw(f)
+    return new_u, new_r, new_f, new_d, new_l, new_b
+
+def state_back_cw(u, r, f, d, l, b):
+    new_u, new_r, new_f, new_d, new_l, new_b = np.copy(u), np.copy(r), np.copy(f), np.copy(d), np.copy(l), np.copy(b)
+    new_u[0, [0, 1, 2]] = r[0, [2, 5, 8]]
+    new_r[0, [2, 5, 8]] = d[0, [8, 7, 6]]
+    new_d[0, [8, 7, 6]] = l[0, [6, 3, 0]]
+    new_l[0, [6, 3, 0]] = u[0, [0, 1, 2]]
+    new_b = rotate_cw(b)
+    return new_u, new_r, new_f, new_d, new_l, new_b
+
+def state_back_ccw(u, r, f, d, l, b):
+    new_u, new_r, new_f, new_d, new_l, new_b = np.copy(u), np.copy(r), np.copy(f), np.copy(d), np.copy(l), np.copy(b)
+    new_u[0, [0, 1, 2]] = l[0, [6, 3, 0]]
+    new_l[0, [6, 3, 0]] = d[0, [8, 7, 6]]
+    new_d[0, [8, 7, 6]] = r[0, [2, 5, 8]]
+    new_r[0, [2, 5, 8]] = u[0, [0, 1, 2]]
+    new_b = rotate_ccw(b)
+    return new_u, new_r, new_f, new_d, new_l, new_b
+
+def state_turn_Y_prime(u, r, f, d, l, b):
+    """ Y': R->F, F->L, L->B, B->R (o cubo gira como um U: a face U gira no sentido horário) """
+    return rotate_cw(u), np.copy(b), np.copy(r), rotate_ccw(d), np.copy(f), np.copy(l)
+
+def state_turn_Y(u, r, f, d, l, b):
+    """ Y: L->F, F->R, R->B, B->L (o cubo gira como um U': a face U gira no sentido anti-horário) """
+    return rotate_ccw(u), np.copy(f), np.copy(l), rotate_cw(d), np.copy(b), np.copy(r)
+
+move_state_functions = {
+    "R": state_right_cw, "R'": state_right_ccw,
+    "L": state_left_cw,  "L'": state_left_ccw,
+    "U": state_up_cw,    "U'": state_up_ccw,
+    "D": state_down_cw,  "D'": state_down_ccw,
+    "F": state_front_cw, "F'": state_front_ccw,
+    "B": state_back_cw,  "B'": state_back_ccw,
+    "Y": state_turn_Y,   "Y'": state_turn_Y_prime,
+}
+# Meias-voltas (X2) = o mesmo quarto de volta duas vezes, verificadas como um único passo
+for move in ["R", "L", "U", "D", "F", "B"]:
+    move_state_functions[move + "2"] = lambda u, r, f, d, l, b, _func=move_state_functions[move]: \
+                                       _func(*_func(u, r, f, d, l, b))
+
+# Passos que o usuário realmente executa na frente da câmera para cada movimento.
+# Movimentos em B viram Y' -> (R ou R') -> Y para que a face mexida fique visível.
+move_steps = {
+    # Depois de Y' a face B fica à direita: girar B no sentido horário (visto de trás) é um R
+    "B": ["Y'", "R", "Y"], "B'": ["Y'", "R'", "Y"], "B2": ["Y'", "R2", "Y"],
+}
+for move in ["R", "L", "U", "D", "F"]:
+    move_steps[move] = [move]
+    move_steps[move + "'"] = [move + "'"]
+    move_steps[move + "2"] = [move + "2"]
+
+def apply_move_state(move, u, r, f, d, l, b):
+    """ Aplica um movimento (ou passo) ao estado lógico. Retorna as 6 faces novas. """
+    func = move_state_functions.get(move)
+    if func is None:
+        raise ValueError(f"Movimento '{move}' desconhecido.")
+    return func(u, r, f, d, l, b)
+
+def build_kociemba_state(cube_state_letters):
+    """
+    Cria os mapeamentos (baseados nos centros), o estado numérico e a string Kociemba
+    a partir das 6 faces escaneadas (listas de letras).
+    Retorna (kociemba_string, letter_to_num, num_to_letter, cube_state_num).
+    Lança ValueError se o scan for inconsistente.
+    """
+    # --- 1. Criar Mapeamento Final ---
+    letter_to_num = {}
+    num_to_letter = {}
+    map_letra_para_posicao = {}
+    map_posicao_para_letra = {}
+
+    for i, face_code_kociemba in enumerate(faces_order):
+        if cube_state_letters.get(face_code_kociemba) is None:
+            raise ValueError(f"Estado da face {face_code_kociemba} não foi escaneado.")
+        center_letter = cube_state_letters[face_code_kociemba][4]
+        assigned_num = i + 1
+        if center_letter in letter_to_num:
+            raise ValueError(f"Erro de Mapeamento: Cor central '{center_letter}' duplicada!")
+        letter_to_num[center_letter] = assigned_num
+        num_to_letter[assigned_num] = center_letter
+        map_letra_para_posicao[center_letter] = face_code_kociemba
+        map_posicao_para_letra[face_code_kociemba] = center_letter
+    if len(letter_to_num) != 6: raise ValueError("Mapeamento incompleto.")
+
+    # --- 2. Converter Estado para Números ---
+    cube_state_num = {}
+    for face_code in faces_order:
+        letras = cube_state_letters[face_code]
+        try:
+            cube_state_num[face_code] = np.array([[letter_to_num[l] for l in letras]])
+        except KeyError as e:
+            raise ValueError(f"Cor {e} sem mapeamento na face {face_code}!")
+
+    # --- 3. Gerar String Kociemba ---
+    kociemba_string = ""
+    for face_code_posicao in faces_order:
+        letra_centro_da_posicao = map_posicao_para_letra.get(face_code_posicao)
+        if letra_centro_da_posicao is None: raise ValueError(f"Cor central não encontrada para posição {face_code_posicao}")
+        letras_da_face_escaneada = cube_state_letters.get(letra_centro_da_posicao)
+        if letras_da_face_escaneada is None: raise ValueError(f"Estado não encontrado para cor central {letra_centro_da_posicao}")
+        for letra_peca in letras_da_face_escaneada:
+            posicao_kociemba_da_peca = map_letra_para_posicao.get(letra_peca)
+            if posicao_kociemba_da_peca is None: raise ValueError(f"Cor '{letra_peca}' sem mapeamento de posição!")
+            kociemba_string += posicao_kociemba_da_peca
+    if len(kociemba_string) != 54: raise ValueError(f"String Kociemba com tamanho incorreto: {len(kociemba_string)}")
+
+    return kociemba_string, letter_to_num, num_to_letter, cube_state_num
+
+
+# --- Funções de Rotação Interativas (Modificadas para checar Nones) ---
+# Faces que cada movimento usa (índices em u, r, f, d, l, b)
+move_required_faces = {
+    "R": (0, 1, 2, 3, 5), "L": (0, 4, 2, 3, 5), "U": (0, 1, 2, 4, 5),
+    "D": (3, 1, 2, 4, 5), "F": (0, 1, 2, 3, 4), "B": (0, 1, 3, 4, 5),
+}
+
+def _interactive_move(video, move, faces):
+    """
+    Calcula o estado esperado do movimento e espera a câmera confirmar.
+    Em meias-voltas (X2) o estado intermediário (após X) também é aceito no caminho,
+    então um giro contínuo de 180 graus é confirmado de uma vez.
+    """
+    if any(faces[i] is None for i in move_required_faces[move[0]]):
+        print(f"DEBUG: movimento {move} recebeu None."); return faces
+    expected = apply_move_state(move, *faces)
+    if any(face is None for face in expected):
+        print(f"DEBUG: rotação da face em {move} falhou."); return faces
+    intermediate_f = apply_move_state(move[0], *faces)[2] if move.endswith("2") else None
+    record_event("move_prompt", step=move)
+    if wait_for_move(video, expected[2], np.copy(faces[2]), move, arrows[move], intermediate_f):
+        return expected
+    else: return faces
 
-# --- Funções de Rotação Lógica (Modificadas para checar Nones) ---
 def right_cw(video, u, r, f, d, l, b, *args):
-    if any(face is None for face in [u, r, f, d, b]): print("DEBUG: right_cw recebeu None."); return u, r, f, d, l, b
-    f_before = np.copy(f)
-    expected_u, expected_r, expected_f, expected_d, expected_l, expected_b = np.copy(u), np.copy(r), np.copy(f), np.copy(d), np.copy(l), np.copy(b)
-    expected_f[0, [2, 5, 8]] = d[0, [2, 5, 8]]
-    expected_d[0, [2, 5, 8]] = b[0, [6, 3, 0]]
-    expected_b[0, [6, 3, 0]] = u[0, [2, 5, 8]]
-    expected_u[0, [2, 5, 8]] = f_before[0, [2, 5, 8]]
-    rotated_r = rotate_cw(r)
-    if rotated_r is None: print("DEBUG: rotate_cw(r) falhou."); return u, r, f, d, l, b
-    expected_r = rotated_r
-    if wait_for_move(video, expected_f, f_before, "R", arrows["R"]):
-        return expected_u, expected_r, expected_f, expected_d, expected_l, expected_b
-    else: return u, r, f, d, l, b
+    return _interactive_move(video, "R", (u, r, f, d, l, b))
 
 def right_ccw(video, u, r, f, d, l, b, *args):
-    if any(face is None for face in [u, r, f, d, b]): print("DEBUG: right_ccw recebeu None."); return u, r, f, d, l, b
-    f_before = np.copy(f)
-    expected_u, expected_r, expected_f, expected_d, expected_l, expected_b = np.copy(u), np.copy(r), np.copy(f), np.copy(d), np.copy(l), np.copy(b)
-    expected_f[0, [2, 5, 8]] = u[0, [2, 5, 8]]
-    expected_u[0, [2, 5, 8]] = b[0, [6, 3, 0]]
-    expected_b[0, [6, 3, 0]] = d[0, [2, 5, 8]]
-    expected_d[0, [2, 5, 8]] = f_before[0, [2, 5, 8]]
-    rotated_r = rotate_ccw(r)
-    if rotated_r is None: print("DEBUG: rotate_ccw(r) falhou."); return u, r, f, d, l, b
-    expected_r = rotated_r
-    if wait_for_move(video, expected_f, f_before, "R'", arrows["R'"]):
-        return expected_u, expected_r, expected_f, expected_d, expected_l, expected_b
-    else: return u, r, f, d, l, b
+    return _interactive_move(video, "R'", (u, r, f, d, l, b))
 
 def left_cw(video, u, r, f, d, l, b, *args):
-    if any(face is None for face in [u, l, f, d, b]): print("DEBUG: left_cw recebeu None."); return u, r, f, d, l, b
-    f_before = np.copy(f)
-    expected_u, expected_r, expected_f, expected_d, expected_l, expected_b = np.copy(u), np.copy(r), np.copy(f), np.copy(d), np.copy(l), np.copy(b)
-    expected_f[0, [0, 3, 6]] = u[0, [0, 3, 6]]
-    expected_u[0, [0, 3, 6]] = b[0, [8, 5, 2]]
-    expected_b[0, [8, 5, 2]] = d[0, [0, 3, 6]]
-    expected_d[0, [0, 3, 6]] = f_before[0, [0, 3, 6]]
-    rotated_l = rotate_cw(l)
-    if rotated_l is None: print("DEBUG: rotate_cw(l) falhou."); return u, r, f, d, l, b
-    expected_l = rotated_l
-    if wait_for_move(video, expected_f, f_before, "L", arrows["L"]):
-        return expected_u, expected_r, expected_f, expected_d, expected_l, expected_b
-    else: return u, r, f, d, l, b
+    return _interactive_move(video, "L", (u, r, f, d, l, b))
 
 def left_ccw(video, u, r, f, d, l, b, *args):
-    if any(face is None for face in [u, l, f, d, b]): print("DEBUG: left_ccw recebeu None."); return u, r, f, d, l, b
-    f_before = np.copy(f)
-    expected_u, expected_r, expected_f, expected_d, expected_l, expected_b = np.copy(u), np.copy(r), np.copy(f), np.copy(d), np.copy(l), np.copy(b)
-    expected_f[0, [0, 3, 6]] = d[0, [0, 3, 6]]
-    expected_d[0, [0, 3, 6]] = b[0, [8, 5, 2]]
-    expected_b[0, [8, 5, 2]] = u[0, [0, 3, 6]]
-    expected_u[0, [0, 3, 6]] = f_before[0, [0, 3, 6]]
-    rotated_l = rotate_ccw(l)
-    if rotated_l is None: print("DEBUG: rotate_ccw(l) falhou."); return u, r, f, d, l, b
-    expected_l = rotated_l
-    if wait_for_move(video, expected_f, f_before, "L'", arrows["L'"]):
-        return expected_u, expected_r, expected_f, expected_d, expected_l, expected_b
-    else: return u, r, f, d, l, b
+    return _interactive_move(video, "L'", (u, r, f, d, l, b))
 
 def up_cw(video, u, r, f, d, l, b, *args):
-    if any(face is None for face in [u, r, f, l, b]): print("DEBUG: up_cw recebeu None."); return u, r, f, d, l, b
-    f_before = np.copy(f)
-    expected_u, expected_r, expected_f, expected_d, expected_l, expected_b = np.copy(u), np.copy(r), np.copy(f), np.copy(d), np.copy(l), np.copy(b)
-    expected_f[0, [0, 1, 2]] = r[0, [0, 1, 2]]
-    expected_r[0, [0, 1, 2]] = b[0, [0, 1, 2]]
-    expected_b[0, [0, 1, 2]] = l[0, [0, 1, 2]]
-    expected_l[0, [0, 1, 2]] = f_before[0, [0, 1, 2]]
-    rotated_u = rotate_cw(u)
-    if rotated_u is None: print("DEBUG: rotate_cw(u) falhou."); return u, r, f, d, l, b
-    expected_u = rotated_u
-    if wait_for_move(video, expected_f, f_before, "U", arrows["U"]):
-        return expected_u, expected_r, expected_f, expected_d, expected_l, expected_b
-    else: return u, r, f, d, l, b
+    return _interactive_move(video, "U", (u, r, f, d, l, b))
 
 def up_ccw(video, u, r, f, d, l, b, *args):
-    if any(face is None for face in [u, r, f, l, b]): print("DEBUG: up_ccw recebeu None."); return u, r, f, d, l, b
-    f_before = np.copy(f)
-    expected_u, expected_r, expected_f, expected_d, expected_l, expected_b = np.copy(u), np.copy(r), np.copy(f), np.copy(d), np.copy(l), np.copy(b)
-    expected_f[0, [0, 1, 2]] = l[0, [0, 1, 2]]
-    expected_l[0, [0, 1, 2]] = b[0, [0, 1, 2]]
-    expected_b[0, [0, 1, 2]] = r[0, [0, 1, 2]]
-    expected_r[0, [0, 1, 2]] = f_before[0, [0, 1, 2]]
-    rotated_u = rotate_ccw(u)
-    if rotated_u is None: print("DEBUG: rotate_ccw(u) falhou."); return u, r, f, d, l, b
-    expected_u = rotated_u
-    if wait_for_move(video, expected_f, f_before, "U'", arrows["U'"]):
-        return expected_u, expected_r, expected_f, expected_d, expected_l, expected_b
-    else: return u, r, f, d, l, b
+    return _interactive_move(video, "U'", (u, r, f, d, l, b))
 
 def down_cw(video, u, r, f, d, l, b, *args):
-    if any(face is None for face in [d, r, f, l, b]): print("DEBUG: down_cw recebeu None."); return u, r, f, d, l, b
-    f_before = np.copy(f)
-    expected_u, expected_r, expected_f, expected_d, expected_l, expected_b = np.copy(u), np.copy(r), np.copy(f), np.copy(d), np.copy(l), np.copy(b)
-    expected_f[0, [6, 7, 8]] = l[0, [6, 7, 8]]
-    expected_l[0, [6, 7, 8]] = b[0, [6, 7, 8]]
-    expected_b[0, [6, 7, 8]] = r[0, [6, 7, 8]]
-    expected_r[0, [6, 7, 8]] = f_before[0, [6, 7, 8]]
-    rotated_d = rotate_cw(d)
-    if rotated_d is None: print("DEBUG: rotate_cw(d) falhou."); return u, r, f, d, l, b
-    expected_d = rotated_d
-    if wait_for_move(video, expected_f, f_before, "D", arrows["D"]):
-        return expected_u, expected_r, expected_f, expected_d, expected_l, expected_b
-    else: return u, r, f, d, l, b
+    return _interactive_move(video, "D", (u, r, f, d, l, b))
 
 def down_ccw(video, u, r, f, d, l, b, *args):
-    if any(face is None for face in [d, r, f, l, b]): print("DEBUG: down_ccw recebeu None."); return u, r, f, d, l, b
-    f_before = np.copy(f)
-    expected_u, expected_r, expected_f, expected_d, expected_l, expected_b = np.copy(u), np.copy(r), np.copy(f), np.copy(d), np.copy(l), np.copy(b)
-    expected_f[0, [6, 7, 8]] = r[0, [6, 7, 8]]
-    expected_r[0, [6, 7, 8]] = b[0, [6, 7, 8]]
-    expected_b[0, [6, 7, 8]] = l[0, [6, 7, 8]]
-    expected_l[0, [6, 7, 8]] = f_before[0, [6, 7, 8]]
-    rotated_d = rotate_ccw(d)
-    if rotated_d is None: print("DEBUG: rotate_ccw(d) falhou."); return u, r, f, d, l, b
-    expected_d = rotated_d
-    if wait_for_move(video, expected_f, f_before, "D'", arrows["D'"]):
-        return expected_u, expected_r, expected_f, expected_d, expected_l, expected_b
-    else: return u, r, f, d, l, b
+    return _interactive_move(video, "D'", (u, r, f, d, l, b))
 
 def front_cw(video, u, r, f, d, l, b, *args):
-    if any(face is None for face in [u, r, f, d, l]): print("DEBUG: front_cw recebeu None."); return u, r, f, d, l, b
-    f_before = np.copy(f)
-    expected_u, expected_r, expected_f, expected_d, expected_l, expected_b = np.copy(u), np.copy(r), np.copy(f), np.copy(d), np.copy(l), np.copy(b)
-    u_before = np.copy(u)
-    expected_u[0, [6, 7, 8]] = l[0, [8, 5, 2]]
-    expected_l[0, [2, 5, 8]] = d[0, [0, 1, 2]]
-    expected_d[0, [0, 1, 2]] = r[0, [6, 3, 0]]
-    expected_r[0, [0, 3, 6]] = u_before[0, [6, 7, 8]]
-    rotated_f = rotate_cw(f)
-    if rotated_f is None: print("DEBUG: rotate_cw(f) falhou."); return u, r, f, d, l, b
-    expected_f = rotated_f
-    if wait_for_move(video, expected_f, f_before, "F", arrows["F"]):
-        return expected_u, expected_r, expected_f, expected_d, expected_l, expected_b
-    else: return u, r, f, d, l, b
+    return _interactive_move(video, "F", (u, r, f, d, l, b))
 
 def front_ccw(video, u, r, f, d, l, b, *args):
-    if any(face is None for face in [u, r, f, d, l]): print("DEBUG: front_ccw recebeu None."); return u, r, f, d, l, b
-    f_before = np.copy(f)
-    expected_u, expected_r, expected_f, expected_d, expected_l, expected_b = np.copy(u), np.copy(r), np.copy(f), np.copy(d), np.copy(l), np.copy(b)
-    u_before = np.copy(u)
-    expected_u[0, [6, 7, 8]] = r[0, [0, 3, 6]]
-    expected_r[0, [6, 3, 0]] = d[0, [0, 1, 2]]
-    expected_d[0, [0, 1, 2]] = l[0, [2, 5, 8]]
-    expected_l[0, [8, 5, 2]] = u_before[0, [6, 7, 8]]
-    rotated_f = rotate_ccw(f)
-    if rotated_f is None: print("DEBUG: rotate_ccw(f) falhou."); return u, r, f, d, l, b
-    expected_f = rotated_f
-    if wait_for_move(video, expected_f, f_before, "F'", arrows["F'"]):
-        return expected_u, expected_r, expected_f, expected_d, expected_l, expected_b
-    else: return u, r, f, d, l, b
+    return _interactive_move(video, "F'", (u, r, f, d, l, b))
 
 def back_cw(video, u, r, f, d, l, b, *args):
-    if any(face is None for face in [u, r, d, l, b]): print("DEBUG: back_cw recebeu None."); return u, r, f, d, l, b
-    f_before = np.copy(f)
-    expected_u, expected_r, expected_f, expected_d, expected_l, expected_b = np.copy(u), np.copy(r), np.copy(f), np.copy(d), np.copy(l), np.copy(b)
-    u_before = np.copy(u)
-    expected_u[0, [0, 1, 2]] = r[0, [2, 5, 8]]
-    expected_r[0, [2, 5, 8]] = d[0, [8, 7, 6]]
-    expected_d[0, [8, 7, 6]] = l[0, [6, 3, 0]]
-    expected_l[0, [6, 3, 0]] = u_before[0, [0, 1, 2]]
-    rotated_b = rotate_cw(b)
-    if rotated_b is None: print("DEBUG: rotate_cw(b) falhou."); return u, r, f, d, l, b
-    expected_b = rotated_b
-    if wait_for_move(video, expected_f, f_before, "B", arrows["B"]):
-        return expected_u, expected_r, expected_f, expected_d, expected_l, expected_b
-    else: return u, r, f, d, l, b
+    return _interactive_move(video, "B", (u, r, f, d, l, b))
 
 def back_ccw(video, u, r, f, d, l, b, *args):
-    if any(face is None for face in [u, r, d, l, b]): print("DEBUG: back_ccw recebeu None."); return u, r, f, d, l, b
-    f_before = np.copy(f)
-    expected_u, expected_r, expected_f, expected_d, expected_l, expected_b = np.copy(u), np.copy(r), np.copy(f), np.copy(d), np.copy(l), np.copy(b)
-    u_before = np.copy(u)
-    expected_u[0, [0, 1, 2]] = l[0, [6, 3, 0]]
-    expected_l[0, [6, 3, 0]] = d[0, [8, 7, 6]]
-    expected_d[0, [8, 7, 6]] = r[0, [2, 5, 8]]
-    expected_r[0, [2, 5, 8]] = u_before[0, [0, 1, 2]]
-    rotated_b = rotate_ccw(b)
-    if rotated_b is None: print("DEBUG: rotate_ccw(b) falhou."); return u, r, f, d, l, b
-    expected_b = rotated_b
-    if wait_for_move(video, expected_f, f_before, "B'", arrows["B'"]):
-        return expected_u, expected_r, expected_f, expected_d, expected_l, expected_b
-    else: return u, r, f, d, l, b
+    return _interactive_move(video, "B'", (u, r, f, d, l, b))
 
 
 # --- FUNÇÕES DE ROTAÇÃO DO CUBO (Y) ---
@@ -485,52 +721,44 @@ def back_ccw(video, u, r, f, d, l, b, *args):
 def turn_cube_Y_prime(video, u, r, f, d, l, b, *args): # Virar para Esquerda (Y')
     """ Pede ao usuário para virar o cubo para a esquerda (nova F = antiga R) """
     print("VIRE O CUBO P/ ESQUERDA (Y')")
-    
+
     # O estado 'anterior' que a câmera vê é a face F atual
-    f_before = np.copy(f) 
-    # O estado 'esperado' que a câmera DEVE VER é a antiga face R
-    expected_f = np.copy(r) 
-    
-    # Calcula o estado lógico completo após a rotação Y'
-    new_f, new_l, new_b, new_r = r, f, l, b # R->F, F->L, L->B, B->R
-    rotated_u = rotate_ccw(u)
-    rotated_d = rotate_cw(d)
-    if rotated_u is None or rotated_d is None: return u, r, f, d, l, b
-    new_u, new_d = rotated_u, rotated_d
-    
+    f_before = np.copy(f)
+
+    # Calcula o estado lógico completo após a rotação Y' (a nova F é a antiga R)
+    new_u, new_r, new_f, new_d, new_l, new_b = state_turn_Y_prime(u, r, f, d, l, b)
+    if new_u is None or new_d is None: return u, r, f, d, l, b
+
     # Chama wait_for_move para VERIFICAR a rotação
     # Espera até que a câmera veja a antiga face R como a nova face F
-    if wait_for_move(video, expected_f, f_before, "VIRE P/ ESQUERDA (mostre a face R)", arrows["TURN_L"]):
+    record_event("move_prompt", step="Y'")
+    if wait_for_move(video, new_f, f_before, "VIRE P/ ESQUERDA (mostre a face R)", arrows["TURN_L"]):
         return new_u, new_r, new_f, new_d, new_l, new_b
-    else: 
+    else:
         return u, r, f, d, l, b # Retorna original se 'q' for pressionado
 
 def turn_cube_Y(video, u, r, f, d, l, b, *args): # Virar para Direita (Y)
     """ Pede ao usuário para virar o cubo para a direita (nova F = antiga L) """
     print("VIRE O CUBO P/ DIREITA (Y)")
-    
+
     # O estado 'anterior' que a câmera vê é a face F atual
     f_before = np.copy(f)
-    # O estado 'esperado' que a câmera DEVE VER é a antiga face L
-    expected_f = np.copy(l) 
-    
-    # Calcula o estado lógico completo após a rotação Y
-    new_f, new_r, new_b, new_l = l, f, r, b # L->F, F->R, R->B, B->L
-    rotated_u = rotate_cw(u)
-    rotated_d = rotate_ccw(d)
-    if rotated_u is None or rotated_d is None: return u, r, f, d, l, b
-    new_u, new_d = rotated_u, rotated_d
-    
+
+    # Calcula o estado lógico completo após a rotação Y (a nova F é a antiga L)
+    new_u, new_r, new_f, new_d, new_l, new_b = state_turn_Y(u, r, f, d, l, b)
+    if new_u is None or new_d is None: return u, r, f, d, l, b
+
     # Espera até que a câmera veja a antiga face L como a nova face F
-    if wait_for_move(video, expected_f, f_before, "VIRE P/ DIREITA (mostre a face L)", arrows["TURN_R"]):
+    record_event("move_prompt", step="Y")
+    if wait_for_move(video, new_f, f_before, "VIRE P/ DIREITA (mostre a face L)", arrows["TURN_R"]):
         return new_u, new_r, new_f, new_d, new_l, new_b
-    else: 
+    else:
         return u, r, f, d, l, b # Retorna original se 'q'
 # --- FIM DAS FUNÇÕES DE ROTAÇÃO Y ---
 
 
 # Mapeamento de strings de movimento para funções
-# Removido 'B', 'B'', 'B2' daqui pois serão tratados no loop main
+# Sem 'B', 'B'', 'B2': viram Y' -> R -> Y (move_steps) e cada passo é uma função abaixo
 move_functions = {
     "R": right_cw, "R'": right_ccw,
     "L": left_cw,  "L'": left_ccw,
@@ -539,366 +767,352 @@ move_functions = {
     "F": front_cw, "F'": front_ccw,
     # "B": back_cw,  "B'": back_ccw, # REMOVIDO - SERÁ TRATADO NO MAIN
 }
-# Adiciona movimentos duplos (X2) dinamicamente
+# Adiciona movimentos duplos (X2) dinamicamente - verificados como um único movimento
 for move in list(move_functions.keys()):
     if "'" not in move:
-        func = move_functions[move]
-        move_functions[move + "2"] = lambda v, u, r, f, d, l, b, *a, _func=func: \
-                                     _func(v, *_func(v, u, r, f, d, l, b, *a), *a)
+        move_functions[move + "2"] = lambda v, u, r, f, d, l, b, *a, _move=move + "2": \
+                                     _interactive_move(v, _move, (u, r, f, d, l, b))
+# Passo de move_steps -> função que o pede e verifica
+step_functions = dict(move_functions, **{"Y'": turn_cube_Y_prime, "Y": turn_cube_Y})
 
 print("DEBUG: Funções interativas definidas.") # DEBUG 5 (Fim)
 
 
 # --- 5. Função Principal ---
-def main():
-    global num_to_kociemba_letter, kociemba_letter_to_num
+def main(video=None, headless=False, checkpoint_path=CHECKPOINT_FILE, sweep=False, record_dir=RECORD_DIR):
+    """
+    video: fonte de frames (None = webcam com o perfil de câmara). headless: sem janelas.
+    sweep: scan por varredura (gira-se o cubo por todas as faces, em qualquer ordem) em vez de face a face.
+    Qualquer objeto com read()/get()/release() serve, como a câmara virtual de simulacao.py.
+    checkpoint_path: ficheiro do checkpoint da resolução (ver retomada_sessao.py). None desativa.
+    record_dir: pasta da gravação da sessão (ver gravador_sessao.py). None desativa.
+    """
+    global num_to_kociemba_letter, kociemba_letter_to_num, session_recorder, display
 
     print("DEBUG: Entrando na função main()") # DEBUG 6
-    video = cv2.VideoCapture(0)
-    if not video.isOpened():
-        print("DEBUG: Tentando webcam 1...")
-        video = cv2.VideoCapture(1)
-        if not video.isOpened():
-              print("Erro fatal: Nenhuma webcam encontrada.")
-              return
+    if video is None:
+        video = open_camera(camera_profile) # Resolução/exposição/balanço de branco do perfil de câmara
+    if video is None:
+          print("Erro fatal: Nenhuma webcam encontrada.")
+          return
+    frame_w, frame_h = video.get(cv2.CAP_PROP_FRAME_WIDTH), video.get(cv2.CAP_PROP_FRAME_HEIGHT)
+    if illumination.x1 > frame_w or illumination.y1 > frame_h:
+        print(f"DEBUG: AVISO - A grade ({illumination.x1}x{illumination.y1}) não cabe no frame {frame_w:.0f}x{frame_h:.0f}.")
     print("DEBUG: Webcam aberta com sucesso.") # DEBUG 7
 
-    # Guarda o estado das 6 faces (agora como LISTAS DE LETRAS)
-    cube_state_letters = {face: None for face in faces_order} # MODIFICADO
+    # Faces lidas (listas de letras), montagem e sexta face ficam no CubeScan (passos_sessao.py)
+    cube_scan = CubeScan(lut_letters, sweep=sweep)
     # O cube_state_num será criado DEPOIS do scan
     cube_state_num = {face: None for face in faces_order}
 
-    detected_faces_buffer = []
-    current_face_index = 0
     scan_complete = False
+    rescan_hint = "" # Mensagem quando só uma face precisa ser relida
+    last_scan_prompt = None # Última face pedida (evento scan_prompt)
     solution_moves = []
     current_move_index = 0
+    pending_steps = [] # Passos ainda por fazer do movimento atual (ver move_steps)
     kociemba_string_generated = ""
+    motion_gate.reset() # Filtro de movimento da fase de scan (o mesmo dos movimentos)
+    last_scan_scores = None # Última amostragem (reaproveitada em frames parados)
 
     # Reseta mapeamentos no início
     num_to_kociemba_letter = {}
     kociemba_letter_to_num = {}
 
-    cv2.namedWindow("Resolvendo...")
+    if record_dir:
+        os.makedirs(record_dir, exist_ok=True)
+        record_path = os.path.join(record_dir, time.strftime("sessao_%Y%m%d_%H%M%S.rec"))
+        session_recorder = SessionRecorder(record_path, patch_pixels=(2 * PATCH_RADIUS + 1) ** 2)
+        print(f"DEBUG: Gravando sessão em '{record_path}'.")
+
+    display = DisplayThread(setup=lambda: cv2.namedWindow("Resolvendo..."), headless=headless).start()
     print("DEBUG: Janela 'Resolvendo...' criada.") # DEBUG 7.1
 
+    if not select_profile(video): # Vários perfis: escolhe o que melhor classifica a luz atual
+        print("DEBUG: Saindo durante a escolha do perfil.")
+        video.release(); display.stop(); display = None
+        if session_recorder is not None: session_recorder.close(); session_recorder = None
+        return
+
     print("--- Solver Interativo de Cubo Mágico ---")
     print("Instruções de Scan:")
     print("1. Certifique-se que o arquivo 'calibrated_colors.py' existe e está correto!")
-    print("2. Mostre cada face do cubo alinhada com a grade.")
-    print("3. Mantenha a face estável por ~1 segundo para leitura.")
+    if sweep:
+        print("2. Gire o cubo devagar mostrando as 6 faces na grade, em qualquer ordem e rotação.")
+        print("3. Pare um instante em cada face; faces que faltarem aparecem no topo da tela.")
+    else:
+        print("2. Mostre cada face do cubo alinhada com a grade.")
+        print("3. Mantenha a face estável por ~1 segundo para leitura.")
     print("4. Siga as instruções no topo da tela.")
     print("5. Pressione [Q] para sair a qualquer momento.")
 
+    # Sessão interrompida antes? Oferece retomar, confirmando só a face da frente
+    resume = load_checkpoint(checkpoint_path)
+    if resume is not None:
+        resume_verifier = StepVerifier(face_key(resume["cube_state_num"]['F'])) # Leituras da face da frente
+        kociemba_letter_to_num, num_to_kociemba_letter = resume["letter_to_num"], resume["num_to_letter"]
+        if resume["profile"] in profiles and resume["profile"] != active_profile: # Mesma calibração do scan
+            use_profile(resume["profile"], "checkpoint")
+            cube_scan.set_letters(lut_letters)
+        print(f"Sessão interrompida em {time.strftime('%H:%M:%S', time.localtime(resume['saved_at']))}: "
+              f"movimento {resume['current_move_index'] + 1}/{len(resume['solution_moves'])}"
+              + (f", falta {' -> '.join(resume['pending_steps'])}." if resume["pending_steps"] else "."))
+        print("Mostre a face da frente como estava para retomar, ou pressione [N] para um novo scan.")
+
     while True:
         # print("DEBUG: Inicio do loop while.") # DEBUG 8 (Muito verbose)
-        is_ok, frame = video.read()
+        is_ok, frame = read_frame(video)
         # print(f"DEBUG: video.read() retornou is_ok={is_ok}") # DEBUG 9 (Muito verbose)
         if not is_ok:
             print("DEBUG: Falha ao ler frame. Tentando de novo...")
-            time.sleep(1); is_ok, frame = video.read()
+            time.sleep(1); is_ok, frame = read_frame(video)
             if not is_ok: print("DEBUG: Falha ao ler frame novamente. Saindo."); break
         if frame is None: print("DEBUG: Frame Nulo."); time.sleep(0.1); continue
 
-        frame = cv2.flip(frame, 1)
-        frame_with_grid = draw_preview_grid(frame.copy(), grid_centers)
+        frame, frame_with_grid = mirror_frame(frame) # Buffers reaproveitados (ver memoria_frames.py)
         if frame_with_grid is None: print("DEBUG: draw_preview_grid falhou."); continue
 
-        # --- Fase de Scan ---
-        if not scan_complete:
-             if current_face_index >= len(faces_order):
-                 print("DEBUG: Erro - Índice de face inválido. Reiniciando scan.")
-                 current_face_index = 0; scan_complete = False; cube_state_letters = {f: None for f in faces_order}; detected_faces_buffer = []
-
-             face_code_to_scan = faces_order[current_face_index]
-             face_name = face_names_pt.get(face_code_to_scan, "Desconhecida")
-             text = f"Scan ({current_face_index+1}/6): Mostre {face_name} ({face_code_to_scan})"
+        # --- Retomada: a face da frente confirma o checkpoint ---
+        if resume is not None:
+             expected_front = resume["cube_state_num"]['F']
+             text = f"Retomar ({resume['current_move_index'] + 1}/{len(resume['solution_moves'])}): mostre a frente | [N] novo scan"
+             cv2.putText(frame_with_grid, text, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 255), 2)
+             for i, (x, y) in enumerate(grid_centers): # Letras esperadas no canto de cada sticker
+                 cv2.putText(frame_with_grid, num_to_kociemba_letter.get(int(expected_front[0][i]), '?'), (x - 28, y - 18),
+                             cv2.FONT_HERSHEY_SIMPLEX, 0.4, (0, 255, 255), 1)
+             detected_front = detect_face_from_webcam(frame, grid_centers, kociemba_letter_to_num, illumination)
+             if resume_verifier.update(face_key(detected_front)):
+                 cube_state_num = resume["cube_state_num"]
+                 solution_moves = resume["solution_moves"]
+                 current_move_index = resume["current_move_index"]
+                 pending_steps = resume["pending_steps"]
+                 kociemba_string_generated = resume["kociemba_string"]
+                 scan_complete = True
+                 print(f"DEBUG: Sessão retomada no movimento {current_move_index + 1}/{len(solution_moves)}.")
+                 record_event("resumed", kociemba_string=kociemba_string_generated, moves=solution_moves, index=current_move_index)
+                 resume = None
+                 cv2.putText(frame_with_grid, "OK!", (frame.shape[1] // 2 - 30, frame.shape[0] // 2), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 3)
+                 display.show("Resolvendo...", frame_with_grid)
+                 time.sleep(0.7)
+
+        # --- Fase de Scan --- (leitura, montagem e sexta face em passos_sessao.CubeScan)
+        elif not scan_complete:
+             # Qualquer face que falte é aceite (identificada pelo centro); sugere a primeira em falta
+             missing_faces = cube_scan.missing()
+             requested_face = cube_scan.requested()
+             if requested_face is not None: # Rotação ambígua: só esta face, na orientação canónica
+                 top_face = CANONICAL_TOP[requested_face]
+                 if requested_face != last_scan_prompt:
+                     record_event("scan_prompt", face=requested_face, top=top_face, missing=missing_faces)
+                     last_scan_prompt = requested_face
+                 text = f"Mostre {face_names_pt.get(requested_face)} com {face_names_pt.get(top_face)} em cima"
+             elif sweep:
+                 text = f"Varredura: gire o cubo por todas as faces (faltam: {' '.join(missing_faces) or '-'})"
+             else:
+                 face_code_to_scan = missing_faces[0]
+                 face_name = face_names_pt.get(face_code_to_scan, "Desconhecida")
+                 if face_code_to_scan != last_scan_prompt:
+                     record_event("scan_prompt", face=face_code_to_scan, missing=missing_faces)
+                     last_scan_prompt = face_code_to_scan
+                 if len(missing_faces) == 1:
+                     text = f"Scan (6/6): Mostre {face_name} ({face_code_to_scan})"
+                 else:
+                     text = f"Scan ({7 - len(missing_faces)}/6): Mostre qualquer face que falta: {' '.join(missing_faces)}"
              cv2.putText(frame_with_grid, text, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
-
-             # Tenta detectar a face atual (apenas letras por enquanto)
-             detected_letters = []
-             valid_detection = True
-             try: hsv_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
-             except cv2.error as e: print(f"DEBUG: Erro HSV: {e}."); valid_detection = False
-
-             if valid_detection:
-                 for (x, y) in grid_centers:
-                     if y >= hsv_frame.shape[0] or x >= hsv_frame.shape[1] or y < 0 or x < 0: valid_detection = False; break
-                     pixel_hsv = hsv_frame[y, x]
-                     color_letter = get_color_name(pixel_hsv)
-                     if color_letter == '?': valid_detection = False; break
-                     detected_letters.append(color_letter)
-
-             # --- Adiciona Texto de Debug Visual (MODIFICADO) ---
-             if valid_detection and len(detected_letters) == 9:
-                 # Desenha as letras detectadas ANTES de checar estabilidade
-                 for i, (x, y) in enumerate(grid_centers):
-                     color_letter_detected = detected_letters[i]
-                     text_pos = (x - 10, y + 5)
-                     cv2.putText(frame_with_grid, color_letter_detected, text_pos, cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 0), 2)
-                     cv2.putText(frame_with_grid, color_letter_detected, text_pos, cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
-
-                 # --- Continua com a lógica de estabilidade e verificação do centro ---
-                 detected_faces_buffer.append(detected_letters)
-                 if len(detected_faces_buffer) > 10:
-                     detected_faces_buffer.pop(0)
-
-                 # Verifica estabilidade (3 detecções)
-                 if len(detected_faces_buffer) >= 3 and all(f == detected_letters for f in detected_faces_buffer[-3:]):
-                     center_color_letter = detected_letters[4]
-                     if center_color_letter == face_code_to_scan:
-                         print(f"Face {face_code_to_scan} escaneada (letras): {detected_letters}")
-
-                         # Salva a LISTA DE LETRAS detectada
-                         cube_state_letters[face_code_to_scan] = detected_letters # MODIFICADO
-
-                         current_face_index += 1
-                         detected_faces_buffer = []
-                         cv2.putText(frame_with_grid, "OK!", (frame.shape[1] // 2 - 30, frame.shape[0] // 2), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 3)
-                         cv2.imshow("Resolvendo...", frame_with_grid)
-                         cv2.waitKey(700)
-
-                         # --- Lógica de Mapeamento e Solução ---
-                         if current_face_index == len(faces_order):
-                              scan_complete = True
-                              print("\nDEBUG: Scan completo. Iniciando Mapeamento e Geração da Solução...")
-                              kociemba_string = ""
-                              # --- Bloco try...except CORRIGIDO para mapeamento e geração da string ---
-                              try:
-                                  # --- 1. Criar Mapeamento Final ---
-                                  print("DEBUG: Criando mapeamento baseado nos centros...")
-                                  kociemba_letter_to_num = {}
-                                  num_to_kociemba_letter = {}
-                                  map_letra_para_posicao = {}
-                                  map_posicao_para_letra = {}
-
-                                  for i, face_code_kociemba in enumerate(faces_order):
-                                       if cube_state_letters[face_code_kociemba] is None:
-                                           raise ValueError(f"Estado da face {face_code_kociemba} não foi escaneado.")
-                                       center_letter = cube_state_letters[face_code_kociemba][4]
-                                       assigned_num = i + 1
-                                       if center_letter in kociemba_letter_to_num:
-                                            raise ValueError(f"Erro de Mapeamento: Cor central '{center_letter}' duplicada!")
-                                       kociemba_letter_to_num[center_letter] = assigned_num
-                                       num_to_kociemba_letter[assigned_num] = center_letter
-                                       map_letra_para_posicao[center_letter] = face_code_kociemba
-                                       map_posicao_para_letra[face_code_kociemba] = center_letter
-                                       print(f"DEBUG: Mapeado Centro '{center_letter}' -> Num {assigned_num} (Posição {face_code_kociemba})")
-                                  if len(kociemba_letter_to_num) != 6: raise ValueError("Mapeamento incompleto.")
-                                  print("DEBUG: Mapeamento Cor -> Posição Kociemba:", map_letra_para_posicao)
-
-                                  # --- 2. Converter Estado para Números ---
-                                  print("DEBUG: Convertendo estado (letras) para estado (números)...")
-                                  for face_code in faces_order:
-                                       letras = cube_state_letters[face_code]
-                                       numeros = [kociemba_letter_to_num[l] for l in letras]
-                                       cube_state_num[face_code] = np.array([numeros])
-                                       print(f"DEBUG: Estado Numérico {face_code}: {cube_state_num[face_code]}")
-
-                                  # --- 3. Gerar String Kociemba ---
-                                  print("DEBUG: Gerando string Kociemba (Lógica Corrigida)...")
-                                  kociemba_string = ""
-                                  for face_code_posicao in faces_order:
-                                      letra_centro_da_posicao = map_posicao_para_letra.get(face_code_posicao)
-                                      if letra_centro_da_posicao is None: raise ValueError(f"Cor central não encontrada para posição {face_code_posicao}")
-                                      letras_da_face_escaneada = cube_state_letters.get(letra_centro_da_posicao)
-                                      if letras_da_face_escaneada is None: raise ValueError(f"Estado não encontrado para cor central {letra_centro_da_posicao}")
-                                      for letra_peca in letras_da_face_escaneada:
-                                          posicao_kociemba_da_peca = map_letra_para_posicao.get(letra_peca)
-                                          if posicao_kociemba_da_peca is None: raise ValueError(f"Cor '{letra_peca}' sem mapeamento de posição!")
-                                          kociemba_string += posicao_kociemba_da_peca
-                                  kociemba_string_generated = kociemba_string
-                                  print(f"String Kociemba Final: {kociemba_string}")
-                                  if len(kociemba_string) != 54: raise ValueError(f"String Kociemba com tamanho incorreto: {len(kociemba_string)}")
-
-                                  # --- 4. Chamar Kociemba ---
-                                  print("DEBUG: Chamando kociemba.solve...")
-                                  solution = kociemba.solve(kociemba_string)
-                                  solution_moves = solution.split()
-                                  print(f"Solucao ({len(solution_moves)} mov): {solution}")
-                                  current_move_index = 0
-
-                              except ValueError as ve:
-                                    print(f"DEBUG: Erro de Valor ao Mapear/Gerar Solução: {ve}")
-                                    scan_complete = False; current_face_index = 0; cube_state_letters = {f: None for f in faces_order}; cube_state_num = {f: None for f in faces_order}; num_to_kociemba_letter = {}; kociemba_letter_to_num = {}; detected_faces_buffer = []
-                                    time.sleep(4)
-                              except Exception as e:
-                                  print(f"DEBUG: Erro inesperado no Mapeamento/Solução: {e}")
-                                  scan_complete = False; current_face_index = 0; cube_state_letters = {f: None for f in faces_order}; cube_state_num = {f: None for f in faces_order}; num_to_kociemba_letter = {}; kociemba_letter_to_num = {}; detected_faces_buffer = []
-                                  time.sleep(4)
-                              # --- Fim do Bloco try...except CORRIGIDO ---
-
-                     else: # Centro errado
-                         cv2.putText(frame_with_grid, f"Centro errado! Mostre {face_name}", (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 255), 2)
-                         detected_faces_buffer = []
-                 else: # Não estável
-                     needed = 3 - len(detected_faces_buffer) if len(detected_faces_buffer) < 3 else 0
-                     if not all(f == detected_letters for f in detected_faces_buffer[-3:]) : needed = 3
-                     if needed > 0 :
-                          cv2.putText(frame_with_grid, f"Mantenha estavel... ({needed})", (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 100, 0), 2)
-
-             else: # Detecção inválida (letra '?' ou número errado de cores)
-                  detected_faces_buffer = []
-                  cv2.putText(frame_with_grid, "Ajuste na grade!", (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 255), 2)
-                  # --- Adiciona Texto '?' se a detecção falhou ---
+             if rescan_hint:
+                 cv2.putText(frame_with_grid, rescan_hint, (10, 90), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 255), 2)
+
+             # Amostra uma janela em volta de cada centro e acumula evidência por sticker:
+             # stickers confiáveis ficam confirmados e só os incertos continuam a amostrar.
+             gate = motion_gate.check(frame)
+             frame_scores = None
+             if gate == MotionGate.REUSE and last_scan_scores is not None:
+                 frame_scores = last_scan_scores
+             elif gate != MotionGate.DISCARD:
+                 try:
+                     hsv_roi, roi_centers = illumination.hsv_grid(frame) # Só a ROI, com a luz normalizada
+                     frame_scores = sticker_scores(hsv_roi, roi_centers, color_lut, len(lut_letters))
+                     if frame_scores is not None and check_profile_quality(frame, confident_fraction(frame_scores)):
+                         cube_scan.set_letters(lut_letters) # Índices das cores mudam com o perfil
+                         hsv_roi, roi_centers = illumination.hsv_grid(frame)
+                         frame_scores = sticker_scores(hsv_roi, roi_centers, color_lut, len(lut_letters))
+                     illumination.observe_scores(frame_scores, lut_letters)
+                     if frame_scores is not None: record_grid_frame(scores_to_letters(frame_scores, lut_letters))
+                 except cv2.error as e: print(f"DEBUG: Erro HSV: {e}.")
+                 last_scan_scores = frame_scores
+
+             scan_events = []
+             status = None # (texto, cor) da linha de estado
+             face_by_face = cube_scan.reads_faces() # Face a face, ou releitura pedida durante a varredura
+             if gate == MotionGate.DISCARD: # Frame em movimento/borrado: mantém a evidência acumulada
+                 status = ("Movendo...", (255, 100, 0))
+                 cube_scan.moved()
+             elif face_by_face or gate == MotionGate.CLASSIFY: # A varredura só conta frames novos
+                 scan_events = cube_scan.update(frame_scores, motion_gate.sharpness)
+                 if frame_scores is None:
+                     status = ("Ajuste na grade!", (0, 0, 255))
+                 elif face_by_face:
+                     status = (f"Mantenha estavel... ({int(cube_scan.accumulator.pending().sum())} pendentes)", (255, 100, 0))
+             if face_by_face and frame_scores is not None:
+                 draw_scan_overlay(frame_with_grid, grid_centers, cube_scan.accumulator)
+
+             for event in scan_events:
+                 kind = event.pop("type")
+                 if kind == "sweep_seen":
+                     status = (f"Face {event['face']}", (0, 255, 0))
+                     continue
+                 if kind == "already_scanned":
+                     status = (f"Face {event['face']} ja lida! Faltam: {' '.join(event['missing'])}", (0, 0, 255))
+                     continue
+                 if kind == "wrong_face":
+                     status = (f"Essa e a face {event['face']}: mostre {event['wanted']} com {event['top']} em cima", (0, 0, 255))
+                     continue
+                 record_event(kind, **event)
+                 if kind == "face_locked":
+                     print(f"Face {event['face']} escaneada (letras): {event['letters']}")
+                     last_scan_prompt = None
+                     rescan_hint = ""
+                     cv2.putText(frame_with_grid, "OK!", (frame.shape[1] // 2 - 30, frame.shape[0] // 2), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 3)
+                     display.show("Resolvendo...", frame_with_grid)
+                     time.sleep(0.7)
+                 elif kind == "face_inferred":
+                     print(f"Face {event['face']} deduzida das outras cinco: {event['letters']}")
+                 elif kind == "face_inference_ambiguous":
+                     print(f"DEBUG: Face {event['face']} não pode ser deduzida ({event['answers']} possibilidades). Será lida.")
+                 elif kind == "orientation_needed":
+                     print(f"DEBUG: Rotações ambíguas ({event['answers']} cubos válidos). Relendo a face {event['face']} na orientação canónica.")
+                     rescan_hint = "Rotacao ambigua: mostre a face pedida nessa orientacao"
+                 elif kind == "rescan_face":
+                     print(f"DEBUG: Nenhuma montagem válida (faces suspeitas: {event['suspects']}). Relendo só a face {event['face']}.")
+                     rescan_hint = f"Leitura inconsistente: releia {face_names_pt.get(event['face'], event['face'])}"
+                 elif kind == "scan_error":
+                     print(f"DEBUG: Scan inconsistente ({event['message']}). Recomeçando.")
+                     rescan_hint = "Leitura inconsistente: gire o cubo de novo" if sweep else ""
+             if status:
+                 cv2.putText(frame_with_grid, status[0], (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.6, status[1], 2)
+
+             # --- Lógica de Mapeamento e Solução --- (cubo montado e validado pelo CubeScan)
+             if cube_scan.complete:
+                  scan_complete = True
+                  if sweep: print(f"DEBUG: Varredura: {cube_scan.sweep_scanner.summary()}")
+                  print(f"DEBUG: Filtro de movimento (scan): {motion_gate.summary()}")
+                  print(f"DEBUG: {allocation_monitor.report()}")
+                  print("\nDEBUG: Scan completo. Iniciando Mapeamento e Geração da Solução...")
+                  kociemba_string = ""
+                  # --- Bloco try...except CORRIGIDO para mapeamento e geração da string ---
                   try:
-                      if 'hsv_frame' in locals() and hsv_frame is not None:
-                          temp_letters = []
-                          temp_valid = True
-                          for (x_t, y_t) in grid_centers:
-                              if y_t < hsv_frame.shape[0] and x_t < hsv_frame.shape[1] and y_t >= 0 and x_t >= 0:
-                                  temp_letter = get_color_name(hsv_frame[y_t, x_t])
-                                  temp_letters.append(temp_letter)
-                              else:
-                                  temp_letters.append('X')
-                                  temp_valid = False
-                          if temp_valid and len(temp_letters) == 9:
-                               for i, (x, y) in enumerate(grid_centers):
-                                   text_pos = (x - 10, y + 5)
-                                   cv2.putText(frame_with_grid, temp_letters[i], text_pos, cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 0), 2)
-                                   cv2.putText(frame_with_grid, temp_letters[i], text_pos, cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
-                  except Exception as e_draw:
-                       print(f"Debug: Erro menor ao tentar desenhar letras em detecção inválida: {e_draw}")
-             # --- Fim das Modificações ---
+                      # --- 1-3. Mapeamento, Estado Numérico e String Kociemba ---
+                      print("DEBUG: Criando mapeamento baseado nos centros e string Kociemba...")
+                      kociemba_string, kociemba_letter_to_num, num_to_kociemba_letter, cube_state_num = \
+                          build_kociemba_state(cube_scan.faces)
+                      print("DEBUG: Mapeamento Cor -> Número:", kociemba_letter_to_num)
+                      for face_code in faces_order:
+                           print(f"DEBUG: Estado Numérico {face_code}: {cube_state_num[face_code]}")
+                      kociemba_string_generated = kociemba_string
+                      print(f"String Kociemba Final: {kociemba_string}")
+
+                      # --- 4. Chamar Kociemba ---
+                      print("DEBUG: Chamando kociemba.solve...")
+                      solution = kociemba.solve(kociemba_string)
+                      solution_moves = solution.split()
+                      print(f"Solucao ({len(solution_moves)} mov): {solution}")
+                      record_event("solution", kociemba_string=kociemba_string, moves=solution_moves)
+                      current_move_index = 0
+                      if checkpoint_path:
+                          save_checkpoint(checkpoint_path, kociemba_string, cube_state_num, solution_moves,
+                                          current_move_index, kociemba_letter_to_num, active_profile)
+
+                  except ValueError as ve:
+                        print(f"DEBUG: Erro de Valor ao Mapear/Gerar Solução: {ve}")
+                        record_event("scan_error", message=str(ve))
+                        scan_complete = False; cube_scan.reset(); cube_state_num = {f: None for f in faces_order}; num_to_kociemba_letter = {}; kociemba_letter_to_num = {}; rescan_hint = ""
+                        time.sleep(4)
+                  except Exception as e:
+                      print(f"DEBUG: Erro inesperado no Mapeamento/Solução: {e}")
+                      record_event("scan_error", message=str(e))
+                      scan_complete = False; cube_scan.reset(); cube_state_num = {f: None for f in faces_order}; num_to_kociemba_letter = {}; kociemba_letter_to_num = {}; rescan_hint = ""
+                      time.sleep(4)
+                  # --- Fim do Bloco try...except CORRIGIDO ---
 
         # --- Fase de Resolução Interativa (MODIFICADA) ---
+        # Cada movimento vira os passos de move_steps (B = Y' -> R -> Y); o checkpoint é gravado
+        # depois de cada passo verificado, então uma saída entre Y' e R retoma no passo certo.
         elif current_move_index < len(solution_moves):
              move = solution_moves[current_move_index]
-             
+             if not pending_steps:
+                 pending_steps = list(move_steps.get(move, []))
+                 print(f"\nDEBUG: Processando movimento {move} ({current_move_index+1}/{len(solution_moves)}): {' -> '.join(pending_steps)}")
+             step = pending_steps[0] if pending_steps else None
+             step_func = step_functions.get(step)
+             if step_func is None:
+                 print(f"DEBUG: Erro - Movimento '{move}' desconhecido.")
+                 break
+
              # Pega os argumentos comuns para as funções
-             current_u = cube_state_num.get('U'); current_r = cube_state_num.get('R')
-             current_f = cube_state_num.get('F'); current_d = cube_state_num.get('D')
-             current_l = cube_state_num.get('L'); current_b = cube_state_num.get('B')
-             
-             if any(face is None for face in [current_u, current_r, current_f, current_d, current_l, current_b]):
+             current_faces = tuple(cube_state_num.get(face) for face in faces_order)
+             if any(face is None for face in current_faces):
                   print("DEBUG: ERRO CRÍTICO - Estado numérico incompleto antes de aplicar movimento!")
                   break
-                  
-             # --- LÓGICA DE INTERCEPTAÇÃO DE 'B' ---
-             interrupted = False
-             new_u, new_r, new_f, new_d, new_l, new_b = current_u, current_r, current_f, current_d, current_l, current_b
 
              # Argumentos genéricos para as funções de movimento
-             move_args = (video, current_u, current_r, current_f, current_d, current_l, current_b,
-                          kociemba_letter_to_num,
+             move_args = (video, *current_faces, kociemba_letter_to_num,
                           grid_centers[0][0] - 70, grid_centers[0][1] - 70, 70, 70)
+             new_faces = step_func(*move_args)
 
-             print(f"\nDEBUG: Processando movimento {move} ({current_move_index+1}/{len(solution_moves)})")
-
-             if move == "B":
-                 # B = Y' -> R' -> Y (Lógica corrigida, B é R' na face oposta)
-                 print("DEBUG: Movimento 'B'. Rotacionando Y'...")
-                 new_u, new_r, new_f, new_d, new_l, new_b = turn_cube_Y_prime(*move_args)
-                 if np.array_equal(new_f, current_f): interrupted = True
-                 
-                 if not interrupted:
-                      print("DEBUG: ...Rotacionado. Executando R'...")
-                      move_args_step2 = (video, new_u, new_r, new_f, new_d, new_l, new_b, *move_args[7:])
-                      new_u, new_r, new_f, new_d, new_l, new_b = right_ccw(*move_args_step2) # R'
-                      if np.array_equal(new_f, move_args_step2[3]): interrupted = True
-                 
-                 if not interrupted:
-                      print("DEBUG: ...Movimento R' feito. Rotacionando Y...")
-                      move_args_step3 = (video, new_u, new_r, new_f, new_d, new_l, new_b, *move_args[7:])
-                      new_u, new_r, new_f, new_d, new_l, new_b = turn_cube_Y(*move_args_step3)
-                      if np.array_equal(new_f, move_args_step3[3]): interrupted = True
-             
-             elif move == "B'":
-                 # B' = Y' -> R -> Y
-                 print("DEBUG: Movimento 'B''. Rotacionando Y'...")
-                 new_u, new_r, new_f, new_d, new_l, new_b = turn_cube_Y_prime(*move_args)
-                 if np.array_equal(new_f, current_f): interrupted = True
-
-                 if not interrupted:
-                      print("DEBUG: ...Rotacionado. Executando R...")
-                      move_args_step2 = (video, new_u, new_r, new_f, new_d, new_l, new_b, *move_args[7:])
-                      new_u, new_r, new_f, new_d, new_l, new_b = right_cw(*move_args_step2) # R
-                      if np.array_equal(new_f, move_args_step2[3]): interrupted = True
-
-                 if not interrupted:
-                      print("DEBUG: ...Movimento R feito. Rotacionando Y...")
-                      move_args_step3 = (video, new_u, new_r, new_f, new_d, new_l, new_b, *move_args[7:])
-                      new_u, new_r, new_f, new_d, new_l, new_b = turn_cube_Y(*move_args_step3)
-                      if np.array_equal(new_f, move_args_step3[3]): interrupted = True
-
-             elif move == "B2":
-                 # B2 = Y' -> R2 -> Y
-                 print("DEBUG: Movimento 'B2'. Rotacionando Y'...")
-                 new_u, new_r, new_f, new_d, new_l, new_b = turn_cube_Y_prime(*move_args)
-                 if np.array_equal(new_f, current_f): interrupted = True
-
-                 if not interrupted:
-                      print("DEBUG: ...Rotacionado. Executando R2 (1/2)...")
-                      move_args_step2 = (video, new_u, new_r, new_f, new_d, new_l, new_b, *move_args[7:])
-                      new_u, new_r, new_f, new_d, new_l, new_b = right_cw(*move_args_step2) # R (1)
-                      if np.array_equal(new_f, move_args_step2[3]): interrupted = True
-
-                 if not interrupted:
-                      print("DEBUG: ...Movimento R (1/2) feito. Executando R2 (2/2)...")
-                      move_args_step3 = (video, new_u, new_r, new_f, new_d, new_l, new_b, *move_args[7:])
-                      new_u, new_r, new_f, new_d, new_l, new_b = right_cw(*move_args_step3) # R (2)
-                      if np.array_equal(new_f, move_args_step3[3]): interrupted = True
-                 
-                 if not interrupted:
-                      print("DEBUG: ...Movimento R2 feito. Rotacionando Y...")
-                      move_args_step4 = (video, new_u, new_r, new_f, new_d, new_l, new_b, *move_args[7:])
-                      new_u, new_r, new_f, new_d, new_l, new_b = turn_cube_Y(*move_args_step4)
-                      if np.array_equal(new_f, move_args_step4[3]): interrupted = True
-
-             else:
-                 # --- LÓGICA ANTIGA (Para movimentos F, R, L, U, D) ---
-                 move_func = move_functions.get(move)
-                 if move_func:
-                     new_u, new_r, new_f, new_d, new_l, new_b = move_func(*move_args)
-                     # Verifica interrupção
-                     if (np.array_equal(new_u, current_u) and np.array_equal(new_r, current_r) and
-                         np.array_equal(new_f, current_f) and np.array_equal(new_d, current_d) and
-                         np.array_equal(new_l, current_l) and np.array_equal(new_b, current_b)):
-                         if move_func != wait_for_move: interrupted = True
-                 else:
-                     print(f"DEBUG: Erro - Movimento '{move}' desconhecido.")
-                     interrupted = True # Pula movimento desconhecido
-             
-             # --- FIM DA LÓGICA DE INTERCEPTAÇÃO ---
-
-             if interrupted:
-                 print("DEBUG: Execução interrompida pelo usuário ('q') ou movimento desconhecido.")
+             # As funções devolvem o estado de antes se o usuário saiu ('q') ou a janela fechou
+             if cube_key(*new_faces) == cube_key(*current_faces):
+                 print("DEBUG: Execução interrompida pelo usuário ('q').")
                  break # Sai do loop principal
 
              # Atualiza o estado global
-             cube_state_num['U'] = new_u; cube_state_num['R'] = new_r
-             cube_state_num['F'] = new_f; cube_state_num['D'] = new_d
-             cube_state_num['L'] = new_l; cube_state_num['B'] = new_b
-             current_move_index += 1
-             print(f"DEBUG: Movimento {move} concluído.")
+             cube_state_num = dict(zip(faces_order, new_faces))
+             pending_steps.pop(0)
+             if not pending_steps:
+                 current_move_index += 1
+                 record_event("move_done", move=move, index=current_move_index - 1)
+                 print(f"DEBUG: Movimento {move} concluído.")
+             if checkpoint_path and current_move_index < len(solution_moves): # ~1 KB de JSON, bem menos de 1 ms
+                 save_checkpoint(checkpoint_path, kociemba_string_generated, cube_state_num, solution_moves,
+                                 current_move_index, kociemba_letter_to_num, active_profile, pending_steps)
 
         else: # Fim da solução
              print("DEBUG: Fim da solução.")
+             record_event("solved")
+             clear_checkpoint(checkpoint_path)
              cv2.putText(frame_with_grid, "CUBO RESOLVIDO!", (frame.shape[1] // 2 - 150, frame.shape[0] // 2), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 3)
-             cv2.imshow("Resolvendo...", frame_with_grid)
-             cv2.waitKey(3000)
+             display.show("Resolvendo...", frame_with_grid)
+             time.sleep(3.0)
              break
 
 
-        # Mostra o frame final do loop
-        if cv2.getWindowProperty("Resolvendo...", cv2.WND_PROP_VISIBLE) >= 1:
-             cv2.imshow("Resolvendo...", frame_with_grid)
-        else:
+        # Mostra o frame final do loop (entregue à thread de exibição, que descarta se estiver atrasada)
+        if display.closed:
             print("DEBUG: Janela 'Resolvendo...' foi fechada. Saindo.")
             break
+        display.show("Resolvendo...", frame_with_grid)
+        display.tick_detection()
 
-        key = cv2.waitKey(1) & 0xFF
+        key = display.poll_key()
         if key == ord('q'):
             print("DEBUG: 'q' pressionado no loop principal.")
             break
+        if key in (ord('n'), ord('N')) and resume is not None: # Recusa a retomada: scan do zero
+            print("DEBUG: Retomada recusada. Novo scan.")
+            clear_checkpoint(checkpoint_path)
+            resume = None; num_to_kociemba_letter = {}; kociemba_letter_to_num = {}
 
     # --- Fim ---
     print("DEBUG: Saindo do loop while.") # DEBUG 13
     video.release()
-    cv2.destroyAllWindows()
+    if session_recorder is not None:
+        session_recorder.close()
+        print(f"DEBUG: Sessão gravada em '{session_recorder.path}'.")
+        session_recorder = None
+    display.stop() # Fecha as janelas dentro da própria thread de exibição
+    display = None
+    print(f"DEBUG: {allocation_monitor.report()}")
     print("DEBUG: Recursos liberados.") # DEBUG 14
-    for _ in range(5): cv2.waitKey(1)
     print("--- Fim do Script ---") # DEBUG 15
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main(sweep="--varredura" in sys.argv[1:])
\ No newline at end of file
@@ -0,0 +1,5 @@
+# Os módulos do projeto ficam na raiz (sem pacote): os testes importam-nos diretamente.
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,126 @@
+# Perfis de câmara contra uma captura falsa que imita o que os drivers fazem: aceitar só
+# alguns valores, arredondar outros e ler frames com um atraso.
+import time
+
+import numpy as np
+import pytest
+
+cv2 = pytest.importorskip("cv2")
+import configuracao_camera
+from configuracao_camera import (CAMERA_PROFILES, apply_camera_profile, auto_exposure_values,
+                                 fourcc_to_str, measure_capture, open_camera)
+
+
+class FakeCapture:
+    """ Imita um cv2.VideoCapture: guarda as propriedades e deixa o teste decidir o que o "driver" aceita. """
+
+    def __init__(self, backend="V4L2", opened=True, read_delay=0.0, frames=None, accept=None):
+        self.backend = backend
+        self.opened = opened
+        self.read_delay = read_delay
+        self.frames = frames   # Quantos read() funcionam (None = todos)
+        self.accept = accept or {} # Propriedade -> função (pedido -> aceito)
+        self.props = {cv2.CAP_PROP_FRAME_WIDTH: 1920.0, cv2.CAP_PROP_FRAME_HEIGHT: 1080.0,
+                      cv2.CAP_PROP_FPS: 30.0, cv2.CAP_PROP_FOURCC: float(cv2.VideoWriter_fourcc(*"YUYV"))}
+        self.set_order = []
+        self.reads = 0
+
+    def isOpened(self):
+        return self.opened
+
+    def getBackendName(self):
+        if self.backend is None:
+            raise cv2.error("sem backend")
+        return self.backend
+
+    def set(self, prop, value):
+        self.set_order.append(prop)
+        self.props[prop] = float(self.accept.get(prop, lambda v: v)(value))
+        return True
+
+    def get(self, prop):
+        return self.props.get(prop, 0.0)
+
+    def read(self):
+        if self.frames is not None and self.reads >= self.frames:
+            return False, None
+        self.reads += 1
+        time.sleep(self.read_delay)
+        return True, np.zeros((4, 4, 3), dtype=np.uint8)
+
+    def release(self):
+        self.opened = False
+
+
+def test_fourcc_round_trip():
+    assert fourcc_to_str(cv2.VideoWriter_fourcc(*"MJPG")) == "MJPG"
+    assert fourcc_to_str(0) == ""
+
+@pytest.mark.parametrize("backend, expected", [("V4L2", (1, 3)), ("DSHOW", (0.25, 0.75)), (None, (0.25, 0.75))])
+def test_auto_exposure_scale_depends_on_backend(backend, expected):
+    assert auto_exposure_values(FakeCapture(backend=backend)) == expected
+
+def test_profile_is_applied_with_fourcc_first_and_reported():
+    cap = FakeCapture()
+    report = apply_camera_profile(cap, CAMERA_PROFILES["baixa_latencia"])
+    assert cap.set_order[0] == cv2.CAP_PROP_FOURCC # Alguns drivers só aceitam a resolução depois do formato
+    assert report["fourcc"] == ("MJPG", "MJPG")
+    assert report["width"] == (640, 640.0) and report["height"] == (480, 480.0)
+    assert report["auto_exposure"] == (1, 1.0) # V4L2: 1 = manual
+    assert report["auto_white_balance"] == (0, 0.0)
+    assert "exposure" not in report # None fica no padrão do driver
+
+def test_report_shows_what_the_driver_refused():
+    cap = FakeCapture(backend="MSMF", accept={
+        cv2.CAP_PROP_FRAME_WIDTH: lambda v: 1280, # Resolução mínima do driver
+        cv2.CAP_PROP_FOURCC: lambda v: cv2.VideoWriter_fourcc(*"YUYV"),
+    })
+    report = apply_camera_profile(cap, CAMERA_PROFILES["baixa_latencia"])
+    assert report["width"] == (640, 1280.0)
+    assert report["fourcc"] == ("MJPG", "YUYV")
+    assert report["auto_exposure"] == (0.25, 0.25)
+
+def test_default_profile_sets_nothing():
+    cap = FakeCapture()
+    assert apply_camera_profile(cap, CAMERA_PROFILES["padrao"]) == {}
+    assert cap.set_order == []
+
+def test_measure_capture_times_each_read():
+    stats = measure_capture(FakeCapture(read_delay=0.002), frames=10)
+    assert stats["frames"] == 10
+    assert stats["read_ms_mean"] >= 2.0 and stats["read_ms_p95"] >= stats["read_ms_mean"] * 0.5
+    assert 0 < stats["fps"] <= 500
+
+def test_measure_capture_stops_when_reads_fail():
+    assert measure_capture(FakeCapture(frames=4), frames=10)["frames"] == 4
+    assert measure_capture(FakeCapture(frames=0), frames=10) is None
+
+def test_open_camera_falls_back_to_the_next_index(monkeypatch, capsys):
+    opened = []
+    def video_capture(index, api):
+        opened.append(index)
+        return FakeCapture(opened=index == 1)
+    monkeypatch.setattr(configuracao_camera.cv2, "VideoCapture", video_capture)
+    cap = open_camera("baixa_latencia", indexes=(0, 1), measure=False)
+    assert cap is not None and opened[-1] == 1
+    assert cap.get(cv2.CAP_PROP_FRAME_WIDTH) == 640
+    out = capsys.readouterr().out
+    assert "Webcam 0 indisponível" in out and "NÃO ACEITO" not in out
+
+def test_open_camera_unknown_profile_uses_driver_defaults(monkeypatch, capsys):
+    cap = FakeCapture()
+    monkeypatch.setattr(configuracao_camera.cv2, "VideoCapture", lambda index, api: cap)
+    assert open_camera("nao_existe", measure=True) is cap
+    assert cap.set_order == []
+    out = capsys.readouterr().out
+    assert "desconhecido" in out and "Captura:" in out
+
+def test_open_camera_flags_refused_settings(monkeypatch, capsys):
+    cap = FakeCapture(accept={cv2.CAP_PROP_FPS: lambda v: 15})
+    monkeypatch.setattr(configuracao_camera.cv2, "VideoCapture", lambda index, api: cap)
+    open_camera("baixa_latencia", measure=False)
+    assert "fps: pedido 30, aceito 15.0  <-- NÃO ACEITO" in capsys.readouterr().out
+
+def test_open_camera_without_any_webcam(monkeypatch):
+    monkeypatch.setattr(configuracao_camera.cv2, "VideoCapture", lambda index, api: FakeCapture(opened=False))
+    assert open_camera(measure=False) is None
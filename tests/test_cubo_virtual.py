@@ -0,0 +1,34 @@
+# Convenções dos movimentos do cubo virtual (a referência dos outros testes).
+import random
+
+import pytest
+
+from cubo_virtual import SOLVED, apply_moves, random_scramble
+
+
+@pytest.mark.parametrize("move", ["U", "R", "F", "D", "L", "B", "Y"])
+def test_quarter_turn_four_times_is_identity(move):
+    state = apply_moves(SOLVED, random_scramble(random.Random(1), 20))
+    assert apply_moves(state, [move] * 4) == state
+    assert apply_moves(state, [move] * 4) != apply_moves(state, [move])
+
+@pytest.mark.parametrize("move", ["U", "R", "F", "D", "L", "B"])
+def test_prime_and_double_variants(move):
+    state = apply_moves(SOLVED, random_scramble(random.Random(2), 20))
+    assert apply_moves(state, [move, move + "'"]) == state
+    assert apply_moves(state, [move + "2"]) == apply_moves(state, [move, move])
+
+@pytest.mark.parametrize("move, steps", [("B", ["Y'", "R", "Y"]), ("B'", ["Y'", "R'", "Y"]), ("B2", ["Y'", "R2", "Y"])])
+def test_back_moves_match_the_steps_shown_to_the_user(move, steps):
+    # O solver pede B como Y' -> R -> Y (ver move_steps)
+    state = apply_moves(SOLVED, random_scramble(random.Random(3), 20))
+    assert apply_moves(state, steps) == apply_moves(state, [move])
+
+def test_y_prime_brings_the_right_face_to_the_front():
+    turned = apply_moves(SOLVED, ["Y'"])
+    assert turned[18:27] == SOLVED[9:18] # Nova F = antiga R
+    assert turned[0:9] == SOLVED[0:9] and turned[27:36] == SOLVED[27:36]
+
+def test_unknown_move_raises():
+    with pytest.raises(ValueError):
+        apply_moves(SOLVED, ["X"])
@@ -0,0 +1,52 @@
+# Filtro de movimento: cenas paradas sem textura não podem ficar descartadas para sempre.
+import numpy as np
+import pytest
+
+pytest.importorskip("cv2")
+from filtro_movimento import MAX_BLUR_DISCARDS, MIN_SHARPNESS, MotionGate
+
+CENTERS = [(x, y) for y in (200, 270, 340) for x in (250, 320, 390)]
+
+
+def flat_frame(level=120):
+    """ Face lisa num fundo liso: quase nenhuma textura. """
+    return np.full((480, 640, 3), level, dtype=np.uint8)
+
+def textured_frame(seed=0):
+    return np.random.default_rng(seed).integers(0, 256, (480, 640, 3), dtype=np.uint8)
+
+
+def test_flat_scene_is_classified_after_the_blur_limit():
+    gate = MotionGate(CENTERS)
+    decisions = [gate.check(flat_frame()) for _ in range(3 * MAX_BLUR_DISCARDS)]
+    assert gate.sharpness < MIN_SHARPNESS
+    assert decisions[:MAX_BLUR_DISCARDS - 1] == [MotionGate.DISCARD] * (MAX_BLUR_DISCARDS - 1)
+    assert MotionGate.DISCARD not in decisions[MAX_BLUR_DISCARDS:] # Depois de aceite, a cena lisa continua aceite
+
+def test_textured_scene_then_flat_scene_recovers():
+    gate = MotionGate(CENTERS)
+    for _ in range(5):
+        gate.check(textured_frame())
+    decisions = [gate.check(flat_frame()) for _ in range(2 * MAX_BLUR_DISCARDS + 2)]
+    assert decisions[0] == MotionGate.DISCARD # A mudança é um movimento / frame borrado
+    assert decisions[-1] != MotionGate.DISCARD
+
+def test_blurred_frame_in_a_textured_scene_is_discarded():
+    gate = MotionGate(CENTERS)
+    frame = textured_frame()
+    for _ in range(5):
+        gate.check(frame)
+    import cv2
+    blurred = cv2.GaussianBlur(frame, (31, 31), 0)
+    gate.check(blurred) # Pode contar como movimento; o seguinte é só borrado
+    assert gate.check(blurred) == MotionGate.DISCARD
+
+def test_reset_forgets_the_history_but_keeps_the_buffers():
+    gate = MotionGate(CENTERS)
+    for seed in range(3):
+        gate.check(textured_frame(seed))
+    allocations = gate.pool.allocations
+    gate.reset()
+    assert gate.counts == {MotionGate.CLASSIFY: 0, MotionGate.REUSE: 0, MotionGate.DISCARD: 0}
+    assert gate.check(textured_frame(5)) == MotionGate.CLASSIFY # Primeiro frame do novo movimento
+    assert gate.pool.allocations == allocations
@@ -0,0 +1,78 @@
+# Gravação e replay: o replay tem de classificar com o perfil que a sessão usava.
+import sys
+import types
+
+import numpy as np
+import pytest
+
+pytest.importorskip("cv2")
+from classificador_cores import PATCH_RADIUS, build_color_lut, sticker_scores, scores_to_letters
+from gerador_sintetico import DEFAULT_PALETTE
+from gravador_sessao import SessionRecorder, patches_to_image, read_records, replay, REC_EVENT, REC_LETTERS, REC_PATCHES
+
+VALUES = {
+    'B': ([91, 185, 0], [147, 255, 255]), 'F': ([53, 107, 0], [91, 255, 255]),
+    'R': ([120, 80, 187], [179, 255, 255]), 'L': ([14, 56, 225], [27, 255, 255]),
+    'D': ([21, 5, 209], [41, 255, 255]), 'U': ([83, 0, 197], [116, 91, 255]),
+}
+SWAPPED = dict(VALUES, R=VALUES['L'], L=VALUES['R']) # Outro perfil: vermelho e laranja trocados
+PIXELS = (2 * PATCH_RADIUS + 1) ** 2
+
+
+@pytest.fixture
+def calibration(monkeypatch):
+    module = types.ModuleType("calibrated_colors")
+    module.calibrated_values = VALUES
+    module.calibration_profiles = {"normal": {"values": VALUES}, "trocado": {"values": SWAPPED}}
+    module.active_profile = "normal"
+    monkeypatch.setitem(sys.modules, "calibrated_colors", module)
+
+def face_patches(face):
+    return np.stack([np.tile(np.array(DEFAULT_PALETTE[c], dtype=np.uint8), (PIXELS, 1)) for c in face])
+
+def classify(patches, values):
+    lut, letters = build_color_lut(values)
+    image, centers, radius = patches_to_image(patches)
+    import cv2
+    scores = sticker_scores(cv2.cvtColor(image, cv2.COLOR_BGR2HSV), centers, lut, len(letters), radius)
+    return scores_to_letters(scores, letters)
+
+def record(path, segments):
+    """ segments: [(perfil ou None, face)]; grava os patches e as letras que esse perfil lê. """
+    recorder = SessionRecorder(str(path), PIXELS)
+    profile_values = {"normal": VALUES, "trocado": SWAPPED}
+    current = "normal"
+    for profile, face in segments:
+        if profile is not None:
+            recorder.event("profile", name=profile, reason="teste")
+            current = profile
+        patches = face_patches(face)
+        recorder.patches(patches)
+        recorder.letters(classify(patches, profile_values[current]))
+    recorder.close()
+
+
+def test_records_round_trip(tmp_path):
+    path = tmp_path / "sessao.rec"
+    record(path, [(None, "URFDLBURF")])
+    kinds = [kind for kind, _, _ in read_records(str(path))]
+    assert kinds == [REC_PATCHES, REC_LETTERS]
+
+def test_replay_follows_recorded_profile_switches(tmp_path, calibration):
+    path = tmp_path / "sessao.rec"
+    face = "RLRLURLDB"
+    record(path, [(None, face)] * 3 + [("trocado", face)] + [(None, face)] * 3 + [("normal", face)])
+    assert classify(face_patches(face), VALUES) != classify(face_patches(face), SWAPPED)
+    result = replay(str(path))
+    assert result["frames"] == 8
+    assert result["agree"] == 8
+
+def test_replay_starts_with_the_saved_active_profile(tmp_path, calibration):
+    sys.modules["calibrated_colors"].active_profile = "trocado"
+    path = tmp_path / "sessao.rec"
+    recorder = SessionRecorder(str(path), PIXELS)
+    patches = face_patches("RLRLURLDB")
+    recorder.patches(patches)
+    recorder.letters(classify(patches, SWAPPED))
+    recorder.close()
+    assert replay(str(path))["agree"] == 1
@@ -0,0 +1,32 @@
+# Pools de buffers: as contagens de alocação são acumuladas, mesmo com pools descartados.
+import gc
+
+import numpy as np
+
+from memoria_frames import AllocationMonitor, FramePool, allocation_stats
+
+
+def test_buffers_are_reused_for_the_same_shape():
+    pool = FramePool("teste")
+    first = pool.get("a", (4, 4))
+    assert pool.get("a", (4, 4)) is first
+    assert pool.get("a", (5, 4)) is not first
+    assert (pool.allocations, pool.requests) == (2, 3)
+
+def test_totals_do_not_shrink_when_a_pool_is_collected():
+    before = allocation_stats()
+    pool = FramePool("temporario")
+    pool.get("a", (8, 8))
+    pool.keep("b", np.zeros(3))
+    del pool
+    gc.collect()
+    allocations, requests = allocation_stats()
+    assert (allocations - before[0], requests - before[1]) == (2, 2)
+
+def test_monitor_sees_allocations_of_short_lived_pools():
+    monitor = AllocationMonitor(warmup_frames=1)
+    monitor.tick()
+    FramePool("por movimento").get("a", (2, 2)) # Pool criado e descartado depois do aquecimento
+    gc.collect()
+    monitor.tick()
+    assert "(1 depois dos primeiros 1 frames)" in monitor.report()
@@ -0,0 +1,85 @@
+# Montagem: faces lidas em qualquer rotação voltam ao cubo certo; ambiguidades e leituras
+# erradas são apontadas em vez de resolvidas por palpite.
+import random
+
+import pytest
+
+from cubo_virtual import FACES, SOLVED, apply_moves, face_letters, random_scramble
+from montagem_cubo import (CANONICAL_TOP, ambiguous_faces, assemble, infer_missing_face,
+                           misread_faces, rotate_letters)
+
+
+def scrambled(rng, length=20):
+    return apply_moves(SOLVED, random_scramble(rng, length))
+
+def read_rotated(state, rng):
+    """ As 6 faces como o scan as lê, cada uma numa rotação qualquer. """
+    return {face: rotate_letters(list(face_letters(state, face)), rng.randrange(4)) for face in FACES}
+
+
+def test_rotate_letters_four_quarters_is_identity():
+    letters = list("abcdefghi")
+    assert rotate_letters(letters, 1) == list("gdahebifc")
+    assert rotate_letters(rotate_letters(letters, 1), 3) == letters
+
+def test_canonical_orientation_is_the_kociemba_orientation():
+    # A face pedida "com CANONICAL_TOP em cima" é lida como na string Kociemba (rotação 0)
+    state = apply_moves(SOLVED, ["R", "U"])
+    turned = apply_moves(state, ["Y'"]) # R vai para a frente, com U em cima
+    assert CANONICAL_TOP['R'] == 'U'
+    assert face_letters(turned, 'F') == face_letters(state, 'R')
+
+@pytest.mark.parametrize("seed", range(10))
+def test_rotated_faces_assemble_to_the_scrambled_cube(seed):
+    rng = random.Random(seed)
+    state = scrambled(rng)
+    assert assemble(read_rotated(state, rng)) == [state]
+
+@pytest.mark.parametrize("seed", range(10))
+def test_ambiguous_rotations_are_resolved_by_canonical_rereads(seed):
+    rng = random.Random(seed)
+    state = scrambled(rng, 1)
+    faces, fixed = read_rotated(state, rng), set()
+    cubes = assemble(faces)
+    assert state in cubes and len(cubes) > 1 # Um movimento só: várias rotações formam cubos válidos
+    while len(cubes) > 1:
+        face = ambiguous_faces(cubes)[0]
+        assert face not in fixed
+        faces[face], fixed = list(face_letters(state, face)), fixed | {face}
+        cubes = assemble(faces, fixed)
+    assert cubes == [state]
+
+def test_solved_cube_is_a_single_answer():
+    rng = random.Random(0)
+    assert assemble(read_rotated(SOLVED, rng)) == [SOLVED]
+
+@pytest.mark.parametrize("seed", range(10))
+def test_missing_face_is_inferred(seed):
+    rng = random.Random(seed)
+    state = scrambled(rng)
+    faces = read_rotated(state, rng)
+    del faces[FACES[seed % 6]]
+    assert state in infer_missing_face(faces)
+
+def test_infer_needs_five_faces():
+    with pytest.raises(ValueError):
+        infer_missing_face(read_rotated(SOLVED, random.Random(0)))
+
+@pytest.mark.parametrize("seed", range(10))
+def test_single_misread_is_localized(seed):
+    rng = random.Random(seed)
+    state = scrambled(rng)
+    index = rng.choice([i for i in range(54) if i % 9 != 4])
+    wrong = state[:index] + rng.choice([c for c in FACES if c != state[index]]) + state[index + 1:]
+    faces = read_rotated(wrong, rng)
+    assert assemble(faces) == []
+    assert FACES[index // 9] in misread_faces(faces)
+    # Relida na orientação canónica, a face errada passa a montar o cubo certo
+    faces[FACES[index // 9]] = list(face_letters(state, FACES[index // 9]))
+    assert assemble(faces, {FACES[index // 9]}) == [state]
+
+def test_face_with_the_wrong_center_raises():
+    faces = read_rotated(SOLVED, random.Random(0))
+    faces['U'] = list("UUUURUUUU")
+    with pytest.raises(ValueError):
+        assemble(faces)
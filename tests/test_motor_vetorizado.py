@@ -0,0 +1,62 @@
+# Motor (N, 54): tem de concordar com o cubo virtual, movimento a movimento.
+import random
+
+import numpy as np
+import pytest
+
+import cubo_virtual
+import motor_vetorizado as motor
+
+
+def scrambles(n, seed=0, length=20):
+    rng = random.Random(seed)
+    return [cubo_virtual.random_scramble(rng, length) for _ in range(n)]
+
+
+def test_strings_round_trip():
+    states = [cubo_virtual.apply_moves(cubo_virtual.SOLVED, s) for s in scrambles(20)]
+    assert motor.to_strings(motor.from_strings(states)) == states
+
+def test_invalid_strings_raise():
+    with pytest.raises(ValueError):
+        motor.from_strings([cubo_virtual.SOLVED[:-1]])
+    with pytest.raises(ValueError):
+        motor.from_strings(["X" + cubo_virtual.SOLVED[1:]])
+
+@pytest.mark.parametrize("move", list(cubo_virtual.STEPS))
+def test_each_step_matches_the_virtual_cube(move):
+    state = cubo_virtual.apply_moves(cubo_virtual.SOLVED, scrambles(1, seed=4)[0])
+    expected = cubo_virtual.apply_moves(state, [move])
+    assert motor.to_strings(motor.apply_moves(motor.from_strings([state]), [move])) == [expected]
+
+def test_apply_sequences_matches_the_virtual_cube():
+    sequences = scrambles(50, seed=1) + [["Y'", "R", "Y"], [], ["B2"]]
+    sequences = [s[:i % 21] for i, s in enumerate(sequences)] # Tamanhos diferentes
+    cubes = motor.apply_sequences(motor.solved(len(sequences)), motor.encode_sequences(sequences))
+    assert motor.to_strings(cubes) == [cubo_virtual.apply_moves(cubo_virtual.SOLVED, s) for s in sequences]
+
+def test_scramble_then_inverse_is_solved():
+    sequences = scrambles(200, seed=2)
+    states = motor.apply_sequences(motor.solved(len(sequences)), motor.encode_sequences(sequences))
+    assert not motor.is_solved(states).any()
+    assert motor.validate_solutions(states, [motor.inverse(s) for s in sequences], chunk=64).all()
+    wrong = [motor.inverse(s)[:-1] for s in sequences]
+    assert not motor.validate_solutions(states, wrong).any()
+
+def test_is_solved_accepts_any_orientation():
+    rotated = motor.apply_moves(motor.solved(), ["Y", "Y"])
+    assert motor.is_solved(rotated).all()
+
+def test_unknown_moves_raise():
+    with pytest.raises(ValueError):
+        motor.encode_sequences([["R", "X"]])
+    with pytest.raises(ValueError):
+        motor.apply_moves(motor.solved(), ["X"])
+
+def test_whole_sequence_matches_step_by_step():
+    moves = scrambles(1, seed=3)[0]
+    cubes = motor.solved(3)
+    step_by_step = cubes
+    for move in moves:
+        step_by_step = motor.apply_moves(step_by_step, [move])
+    assert np.array_equal(motor.apply_moves(cubes, moves), step_by_step)
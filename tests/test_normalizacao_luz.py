@@ -0,0 +1,45 @@
+# Normalização de iluminação: o branco de referência é ancorado no centro quando ele é branco.
+import numpy as np
+import pytest
+
+pytest.importorskip("cv2")
+from normalizacao_luz import CENTER_INDEX, IlluminationNormalizer
+
+CENTERS = [(x, y) for y in (100, 170, 240) for x in (100, 170, 240)]
+LETTERS = ['U', 'R', 'F', 'D', 'L', 'B', '?']
+
+
+def frame_with(colors):
+    """ Frame BGR com cada sticker pintado na cor dada (lista de 9 cores). """
+    frame = np.zeros((360, 360, 3), dtype=np.uint8)
+    for (x, y), color in zip(CENTERS, colors):
+        frame[y - 20:y + 21, x - 20:x + 21] = color
+    return frame
+
+def scores_with_white(indices):
+    scores = np.zeros((9, len(LETTERS)))
+    scores[:, 1] = 1.0
+    scores[list(indices)] = 0.0
+    scores[list(indices), 0] = 1.0
+    return scores
+
+def observed_white(colors, white_indices):
+    normalizer = IlluminationNormalizer(CENTERS)
+    normalizer.hsv_grid(frame_with(colors))
+    normalizer.observe_scores(scores_with_white(white_indices), LETTERS)
+    return normalizer.current_white
+
+
+def test_white_center_is_the_only_anchor():
+    colors = [(40, 30, 190)] * 9
+    colors[CENTER_INDEX] = (230, 230, 230)
+    colors[0] = (150, 200, 210) # Amarelo pálido lido como branco
+    assert np.allclose(observed_white(colors, [0, CENTER_INDEX]), (230, 230, 230))
+
+def test_without_white_center_any_white_sticker_is_used():
+    colors = [(40, 30, 190)] * 9
+    colors[0], colors[8] = (220, 220, 220), (240, 240, 240)
+    assert np.allclose(observed_white(colors, [0, 8]), (230, 230, 230))
+
+def test_no_white_sticker_keeps_the_previous_white():
+    assert observed_white([(40, 30, 190)] * 9, []) is None
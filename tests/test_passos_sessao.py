@@ -0,0 +1,75 @@
+# Passos partilhados pelo solver e pelo servidor, alimentados com leituras perfeitas.
+import random
+
+import numpy as np
+import pytest
+
+from cubo_virtual import FACES, SOLVED, apply_moves, face_letters, random_scramble
+from montagem_cubo import rotate_letters
+from passos_sessao import STABLE_READINGS, CubeScan, StepVerifier
+
+LETTERS = list(FACES) + ['?']
+
+
+def scores(letters):
+    """ Saída de sticker_scores de uma leitura sem ruído. """
+    result = np.zeros((9, len(LETTERS)), dtype=np.float32)
+    result[np.arange(9), [LETTERS.index(c) for c in letters]] = 1.0
+    return result
+
+def run_scan(state, rng, sweep=False):
+    """ Mostra as faces como um usuário: em rotações quaisquer, ou canónicas quando pedidas. """
+    scan, events = CubeScan(LETTERS, sweep=sweep), []
+    order = list(FACES)
+    rng.shuffle(order)
+    for step in range(40):
+        if scan.complete:
+            break
+        face = scan.requested()
+        if face is not None:
+            shown = list(face_letters(state, face))
+        else:
+            face = order[step % 6] if sweep else scan.missing()[0]
+            shown = rotate_letters(list(face_letters(state, face)), rng.randrange(4))
+        scan.moved()
+        for _ in range(6):
+            events += scan.update(scores(shown), 100.0)
+    return scan, events
+
+
+@pytest.mark.parametrize("sweep", [False, True])
+@pytest.mark.parametrize("length, seed", [(1, 0), (3, 1), (20, 2), (20, 3)])
+def test_scan_reassembles_the_cube(sweep, length, seed):
+    rng = random.Random(seed)
+    state = apply_moves(SOLVED, random_scramble(rng, length))
+    scan, events = run_scan(state, rng, sweep)
+    assert scan.complete
+    assert "".join("".join(scan.faces[face]) for face in FACES) == state
+    assert [e["kociemba_string"] for e in events if e["type"] == "scan_complete"] == [state]
+
+def test_requested_face_waits_for_the_cube_to_move():
+    state = apply_moves(SOLVED, ["R"])
+    scan = CubeScan(LETTERS)
+    scan._request('F')
+    stale = scores(rotate_letters(list(face_letters(state, 'F')), 1))
+    assert all(scan.update(stale) == [] for _ in range(10)) # A leitura antiga ainda está na grade
+    scan.moved()
+    events = []
+    for _ in range(6):
+        events += scan.update(scores(face_letters(state, 'F')))
+    assert any(e["type"] == "face_locked" and e["canonical"] for e in events)
+    assert 'F' in scan.fixed
+
+def test_step_verifier_needs_stable_readings():
+    verifier = StepVerifier("novo", waiting_keys=("antigo", None))
+    assert not verifier.update("antigo") and verifier.waiting()
+    results = [verifier.update("novo") for _ in range(STABLE_READINGS)]
+    assert results == [False] * (STABLE_READINGS - 1) + [True]
+    assert not verifier.waiting()
+
+def test_step_verifier_restarts_after_a_failed_read():
+    verifier = StepVerifier("novo")
+    for _ in range(STABLE_READINGS - 1):
+        verifier.update("novo")
+    assert not verifier.update(None)
+    assert not verifier.update("novo")
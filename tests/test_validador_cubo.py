@@ -0,0 +1,72 @@
+# Validador: contagem, torção, inversão, paridade e localização de um sticker mal lido.
+import random
+
+import pytest
+
+from cubo_virtual import FACES, SOLVED, apply_moves, random_scramble
+from validador_cubo import CORNER_FACELETS, EDGE_FACELETS, validate_facelets
+
+
+def scrambled(seed):
+    return apply_moves(SOLVED, random_scramble(random.Random(seed), 20))
+
+def replace(state, changes):
+    stickers = list(state)
+    for index, letter in changes.items():
+        stickers[index] = letter
+    return "".join(stickers)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_scrambled_cubes_are_valid(seed):
+    result = validate_facelets(scrambled(seed))
+    assert result == {"ok": True, "errors": [], "bad_stickers": [], "suspect_face": None}
+
+def test_wrong_length():
+    result = validate_facelets(SOLVED[:-1])
+    assert not result["ok"] and result["suspect_face"] is None
+
+@pytest.mark.parametrize("seed", range(30))
+def test_single_wrong_sticker_is_found_on_its_face(seed):
+    rng = random.Random(seed)
+    state = scrambled(seed)
+    index = rng.choice([i for i in range(54) if i % 9 != 4]) # Centros não são lidos
+    wrong = replace(state, {index: rng.choice([c for c in FACES if c != state[index]])})
+    result = validate_facelets(wrong, locate=True)
+    assert not result["ok"]
+    assert any("Contagem" in e for e in result["errors"])
+    assert index in result["bad_stickers"]
+    assert result["suspect_face"] == FACES[index // 9]
+
+def test_suspect_search_is_opt_in(monkeypatch):
+    import validador_cubo
+    calls = []
+    monkeypatch.setattr(validador_cubo, "single_sticker_repairs", lambda s: calls.append(s) or [])
+    state = scrambled(0)
+    wrong = replace(state, {0: 'R' if state[0] != 'R' else 'F'})
+    result = validate_facelets(wrong)
+    assert not result["ok"] and result["suspect_face"] is None and not calls
+    validate_facelets(wrong, locate=True)
+    assert calls == [wrong]
+
+@pytest.mark.parametrize("seed", range(5))
+def test_twisted_corner(seed):
+    state = scrambled(seed)
+    a, b, c = CORNER_FACELETS[seed % 8]
+    result = validate_facelets(replace(state, {a: state[b], b: state[c], c: state[a]}))
+    assert not result["ok"] and result["errors"] == ["Canto torcido (orientação dos cantos inválida)"]
+
+@pytest.mark.parametrize("seed", range(5))
+def test_flipped_edge(seed):
+    state = scrambled(seed)
+    a, b = EDGE_FACELETS[seed % 12]
+    result = validate_facelets(replace(state, {a: state[b], b: state[a]}))
+    assert not result["ok"] and result["errors"] == ["Aresta invertida (orientação das arestas inválida)"]
+
+@pytest.mark.parametrize("seed", range(5))
+def test_two_swapped_edges(seed):
+    state = scrambled(seed)
+    (a1, b1), (a2, b2) = EDGE_FACELETS[0], EDGE_FACELETS[1 + seed % 11]
+    swapped = replace(state, {a1: state[a2], b1: state[b2], a2: state[a1], b2: state[b1]})
+    result = validate_facelets(swapped)
+    assert not result["ok"] and result["errors"] == ["Paridade de permutação inválida (duas peças trocadas)"]
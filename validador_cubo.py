@@ -0,0 +1,135 @@
+# Validação do estado escaneado antes de chamar o kociemba.
+# Verifica contagem de cores, peças (cantos/arestas) válidas e únicas, orientação
+# dos cantos e arestas e paridade das permutações; aponta os stickers e a face suspeita.
+from collections import Counter
+
+FACES = "URFDLB" # Ordem das faces na string Kociemba
+
+# Índices (0-53) dos stickers de cada canto/aresta na string Kociemba (mesma convenção do kociemba)
+CORNER_FACELETS = [
+    (8, 9, 20), (6, 18, 38), (0, 36, 47), (2, 45, 11),
+    (29, 26, 15), (27, 44, 24), (33, 53, 42), (35, 17, 51),
+]
+CORNER_COLORS = ["URF", "UFL", "ULB", "UBR", "DFR", "DLF", "DBL", "DRB"]
+EDGE_FACELETS = [
+    (5, 10), (7, 19), (3, 37), (1, 46), (32, 16), (28, 25),
+    (30, 43), (34, 52), (23, 12), (21, 41), (50, 39), (48, 14),
+]
+EDGE_COLORS = ["UR", "UF", "UL", "UB", "DR", "DF", "DL", "DB", "FR", "FL", "BL", "BR"]
+
+
+def permutation_parity(perm):
+    """ 0 = par, 1 = ímpar (conta inversões; n <= 12) """
+    inversions = sum(1 for i in range(len(perm)) for j in range(i + 1, len(perm)) if perm[i] > perm[j])
+    return inversions % 2
+
+def _check(kociemba_string):
+    """ Retorna (errors, bad), onde bad conta quantas vezes cada sticker apareceu num erro. """
+    errors = []
+    bad = Counter() # Índice do sticker -> vezes que apareceu num erro
+
+    # --- 1. Contagem de cores ---
+    counts = Counter(kociemba_string)
+    wrong_counts = {c: counts.get(c, 0) for c in FACES if counts.get(c, 0) != 9}
+    if wrong_counts:
+        errors.append(f"Contagem de cores errada: {wrong_counts}")
+
+    # --- 2. Cantos ---
+    corner_perm, corner_ori = [], []
+    for i, facelets in enumerate(CORNER_FACELETS):
+        colors = [kociemba_string[f] for f in facelets]
+        ori = next((o for o in range(3) if colors[o] in "UD"), None)
+        piece = None
+        if ori is not None:
+            col1, col2 = colors[(ori + 1) % 3], colors[(ori + 2) % 3]
+            piece = next((j for j, c in enumerate(CORNER_COLORS)
+                          if c[0] == colors[ori] and c[1] == col1 and c[2] == col2), None)
+        if piece is None:
+            errors.append(f"Canto impossível {''.join(colors)} na posição {CORNER_COLORS[i]}")
+            bad.update(facelets)
+        corner_perm.append(piece)
+        corner_ori.append(ori)
+
+    # --- 3. Arestas ---
+    edge_perm, edge_ori = [], []
+    for i, facelets in enumerate(EDGE_FACELETS):
+        colors = kociemba_string[facelets[0]] + kociemba_string[facelets[1]]
+        piece, ori = None, None
+        for j, c in enumerate(EDGE_COLORS):
+            if colors == c: piece, ori = j, 0; break
+            if colors == c[::-1]: piece, ori = j, 1; break
+        if piece is None:
+            errors.append(f"Aresta impossível {colors} na posição {EDGE_COLORS[i]}")
+            bad.update(facelets)
+        edge_perm.append(piece)
+        edge_ori.append(ori)
+
+    # --- 4. Peças repetidas ---
+    for perm, facelet_table, names, kind in ((corner_perm, CORNER_FACELETS, CORNER_COLORS, "Canto"),
+                                             (edge_perm, EDGE_FACELETS, EDGE_COLORS, "Aresta")):
+        repeated = [p for p, n in Counter(p for p in perm if p is not None).items() if n > 1]
+        for piece in repeated:
+            errors.append(f"{kind} {names[piece]} aparece mais de uma vez")
+            for pos, p in enumerate(perm):
+                if p == piece: bad.update(facelet_table[pos])
+
+    # --- 5. Orientação e paridade (só fazem sentido com todas as peças válidas e únicas) ---
+    if not errors:
+        if sum(corner_ori) % 3 != 0:
+            errors.append("Canto torcido (orientação dos cantos inválida)")
+        if sum(edge_ori) % 2 != 0:
+            errors.append("Aresta invertida (orientação das arestas inválida)")
+        if permutation_parity(corner_perm) != permutation_parity(edge_perm):
+            errors.append("Paridade de permutação inválida (duas peças trocadas)")
+
+    return errors, bad
+
+def single_sticker_repairs(kociemba_string):
+    """
+    Lista (índice, cor) de trocas de UM sticker que tornam o cubo válido.
+    Só testa stickers de cores a mais trocados por cores a menos, então é barato.
+    """
+    counts = Counter(kociemba_string)
+    over = [c for c in FACES if counts.get(c, 0) > 9]
+    under = [c for c in FACES if counts.get(c, 0) < 9]
+    repairs = []
+    for idx, color in enumerate(kociemba_string):
+        if idx % 9 == 4 or color not in over: # Centros definem a face, não são trocados
+            continue
+        for new_color in under:
+            candidate = kociemba_string[:idx] + new_color + kociemba_string[idx + 1:]
+            if not _check(candidate)[0]:
+                repairs.append((idx, new_color))
+    return repairs
+
+def validate_facelets(kociemba_string, locate=False):
+    """
+    Valida uma string Kociemba de 54 letras.
+    Retorna um dict: ok (bool), errors (lista de mensagens), bad_stickers (índices 0-53)
+    e suspect_face (letra da face a reescanear, ou None se o erro não puder ser localizado).
+    A busca da face suspeita (locate=True) refaz a validação para cada troca possível de um
+    sticker; sem ela, bad_stickers são só os da verificação e suspect_face fica None, o que
+    basta para a montagem, que só quer saber se o candidato é válido.
+    """
+    if len(kociemba_string) != 54:
+        return {"ok": False, "errors": [f"String com {len(kociemba_string)} stickers."], "bad_stickers": [], "suspect_face": None}
+
+    errors, bad = _check(kociemba_string)
+    if not errors:
+        return {"ok": True, "errors": [], "bad_stickers": [], "suspect_face": None}
+    if not locate:
+        return {"ok": False, "errors": errors, "bad_stickers": sorted(bad), "suspect_face": None}
+
+    # Um único sticker mal lido costuma ter uma correção única: aponta exatamente a face dele
+    repairs = single_sticker_repairs(kociemba_string)
+    if repairs:
+        bad = Counter(idx for idx, _ in repairs)
+
+    suspect_face = None
+    if bad:
+        face_votes = Counter()
+        for idx, n in bad.items():
+            face_votes[FACES[idx // 9]] += n
+        suspect_face = face_votes.most_common(1)[0][0]
+
+    return {"ok": False, "errors": errors, "bad_stickers": sorted(bad), "suspect_face": suspect_face}
@@ -0,0 +1,68 @@
+# Scan por varredura: o usuário gira o cubo mostrando as faces num movimento contínuo, em
+# qualquer ordem. O fluxo de frames é cortado em segmentos pelo sticker do centro; em cada
+# segmento, uma leitura só conta depois de se repetir, e para cada cor de centro fica a
+# leitura repetida do frame mais nítido. A rotação de cada face sai da montagem (montagem_cubo).
+from collections import Counter
+
+import numpy as np
+
+from montagem_cubo import FACES
+
+SWEEP_MIN_FRACTION = 0.7 # Fração mínima da cor vencedora em TODOS os 9 stickers do frame
+SWEEP_MIN_AGREE = 2      # Frames do mesmo segmento com a mesma leitura para ela valer
+
+
+class SweepScanner:
+    """ Guarda, por cor de centro, a melhor leitura confiável vista até agora. """
+
+    def __init__(self, letters):
+        self.letters = letters # Inclui '?' na última posição
+        self.reset()
+
+    def reset(self):
+        self.best = {} # Centro -> (nitidez, 9 letras)
+        self.segment_center = None
+        self.segment_reads = Counter()
+        self.frames = self.confident_frames = self.segments = 0
+
+    def update(self, scores, sharpness):
+        """
+        Processa um frame (saída de sticker_scores) e a sua nitidez. Retorna a letra do centro
+        se o frame foi confiável (mesmo que não tenha substituído a melhor leitura), senão None.
+        """
+        self.frames += 1
+        colors = scores[:, :-1]
+        best = colors.argmax(axis=1)
+        if colors[np.arange(9), best].min() < SWEEP_MIN_FRACTION:
+            return None
+        read = tuple(self.letters[b] for b in best)
+        center = read[4]
+        if center not in FACES:
+            return None
+        self.confident_frames += 1
+        if center != self.segment_center: # Outra face entrou na grade: novo segmento
+            self.segment_center = center
+            self.segment_reads.clear()
+            self.segments += 1
+        self.segment_reads[read] += 1
+        if self.segment_reads[read] >= SWEEP_MIN_AGREE and sharpness > self.best.get(center, (-1.0, None))[0]:
+            self.best[center] = (sharpness, list(read))
+        return center
+
+    def forget(self, center):
+        """ Descarta a leitura de uma face (ex: o validador apontou-a como inconsistente). """
+        self.best.pop(center, None)
+        if self.segment_center == center:
+            self.segment_center = None
+            self.segment_reads.clear()
+
+    def faces(self):
+        """ {centro: 9 letras} das faces já lidas. """
+        return {center: letters for center, (_, letters) in self.best.items()}
+
+    def missing(self):
+        return [f for f in FACES if f not in self.best]
+
+    def summary(self):
+        return (f"{self.frames} frames, {self.confident_frames} confiáveis, {self.segments} segmentos, "
+                f"faces: {''.join(f for f in FACES if f in self.best)}")